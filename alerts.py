@@ -0,0 +1,42 @@
+import pandas as pd
+
+import db
+from cache import LRUCache
+from db import connection, get_versions
+from reports import GESTION_SQL
+
+# --- ALERTAS DE STOCK BAJO ---
+# low_stock la mantienen los triggers de inventory (migración 12) en cada dispensa,
+# carga de stock o importación. Aquí solo se lee, cacheado por versión, así que el
+# aviso no cuesta consultas en un rerun sin cambios.
+
+_cache = LRUCache(32)    # dos entradas por sede
+
+def _cached(name, tables, build):
+    return _cache.get_versioned((db.current_path(), name), get_versions(*tables), build)
+
+def low_stock_count():
+    """Cantidad de insumos en o bajo su StockMinimo"""
+    def build():
+        with connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM low_stock").fetchone()[0]
+    return _cached('count', ('low_stock',), build)
+
+def get_reorder_list(gestion=None):
+    """Lista de reposición: insumos bajo mínimo con lo que falta para llegar al mínimo"""
+    def build():
+        sql = f"""SELECT i.Nombre, {GESTION_SQL} AS Gestion, i.Unidad, i.Stock, i.StockMinimo,
+                        i.StockMinimo - COALESCE(i.Stock, 0) AS Faltante, l.Desde
+                 FROM low_stock l
+                 JOIN inventory i ON i.ID = l.ID
+                 ORDER BY i.Gestion, i.Nombre"""
+        with connection() as conn:
+            return pd.read_sql(sql, conn)
+    df = _cached('reorder', ('low_stock', 'inventory'), build)
+    if gestion:
+        df = df[df['Gestion'] == gestion]
+    return df.copy(deep=False)
+
+def reorder_csv(df):
+    """CSV de la lista de reposición (utf-8 con BOM para que Excel respete los acentos)"""
+    return df.to_csv(index=False).encode('utf-8-sig')
@@ -0,0 +1,118 @@
+import argparse
+from datetime import date, datetime
+
+import pandas as pd
+
+import db
+from cache import LRUCache
+from db import connection, transaction, get_versions, ARCHIVE_PREFIX, FECHA_VALIDA
+from perf import timed_fn
+
+# --- ARCHIVO DE MOVIMIENTOS (PARTICIONES POR AÑO) ---
+# Los meses cerrados (anteriores a los últimos ARCHIVE_MONTHS) pasan de movements a
+# movements_archive_AAAA, de solo inserción. consumption_daily no se toca: los totales,
+# el resumen y el pronóstico siguen viendo toda la historia. Las consultas de Reportes
+# leen de movements_source(), que agrega solo las particiones que cubren el rango pedido;
+# el mes en curso se resuelve solo con la tabla viva.
+
+ARCHIVE_MONTHS = 12
+
+_sources = LRUCache(8)
+
+def cutoff(months=ARCHIVE_MONTHS, hoy=None):
+    """Primer día del mes que queda vivo: se archiva todo lo anterior"""
+    hoy = hoy or date.today()
+    n = hoy.year * 12 + hoy.month - 1 - months
+    return date(n // 12, n % 12 + 1, 1)
+
+def _partition(c, year):
+    """Crea (si falta) la partición del año, con el mismo esquema e índices que movements"""
+    t = f"{ARCHIVE_PREFIX}{year}"
+    c.execute(f'''CREATE TABLE IF NOT EXISTS {t}
+                  (ID INTEGER PRIMARY KEY, Fecha TEXT NOT NULL CHECK ({FECHA_VALIDA}), Tipo TEXT,
+                   ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT, Cantidad INTEGER)''')
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_tipo_fecha ON {t}(Tipo, Fecha)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_residente_fecha ON {t}(ResidenteID, Fecha)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_insumo ON {t}(InsumoID)")
+    for op in ("UPDATE", "DELETE"):
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{t}_{op.lower()}_bloqueo BEFORE {op} ON {t}
+                      BEGIN SELECT RAISE(ABORT, 'El archivo de movimientos es de solo inserción'); END""")
+    return t
+
+@timed_fn('db.archivo')
+def archive_closed_months(months=ARCHIVE_MONTHS, hoy=None):
+    """Mueve los movimientos anteriores a cutoff(months) a sus particiones anuales.
+    Una transacción por año. Devuelve [(Periodo, Movimientos), ...] archivados."""
+    limite = cutoff(months, hoy).isoformat()
+    with connection() as conn:
+        # Recorre movements una vez; el archivo es una tarea de mantenimiento
+        años = [r[0] for r in conn.execute("SELECT DISTINCT substr(Fecha, 1, 4) FROM movements WHERE Fecha < ? ORDER BY 1",
+                                           (limite,))]
+    archivados = []
+    for año in años:
+        desde, hasta = f"{año}-01-01", min(f"{int(año) + 1}-01-01", limite)
+        with transaction(immediate=True) as conn:
+            t = _partition(conn, año)
+            meses = conn.execute("""SELECT substr(Fecha, 1, 7), COUNT(*) FROM movements
+                                    WHERE Fecha >= ? AND Fecha < ? GROUP BY 1""", (desde, hasta)).fetchall()
+            conn.execute(f"INSERT INTO {t} SELECT * FROM movements WHERE Fecha >= ? AND Fecha < ?", (desde, hasta))
+            # Sin los triggers de borrado: el resumen diario conserva estos movimientos y
+            # la versión de movements sube una sola vez
+            triggers = conn.execute("""SELECT name, sql FROM sqlite_master
+                                       WHERE type = 'trigger' AND tbl_name = 'movements' AND sql LIKE '%AFTER DELETE%'""").fetchall()
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute("DELETE FROM movements WHERE Fecha >= ? AND Fecha < ?", (desde, hasta))
+            for _, sql in triggers:
+                conn.execute(sql)
+            conn.execute("UPDATE table_versions SET Version = Version + 1 WHERE Tabla = 'movements'")
+            ahora = datetime.now().strftime(db.FECHA_FMT)
+            conn.executemany("""INSERT INTO movements_archive_periods VALUES (?, ?, ?, ?)
+                                ON CONFLICT (Periodo) DO UPDATE
+                                SET Movimientos = Movimientos + excluded.Movimientos, Archivado = excluded.Archivado""",
+                             [(mes, t, n, ahora) for mes, n in meses])
+        archivados.extend(tuple(m) for m in meses)
+        with connection() as conn:
+            # Estadísticas para que el planificador elija los mismos índices que en movements
+            conn.execute(f"ANALYZE {t}")
+    return archivados
+
+def _partitions():
+    """[(tabla, primer mes, último mes)] según el catálogo de meses archivados"""
+    (version,) = get_versions('movements_archive_periods')
+    def build():
+        with connection() as conn:
+            return [tuple(r) for r in conn.execute("""SELECT Tabla, MIN(Periodo), MAX(Periodo)
+                                                      FROM movements_archive_periods GROUP BY Tabla ORDER BY Tabla""")]
+    return _sources.get_versioned((db.current_path(),), version, build)
+
+def movements_source(desde=None, hasta=None):
+    """FROM para movimientos con Fecha en [desde, hasta) (texto ISO; None = sin límite):
+    la tabla viva más las particiones con meses archivados dentro del rango"""
+    # Fecha empieza con 'AAAA-MM': el mes se cruza con el rango si empieza antes de hasta
+    # y no termina antes de desde
+    tablas = [t for t, primero, ultimo in _partitions()
+              if (hasta is None or f"{primero}-01" < hasta)
+              and (desde is None or ultimo >= desde[:7])]
+    # Los movimientos nuevos llevan la fecha actual: la tabla viva no tiene meses archivados
+    archivado = max((ultimo for _, _, ultimo in _partitions()), default=None)
+    if archivado is None or hasta is None or hasta[:7] > archivado:
+        tablas.append("movements")
+    if len(tablas) == 1:
+        return tablas[0]
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {t}" for t in tablas) + ")"
+
+def get_archive_periods():
+    """Meses archivados con su partición y cantidad de movimientos"""
+    with connection() as conn:
+        return pd.read_sql("SELECT * FROM movements_archive_periods ORDER BY Periodo", conn)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Archivo de movimientos de meses cerrados")
+    ap.add_argument("--db", default=db.DB_PATH, help="archivo SQLite (por defecto farmacia.db)")
+    ap.add_argument("--meses", type=int, default=ARCHIVE_MONTHS, help="meses que quedan en la tabla viva")
+    args = ap.parse_args()
+    db.DB_PATH = args.db
+    db.init_db()
+    meses = archive_closed_months(args.meses)
+    print(f"{len(meses)} meses archivados, {sum(n for _, n in meses)} movimientos (anteriores a {cutoff(args.meses)})")
@@ -0,0 +1,4 @@
+import logging
+
+# Las cargas masivas de los benchmarks superan el umbral de "consulta lenta" de perf
+logging.getLogger("perf").setLevel(logging.ERROR)
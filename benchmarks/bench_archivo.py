@@ -0,0 +1,54 @@
+"""Benchmark del archivo de movimientos: Reportes del mes y de un rango antiguo, antes y después de archivar.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_archivo --movimientos 1000000 --dias 730
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+import archive
+import db
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from reports import get_report_residents, get_resident_consumos
+
+def consulta(d_ini, d_fin):
+    """Consulta de Reportes: lista de residentes y detalle del primero"""
+    residentes = get_report_residents(d_ini, d_fin)
+    return len(residentes), len(get_resident_consumos(residentes["ID"].iloc[0], d_ini, d_fin))
+
+def reportes(d_ini, d_fin, repeticiones):
+    """ms (mediana) de la consulta de Reportes y su resultado"""
+    return medir(lambda: consulta(d_ini, d_fin), repeticiones)["mediana_ms"], consulta(d_ini, d_fin)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--dias", type=int, default=730)
+    ap.add_argument("--meses", type=int, default=3, help="meses que quedan en la tabla viva")
+    ap.add_argument("--repeticiones", type=int, default=10)
+    args = ap.parse_args()
+
+    hoy = date.today()
+    rangos = {"mes en curso": (hoy - timedelta(days=20), hoy),
+              "rango archivado": (hoy - timedelta(days=args.dias - 30), hoy - timedelta(days=args.dias - 60))}
+    with tempfile.TemporaryDirectory() as tmp:
+        generar(os.path.join(tmp, "archivo.db"), movimientos=args.movimientos, dias=args.dias)
+        antes = {k: reportes(*r, args.repeticiones) for k, r in rangos.items()}
+        archivados = []
+        t_arch = medir(lambda: archivados.extend(archive.archive_closed_months(args.meses)), 1)["mediana_ms"] / 1000
+        meses = archivados
+        despues = {k: reportes(*r, args.repeticiones) for k, r in rangos.items()}
+        with db.connection() as conn:
+            vivos = conn.execute("SELECT COUNT(*) FROM movements").fetchone()[0]
+
+    print(f"Archivo: {sum(n for _, n in meses)} movimientos de {len(meses)} meses en {t_arch:.1f}s; "
+          f"quedan {vivos} en la tabla viva")
+    for k in rangos:
+        assert antes[k][1] == despues[k][1], f"{k}: resultados distintos tras archivar"
+        print(f"{k:16} antes {antes[k][0]:8.1f} ms   después {despues[k][0]:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark de la búsqueda por nombre: LIKE sobre la tabla vs FTS5 paginado.
+
+Simula la escritura letra a letra en el buscador (sin caché de páginas).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_busqueda --insumos 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+
+import db
+import search
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+
+TEXTOS = ["p", "pa", "par", "para", "parac", "paracetamol 5", "paracetamol 500", "g", "gu", "guante l"]
+
+def like(texto):
+    """Búsqueda previa: LIKE sin índice utilizable"""
+    with db.connection() as conn:
+        rows = conn.execute("SELECT * FROM inventory WHERE Nombre LIKE ? ORDER BY Nombre, ID LIMIT ?",
+                            (f"%{texto}%", search.PAGE_SIZE)).fetchall()
+        total = conn.execute("SELECT COUNT(*) FROM inventory WHERE Nombre LIKE ?", (f"%{texto}%",)).fetchone()[0]
+    return rows, total
+
+def por_texto(fn, repeticiones):
+    """Mediana en ms de cada texto tecleado, sin caché de páginas"""
+    return [medir(lambda: fn(texto), repeticiones, antes=search._pages.clear)["mediana_ms"] for texto in TEXTOS]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--insumos", type=int, default=100_000)
+    ap.add_argument("--repeticiones", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generar(os.path.join(tmp, "busqueda.db"), insumos=args.insumos, movimientos=0)
+        with db.connection() as conn:
+            ids = [r[0] for r in conn.execute("SELECT ID FROM inventory LIMIT ?", (args.repeticiones * 10,))]
+        for nombre, fn in (("LIKE", like), ("FTS5", search.search_inventory)):
+            tiempos = por_texto(fn, args.repeticiones)
+            print(f"{nombre:5} {args.insumos} insumos: p50 {statistics.median(tiempos):.1f} ms | texto más lento {max(tiempos):.1f} ms")
+        ultima = medir(lambda: search.search_inventory("", page=args.insumos // search.PAGE_SIZE - 1), 1,
+                       antes=search._pages.clear)
+        print(f"Última página sin filtro: {ultima['mediana_ms']:.1f} ms")
+
+        # Rerun del selector de Dispensar tras un cambio de stock (lo habitual después de cada carga)
+        for nombre, fn in (("página completa", lambda: search.search_inventory("para")),
+                           ("opciones + stock", lambda: search.get_stock(search.search_options("inventory", "para").ids))):
+            cambios = iter(ids)
+            def cambio_de_stock():
+                with db.transaction() as conn:
+                    conn.execute("UPDATE inventory SET Stock = Stock - 1 WHERE ID = ?", (next(cambios),))
+            r = medir(fn, len(ids), antes=cambio_de_stock)
+            print(f"Selector tras cambio de stock, {nombre}: p50 {r['mediana_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
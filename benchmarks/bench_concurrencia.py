@@ -0,0 +1,124 @@
+"""Prueba de carga: sesiones concurrentes leyendo reportes y dispensando.
+
+Compara la conexión nueva por operación con journal por defecto (antes)
+contra el pool compartido con WAL y pragmas (db.connection / db.transaction).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_concurrencia --sesiones 8 --segundos 10
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import db
+from benchmarks.generador import generar
+
+def ids(path):
+    """(IDs de residentes, IDs de insumos) de la base generada"""
+    with db.using(path), db.connection() as conn:
+        salida = ([r[0] for r in conn.execute("SELECT ID FROM residents")],
+                  [r[0] for r in conn.execute("SELECT ID FROM inventory")])
+    db.get_pool(path).close()
+    return salida
+
+# --- Modo anterior: una conexión por operación, journal por defecto ---
+
+@contextmanager
+def conexion_anterior(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def modo_anterior(path):
+    with conexion_anterior(path) as conn:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    def leer(sql, params):
+        with conexion_anterior(path) as conn:
+            return conn.execute(sql, params).fetchall()
+    def escribir(ops):
+        with conexion_anterior(path) as conn:
+            for sql, params in ops:
+                conn.execute(sql, params)
+            conn.commit()
+    return leer, escribir
+
+def modo_pool(path):
+    db.DB_PATH = path
+    def leer(sql, params):
+        with db.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    def escribir(ops):
+        with db.transaction() as conn:
+            for sql, params in ops:
+                conn.execute(sql, params)
+    return leer, escribir
+
+def sesion(leer, escribir, fin, stats, seed, residentes, insumos):
+    """Simula una enfermera: mayormente lecturas, una dispensación cada ~5 operaciones"""
+    rnd = random.Random(seed)
+    ok = errores = 0
+    while time.perf_counter() < fin:
+        try:
+            if rnd.random() < 0.2:
+                ins, res = rnd.choice(insumos), rnd.choice(residentes)
+                escribir([
+                    ("UPDATE inventory SET Stock = Stock - 1 WHERE ID = ?", (ins,)),
+                    ("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
+                     (time.strftime("%Y-%m-%d %H:%M"), "CONSUMO", res, ins, ins, 1)),
+                ])
+            else:
+                leer("SELECT m.Fecha, m.NombreInsumo, m.Cantidad FROM movements m WHERE m.ResidenteID = ? ORDER BY m.Fecha DESC LIMIT 50",
+                     (rnd.choice(residentes),))
+            ok += 1
+        except sqlite3.OperationalError:
+            errores += 1
+    stats.append((ok, errores))
+
+def correr(nombre, modo, path, sesiones, segundos):
+    residentes, insumos = ids(path)
+    leer, escribir = modo(path)
+    stats = []
+    fin = time.perf_counter() + segundos
+    hilos = [threading.Thread(target=sesion, args=(leer, escribir, fin, stats, i, residentes, insumos))
+             for i in range(sesiones)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    ok = sum(s[0] for s in stats)
+    errores = sum(s[1] for s in stats)
+    print(f"{nombre:<28} {ok / segundos:9.0f} ops/s | errores de lock: {errores}")
+    return ok / segundos
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sesiones", type=int, default=8)
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--movimientos", type=int, default=500_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Los dos modos parten de la misma base generada (copias del archivo)
+        antes_path = os.path.join(tmp, "antes.db")
+        pool_path = os.path.join(tmp, "pool.db")
+        generar(antes_path, movimientos=args.movimientos)
+        with db.transaction() as conn:
+            # Stock de sobra: las sesiones descuentan sin mirar el saldo
+            conn.execute("UPDATE inventory SET Stock = 1000000000")
+        db.get_pool(antes_path).close()
+        shutil.copy(antes_path, pool_path)
+        antes = correr("antes (conexión por op)", modo_anterior, antes_path, args.sesiones, args.segundos)
+        despues = correr("pool + WAL", modo_pool, pool_path, args.sesiones, args.segundos)
+        print(f"Mejora: x{despues / antes:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Prueba de estrés del motor de dispensación: muchos hilos sobre pocos insumos.
+
+Verifica que no haya sobreventa (stock negativo o consumos por sobre el stock inicial)
+y reporta la tasa de dispensaciones por segundo. Luego mide una ronda de piso
+(--ronda líneas) con dispense_batch contra la misma ronda línea por línea, y una
+importación de inventario por bloques (--importacion filas) mientras se dispensa,
+directa y como trabajo en segundo plano (jobs.submit_import).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_dispensa --hilos 16 --intentos 2000 --ronda 200 --importacion 20000
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+
+import db
+import jobs
+from dispense import dispense, dispense_batch, OK, SIN_STOCK
+from ingest import import_inventory_file
+
+def bench_ronda(n_lineas, seed=7):
+    rnd = random.Random(seed)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?,?)",
+                         [(f"RONDA{i}", f"Ronda {i}", "unidades", 10**6, 5, "Farmacia") for i in range(50)])
+    ronda = [(f"R{i}", f"RONDA{rnd.randrange(50)}", "Ronda", rnd.randint(1, 3)) for i in range(n_lineas)]
+
+    t0 = time.perf_counter()
+    for linea in ronda:
+        dispense(*linea)
+    t_uno = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = dispense_batch(ronda)
+    t_lote = time.perf_counter() - t0
+    ok = sum(r.status == OK for r in results)
+    print(f"Ronda de {n_lineas} líneas: una a una {t_uno * 1000:.1f} ms | lote {t_lote * 1000:.1f} ms | OK {ok}/{n_lineas}")
+
+    # Un insumo con Stock NULL (importación antigua) se rechaza sin cortar la ronda
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO inventory VALUES ('RONDA_NULL', 'Ronda sin stock', 'unidades', NULL, 5, 'Farmacia')")
+    nulo, resto = dispense_batch([("R1", "RONDA_NULL", "Ronda sin stock", 1), ronda[0]])
+    if nulo != (SIN_STOCK, 0) or resto.status != OK:
+        raise SystemExit(f"FALLA: ronda con Stock NULL devolvió {nulo}, {resto}")
+
+def importar_directo(data):
+    return import_inventory_file(io.BytesIO(data), "planilla.csv", chunk_size=500)[0]
+
+def importar_en_trabajo(data):
+    """Como la página: submit_import con el archivo subido y espera a que el trabajo termine"""
+    f = io.BytesIO(data)
+    f.name = "planilla.csv"
+    job_id = jobs.submit_import('inventario', f, usuario="bench")
+    while (job := jobs.get_job(job_id))['Estado'] in jobs.ABIERTOS:
+        time.sleep(0.05)
+    if job['Estado'] != 'OK':
+        raise SystemExit(f"FALLA: el trabajo de importación terminó en {job['Estado']}: {job['Mensaje']}")
+    return job['Resultado']['filas']
+
+def importacion_concurrente(filas, importar, prefijo):
+    """Importa una planilla por bloques mientras otro hilo dispensa los mismos insumos.
+    Ningún bloque puede fallar por lock y el stock debe cuadrar con el libro."""
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?,?)",
+                         [(f"{prefijo}{i}", f"{prefijo} {i}", "unidades", 10**6, 5, "Farmacia") for i in range(50)])
+    # La mitad de los nombres ya existe (ENTRADA), la otra mitad es nueva (INICIAL)
+    planilla = "Nombre;Cantidad;Gestion\n" + "".join(f"{prefijo} {i % 100};2;Farmacia\n" for i in range(filas))
+    fin = threading.Event()
+    dispensas = []
+    def dispensar():
+        k = 0
+        while not fin.is_set():
+            dispense("R1", f"{prefijo}{k % 50}", f"{prefijo} {k % 50}", 1)
+            k += 1
+        dispensas.append(k)
+    hilo = threading.Thread(target=dispensar)
+    hilo.start()
+    t0 = time.perf_counter()
+    try:
+        procesadas = importar(planilla.encode("utf-8"))
+    finally:
+        fin.set()
+        hilo.join()
+    dur = time.perf_counter() - t0
+    with db.connection() as conn:
+        descuadre = conn.execute("""SELECT COUNT(*) FROM inventory i
+                                    WHERE i.Nombre LIKE ? || ' %' AND i.Stock !=
+                                          (CASE WHEN i.ID LIKE ? || '%' THEN 1000000 ELSE 0 END) +
+                                          (SELECT COALESCE(SUM(CASE WHEN m.Tipo = 'CONSUMO' THEN -m.Cantidad ELSE m.Cantidad END), 0)
+                                           FROM movements m WHERE m.InsumoID = i.ID)""", (prefijo, prefijo)).fetchone()[0]
+    print(f"{importar.__name__}: importación de {procesadas} filas en {dur:.2f}s con {dispensas[0]} dispensas a la vez | insumos descuadrados: {descuadre}")
+    if procesadas != filas or descuadre:
+        raise SystemExit("FALLA: la importación concurrente no cuadra con el libro")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--hilos", type=int, default=16)
+    ap.add_argument("--intentos", type=int, default=2000, help="dispensaciones por hilo")
+    ap.add_argument("--insumos", type=int, default=5)
+    ap.add_argument("--stock", type=int, default=5000, help="stock inicial por insumo")
+    ap.add_argument("--ronda", type=int, default=200, help="líneas de la ronda por lote")
+    ap.add_argument("--importacion", type=int, default=20_000, help="filas importadas mientras se dispensa")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "estres.db")
+        db.init_db()
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?,?)",
+                             [(f"I{i}", f"Insumo {i}", "unidades", args.stock, 5, "Farmacia") for i in range(args.insumos)])
+
+        conteo = {OK: 0, SIN_STOCK: 0}
+        lock = threading.Lock()
+
+        def trabajador(seed):
+            rnd = random.Random(seed)
+            local = {OK: 0, SIN_STOCK: 0}
+            for _ in range(args.intentos):
+                ins = f"I{rnd.randrange(args.insumos)}"
+                local[dispense("R1", ins, ins, rnd.randint(1, 3)).status] += 1
+            with lock:
+                for k, v in local.items():
+                    conteo[k] += v
+
+        hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(args.hilos)]
+        t0 = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        dur = time.perf_counter() - t0
+
+        with db.connection() as conn:
+            negativos = conn.execute("SELECT COUNT(*) FROM inventory WHERE Stock < 0").fetchone()[0]
+            descuadre = conn.execute("""SELECT COUNT(*) FROM inventory i
+                                        WHERE i.Stock + (SELECT COALESCE(SUM(Cantidad), 0) FROM movements m
+                                                         WHERE m.InsumoID = i.ID AND m.Tipo = 'CONSUMO') != ?""",
+                                     (args.stock,)).fetchone()[0]
+        total = conteo[OK] + conteo[SIN_STOCK]
+        print(f"{total} intentos en {dur:.2f}s ({total / dur:.0f}/s) | OK {conteo[OK]} | sin stock {conteo[SIN_STOCK]}")
+        print(f"Insumos con stock negativo: {negativos} | insumos descuadrados: {descuadre}")
+        if negativos or descuadre:
+            raise SystemExit("FALLA: sobreventa detectada")
+
+        bench_ronda(args.ronda)
+        importacion_concurrente(args.importacion, importar_directo, "IMP")
+        importacion_concurrente(args.importacion, importar_en_trabajo, "JOB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark de movements.Fecha: migración de backfill y filtro por rango de fechas.
+
+Compara el filtro anterior (leer Fecha, pd.to_datetime por request y .dt.date por fila)
+con el rango indexado sobre la Fecha ISO validada.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_fechas --movimientos 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import db
+from benchmarks.suite import medir
+from reports import _date_bounds
+
+FORMATOS_RAROS = ["%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M"]
+
+def poblar(n, dias=3 * 365, seed=3):
+    """Movimientos con fechas en formatos previos a la migración 8. El generador compartido no
+    sirve aquí: siempre crea la base con el esquema al día y fechas ISO."""
+    rnd = random.Random(seed)
+    inicio = datetime.now() - timedelta(days=dias)
+    def filas():
+        for i in range(n):
+            f = inicio + timedelta(minutes=rnd.randrange(dias * 1440))
+            if i % 1000 == 0:
+                fecha = f.strftime(FORMATOS_RAROS[i % 3])   # 0,1% en formatos alternativos
+            elif i % 100_003 == 0:
+                fecha = "sin fecha"                         # ilegible -> cuarentena
+            else:
+                fecha = f.strftime(db.FECHA_FMT)
+            yield (fecha, "CONSUMO", f"R{i % 200}", f"I{i % 5000}", "Insumo", 1)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)", filas())
+
+def filtro_anterior(d_ini, d_fin):
+    with db.connection() as conn:
+        df = pd.read_sql("SELECT * FROM movements WHERE Tipo = 'CONSUMO'", conn)
+    df['FechaDT'] = pd.to_datetime(df['Fecha'], errors='coerce')
+    df = df.dropna(subset=['FechaDT'])
+    return len(df[(df['FechaDT'].dt.date >= d_ini) & (df['FechaDT'].dt.date <= d_fin)])
+
+def filtro_indexado(d_ini, d_fin):
+    desde, hasta = _date_bounds(d_ini, d_fin)
+    with db.connection() as conn:
+        df = pd.read_sql("SELECT * FROM movements WHERE Tipo = 'CONSUMO' AND Fecha >= ? AND Fecha < ?", conn, params=[desde, hasta])
+    return len(df)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "fechas.db")
+        # Base en el esquema anterior a la migración 8, con fechas en varios formatos
+        todas = db.MIGRATIONS
+        db.MIGRATIONS = [m for m in todas if m[0] < 8]
+        db.init_db()
+        poblar(args.movimientos)
+        db.MIGRATIONS = todas
+
+        hoy = date.today()
+        rangos = [("mes actual", hoy.replace(day=1), hoy), ("último año", hoy - timedelta(days=365), hoy)]
+        antes = {nombre: filtro_anterior(d0, d1) for nombre, d0, d1 in rangos}
+
+        t_mig = medir(db.init_db, 1)["mediana_ms"] / 1000
+        print(f"Migración 8 (backfill + reconstrucción) sobre {args.movimientos} filas: {t_mig:.1f}s")
+        with db.connection() as conn:
+            print(f"En cuarentena: {conn.execute('SELECT COUNT(*) FROM movements_quarantine').fetchone()[0]}")
+
+        for nombre, d0, d1 in rangos:
+            t_ant = medir(lambda: filtro_anterior(d0, d1), args.repeticiones)["mediana_ms"]
+            t_idx = medir(lambda: filtro_indexado(d0, d1), args.repeticiones)["mediana_ms"]
+            n_idx = filtro_indexado(d0, d1)
+            print(f"{nombre:<11} parseo por request {t_ant:8.1f} ms | rango indexado {t_idx:7.1f} ms "
+                  f"| x{t_ant / t_idx:5.1f} | filas {n_idx} (antes de migrar: {antes[nombre]})")
+
+if __name__ == "__main__":
+    main()
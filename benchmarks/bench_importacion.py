@@ -0,0 +1,75 @@
+"""Benchmark de la importación de inventario: fila a fila vs la importación de la app
+(import_inventory_file, por bloques). Ambos leen la misma planilla CSV.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_importacion --filas 20000
+"""
+import argparse
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+import db
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from ingest import import_inventory_file
+
+def planilla(n, existentes):
+    """Mitad de nombres ya existentes, mitad nuevos, y algunas filas con error"""
+    nombres = [existentes[i % len(existentes)] if i % 2 else f"Nuevo {i}" for i in range(n)]
+    cant = [("x" if i % 997 == 0 else i % 50) for i in range(n)]
+    gestion = ["Farmacia" if i % 3 else "Enfermera Jefe" for i in range(n)]
+    df = pd.DataFrame({"Nombre": nombres, "Cantidad": cant, "Gestion": gestion})
+    return df.to_csv(index=False, sep=";").encode("utf-8")
+
+def preparar(path, existentes, con_indice):
+    """Base generada con `existentes` insumos y sin movimientos. Devuelve sus nombres."""
+    generar(path, insumos=existentes, movimientos=0)
+    with db.transaction() as conn:
+        if not con_indice:
+            conn.execute("DROP INDEX IF EXISTS idx_inventory_nombre")
+        return [r[0] for r in conn.execute("SELECT Nombre FROM inventory ORDER BY ID")]
+
+def importar_anterior(data):
+    """Copia del bucle original (filas con error se omiten para que termine)"""
+    df = pd.read_csv(io.BytesIO(data), sep=";", dtype=str)
+    with db.transaction() as conn:
+        for _, r in df.iterrows():
+            nm = str(r.iloc[0])
+            try:
+                qt = int(r.iloc[1])
+            except ValueError:
+                continue
+            gs = str(r.iloc[2])
+            ex = conn.execute("SELECT ID FROM inventory WHERE Nombre=?", (nm,)).fetchone()
+            if ex:
+                conn.execute("UPDATE inventory SET Stock = Stock + ? WHERE ID=?", (qt, ex['ID']))
+            else:
+                conn.execute("INSERT INTO inventory VALUES (?,?,?,?,?,?)", (db.generate_id(), nm, "unidades", qt, 5, gs))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--filas", type=int, default=20_000)
+    ap.add_argument("--existentes", type=int, default=10_000, help="insumos ya cargados en la base")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = planilla(args.filas, preparar(os.path.join(tmp, "antes.db"), args.existentes, con_indice=False))
+        t_antes = medir(lambda: importar_anterior(data), 1)["mediana_ms"] / 1000
+        with db.connection() as conn:
+            stock_antes = conn.execute("SELECT SUM(Stock), COUNT(*) FROM inventory").fetchone()
+
+        preparar(os.path.join(tmp, "masiva.db"), args.existentes, con_indice=True)
+        resultado = []
+        t_despues = medir(lambda: resultado.append(import_inventory_file(io.BytesIO(data), "planilla.csv")), 1)["mediana_ms"] / 1000
+        procesadas, errores = resultado[0]
+        with db.connection() as conn:
+            stock_despues = conn.execute("SELECT SUM(Stock), COUNT(*) FROM inventory").fetchone()
+
+    print(f"{args.filas} filas: fila a fila {t_antes:.2f}s | por bloques {t_despues:.2f}s | x{t_antes / t_despues:.1f}")
+    print(f"Procesadas {procesadas}, con error {len(errores)} | (stock, insumos) antes {tuple(stock_antes)} / por bloques {tuple(stock_despues)}")
+
+if __name__ == "__main__":
+    main()
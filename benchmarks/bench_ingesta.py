@@ -0,0 +1,80 @@
+"""Benchmark de ingesta de archivos grandes: pd.read_excel completo vs lectura por bloques.
+
+Cada modo corre en un proceso aparte para medir su RSS máximo por separado.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_ingesta --filas 500000 [--formato xlsx|csv]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+
+def escribir_planilla(path, filas):
+    """Planilla de inventario sintética (Nombre, Cantidad, Gestión) escrita en modo streaming"""
+    if path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("Nombre;Cantidad;Gestion\n")
+            for i in range(filas):
+                fh.write(f"Insumo {i % (filas // 2 or 1)};{i % 50};{'Farmacia' if i % 3 else 'Enfermera Jefe'}\n")
+        return
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Nombre", "Cantidad", "Gestion"])
+    for i in range(filas):
+        ws.append([f"Insumo {i % (filas // 2 or 1)}", i % 50, "Farmacia" if i % 3 else "Enfermera Jefe"])
+    wb.save(path)
+
+def _correr(modo, archivo, db_path, out):
+    import pandas as pd
+    import db
+    from benchmarks.generador import generar
+    from benchmarks.suite import medir
+    from ingest import import_inventory_file, _parse_inventory, _upsert_inventory
+
+    generar(db_path, movimientos=0)
+    filas = []
+    def completo():
+        df = pd.read_csv(archivo, sep=";") if archivo.endswith(".csv") else pd.read_excel(archivo)
+        # Misma validación y upsert que la app, sobre la planilla completa en memoria
+        validas, _ = _parse_inventory(df)
+        with db.transaction(immediate=True) as conn:
+            _upsert_inventory(conn, validas)
+        filas.append(len(validas))
+    def bloques():
+        with open(archivo, "rb") as fh:
+            filas.append(import_inventory_file(fh, archivo)[0])
+    dur = medir(completo if modo == "completo" else bloques, 1)["mediana_ms"] / 1000
+    # ru_maxrss está en KB en Linux
+    out.put((filas[0], dur, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def en_proceso(modo, archivo, db_path):
+    """Corre un modo en un proceso nuevo: (filas, segundos, RSS máximo en MB)"""
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    p = ctx.Process(target=_correr, args=(modo, archivo, db_path, out))
+    p.start()
+    res = out.get()
+    p.join()
+    return res
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--filas", type=int, default=500_000)
+    ap.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archivo = os.path.join(tmp, f"inventario.{args.formato}")
+        t0 = time.perf_counter()
+        escribir_planilla(archivo, args.filas)
+        print(f"Archivo {args.formato} de {args.filas} filas ({os.path.getsize(archivo) / 2**20:.1f} MB) en {time.perf_counter() - t0:.1f}s")
+        for modo in ("completo", "bloques"):
+            filas, dur, rss = en_proceso(modo, archivo, os.path.join(tmp, f"{modo}.db"))
+            print(f"{modo:<9} {filas} filas en {dur:6.1f}s | {filas / dur:8.0f} filas/s | RSS máx {rss:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark del arranque: init_db() anterior en cada rerun vs migraciones una vez por proceso.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_init_db --reruns 200 [--app]
+"""
+import argparse
+import os
+import tempfile
+
+import db
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+
+def init_db_anterior():
+    """Copia del init_db() original que se ejecutaba en cada rerun"""
+    conn = db.get_db_connection()
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS inventory
+                 (ID TEXT PRIMARY KEY, Nombre TEXT, Unidad TEXT, Stock INTEGER, StockMinimo INTEGER, Gestion TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS residents
+                 (ID TEXT PRIMARY KEY, Nombre TEXT, RUT TEXT, Piso TEXT, Habitacion TEXT, Apoderado TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS movements
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT, Fecha TEXT, Tipo TEXT, ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT, Cantidad INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (Username TEXT PRIMARY KEY, Password TEXT, Role TEXT)''')
+    try:
+        c.execute("SELECT Gestion FROM inventory LIMIT 1")
+    except db.sqlite3.OperationalError:
+        c.execute("ALTER TABLE inventory ADD COLUMN Gestion TEXT DEFAULT 'Farmacia'")
+    c.execute("UPDATE inventory SET Gestion = 'Farmacia' WHERE Gestion IS NULL OR Gestion = ''")
+    c.execute('SELECT count(*) FROM users')
+    c.fetchone()
+    conn.commit()
+    conn.close()
+
+def medir_app(reruns):
+    """ms del primer render y de cada rerun de farmacia.py completo (requiere streamlit)"""
+    from streamlit.testing.v1 import AppTest
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "farmacia.py")
+    at = AppTest.from_file(script, default_timeout=60)
+    return medir(at.run, 1)["mediana_ms"], medir(at.run, reruns)["media_ms"]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--reruns", type=int, default=200)
+    ap.add_argument("--inventario", type=int, default=20_000)
+    ap.add_argument("--app", action="store_true", help="medir también el script completo con AppTest")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        db.DB_PATH = os.path.join(tmp, "nueva.db")
+        print(f"init_db() primera vez (base nueva): {medir(db.init_db, 1)['mediana_ms']:.2f} ms")
+        generar(os.path.join(tmp, "farmacia.db"), insumos=args.inventario, movimientos=0)
+
+        antes = medir(init_db_anterior, args.reruns)["media_ms"]
+        ya_migrado = medir(db.init_db, args.reruns)["media_ms"]
+        print(f"Por rerun, antes (init_db en cada rerun):      {antes:.2f} ms")
+        print(f"Por rerun, init_db() con esquema al día:        {ya_migrado:.2f} ms")
+        print("Por rerun, con st.cache_resource (setup_db):   0 ms (no toca la base)")
+
+        if args.app:
+            primero, rerun = medir_app(args.reruns)
+            print(f"App: primer render {primero:.1f} ms | rerun estable {rerun:.1f} ms")
+
+if __name__ == "__main__":
+    main()
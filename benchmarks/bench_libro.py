@@ -0,0 +1,80 @@
+"""Benchmark del libro de stock: stock a una fecha recorriendo todo movements vs foto + delta.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_libro --movimientos 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db
+import ledger
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+
+def stock_replay(item_id, cuando):
+    """Enfoque directo: foto base más todos los movimientos del insumo hasta la fecha"""
+    limite = ledger._limite(cuando)
+    with db.connection() as conn:
+        foto = conn.execute("SELECT * FROM stock_snapshots ORDER BY ID DESC LIMIT 1").fetchone()
+        base = conn.execute("SELECT Stock FROM stock_snapshot_items WHERE SnapshotID = ? AND InsumoID = ?",
+                            (foto['ID'], item_id)).fetchone()[0]
+        # Hacia atrás desde la base: todo el historial posterior a la fecha
+        delta = conn.execute(f"""SELECT COALESCE(SUM({ledger.SIGNO_SQL}), 0) FROM movements m
+                                 WHERE m.InsumoID = ? AND m.Fecha >= ?""", (item_id, limite)).fetchone()[0]
+    return base - delta
+
+def por_consulta(fn, consultas):
+    """ms promedio por consulta y los resultados, en una sola pasada"""
+    out = []
+    ms = medir(lambda: out.extend(fn(*a) for a in consultas), 1)["mediana_ms"]
+    return ms / len(consultas), out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--dias", type=int, default=365)
+    ap.add_argument("--consultas", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generar(os.path.join(tmp, "libro.db"), movimientos=args.movimientos, dias=args.dias)
+        with db.connection() as conn:
+            populares = [r[0] for r in conn.execute("""SELECT InsumoID FROM movements GROUP BY InsumoID
+                                                       ORDER BY COUNT(*) DESC LIMIT 50""")]
+        rnd = random.Random(1)
+        consultas = [(rnd.choice(populares), date.today() - timedelta(days=rnd.randint(1, args.dias)))
+                     for _ in range(args.consultas)]
+        ms_replay, esperado = por_consulta(stock_replay, consultas)
+
+        # Fotos semanales hacia atrás (como si snapshot_if_due hubiera corrido todo el año)
+        t0 = time.perf_counter()
+        with db.transaction() as conn:
+            base = conn.execute("SELECT ID FROM stock_snapshots ORDER BY ID DESC LIMIT 1").fetchone()[0]
+            for semana in range(1, args.dias // 7 + 1):
+                fecha = (date.today() - timedelta(days=7 * semana)).isoformat()
+                hasta_id = conn.execute("SELECT COALESCE(MAX(ID), 0) FROM movements WHERE Fecha < ?", (fecha,)).fetchone()[0]
+                cur = conn.execute("INSERT INTO stock_snapshots (Fecha, HastaID, Insumos, Deriva, Origen) VALUES (?, ?, 0, 0, 'libro')",
+                                   (f"{fecha} 00:00", hasta_id))
+                conn.execute(f"""INSERT INTO stock_snapshot_items
+                                 SELECT ?, s.InsumoID, s.Stock - COALESCE((SELECT SUM({ledger.SIGNO_SQL}) FROM movements m
+                                                                           WHERE m.InsumoID = s.InsumoID AND m.ID > ?), 0)
+                                 FROM stock_snapshot_items s WHERE s.SnapshotID = ?""", (cur.lastrowid, hasta_id, base))
+        t_fotos = time.perf_counter() - t0
+        ms_libro, obtenido = por_consulta(ledger.stock_at, consultas)
+        assert obtenido == esperado, "stock_at no coincide con el recorrido completo"
+        ms_inv, _ = por_consulta(ledger.inventory_at, [(d,) for _, d in consultas[:20]])
+        ms_rec, _ = por_consulta(ledger.reconcile, [()] * 5)
+
+    print(f"{args.movimientos} movimientos, {args.consultas} consultas de stock a una fecha")
+    print(f"stock_at recorriendo movements:   {ms_replay:8.2f} ms")
+    print(f"stock_at foto + delta:            {ms_libro:8.2f} ms  (x{ms_replay / ms_libro:.1f})")
+    print(f"inventory_at (todos los insumos): {ms_inv:8.2f} ms")
+    print(f"reconcile:                        {ms_rec:8.2f} ms")
+    print(f"({args.dias // 7} fotos semanales en {t_fotos:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark de la exportación Parquet: costo inicial e incremental, tamaño y una consulta de análisis.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_parquet --movimientos 1000000
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+import db
+import parquet_export
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from dispense import dispense
+
+def _tamano(path):
+    return sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(path) for f in fs) / 1e6
+
+def consumo_sqlite(desde):
+    """Enfoque actual: leer movements de la base y agrupar en pandas"""
+    with db.connection() as conn:
+        df = pd.read_sql("SELECT * FROM movements", conn)
+    df = df[(df["Tipo"] == "CONSUMO") & (df["Fecha"] >= desde)]
+    return df.groupby(df["Fecha"].str[:7])["Cantidad"].sum()
+
+def consumo_parquet(path, desde):
+    """Dataset Parquet: solo las columnas y meses necesarios (filtro por partición y estadísticas)"""
+    tabla = parquet_export.open_dataset(path).to_table(
+        columns=["Mes", "Cantidad"],
+        filter=(ds.field("Mes") >= desde[:7]) & (ds.field("Tipo") == "CONSUMO") & (ds.field("Fecha") >= pd.Timestamp(desde)))
+    return tabla.to_pandas().groupby("Mes")["Cantidad"].sum()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--dias", type=int, default=365)
+    ap.add_argument("--nuevos", type=int, default=500, help="dispensas entre la primera y la segunda exportación")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        generar(path, movimientos=args.movimientos, dias=args.dias)
+        destino = os.path.join(tmp, "analytics")
+        t_inicial = medir(lambda: parquet_export.export_parquet(destino), 1)["mediana_ms"] / 1000
+        for k in range(args.nuevos):
+            dispense("R00001", "I000001", "Insumo", 1)
+        estados = []
+        t_incr = medir(lambda: estados.append(parquet_export.export_parquet(destino)), 1)["mediana_ms"]
+        estado = estados[0]
+
+        desde = (date.today() - timedelta(days=90)).isoformat()
+        t_sql = medir(lambda: consumo_sqlite(desde), 1)["mediana_ms"]
+        t_pq = medir(lambda: consumo_parquet(destino, desde), 1)["mediana_ms"]
+        a, b = consumo_sqlite(desde), consumo_parquet(destino, desde)
+        assert a.to_dict() == b.to_dict(), "la consulta sobre Parquet no coincide con la base"
+        mb_db, mb_pq = os.path.getsize(path) / 1e6, _tamano(destino)
+
+    print(f"{estado['Filas']} movimientos en {len(estado['Meses'])} meses")
+    print(f"Exportación inicial:     {t_inicial:8.2f} s")
+    print(f"Incremental (+{args.nuevos}):      {t_incr:8.1f} ms")
+    print(f"Tamaño: base {mb_db:.1f} MB, Parquet {mb_pq:.1f} MB")
+    print(f"Consumo mensual (90 días): SQLite + pandas {t_sql:8.1f} ms, Parquet {t_pq:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark de los PDF: renderizado anterior con iterrows vs columnas pre-convertidas.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_pdf --filas 10000
+"""
+import argparse
+import re
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.suite import medir
+from pdf_reports import PDF, clean_text, generate_pdf, generate_inventory_pdf
+
+def inventario(n):
+    return pd.DataFrame({
+        "ID": [f"I{i}" for i in range(n)],
+        "Nombre": [f"Insumo {i} señal ñandú" for i in range(n)],
+        "Unidad": ["unidades"] * n,
+        "Stock": [i % 300 for i in range(n)],
+        "StockMinimo": [5] * n,
+        "Gestion": ["Farmacia" if i % 2 else "Enfermera Jefe" for i in range(n)],
+    })
+
+def consumos(n):
+    inicio = datetime(2024, 1, 1)
+    return pd.DataFrame({
+        "Fecha": [(inicio + timedelta(minutes=37 * i)).strftime("%Y-%m-%d %H:%M") for i in range(n)],
+        "NombreInsumo": [f"Insumo {i % 500} acción" for i in range(n)],
+        "Gestion": ["Farmacia" if i % 3 else "Enfermera Jefe" for i in range(n)],
+        "Cantidad": [1 + i % 4 for i in range(n)],
+    })
+
+RESIDENTE = {"Nombre": "José Peña", "RUT": "12.345.678-9", "Piso": "2", "Habitacion": "204", "Apoderado": "María Núñez"}
+
+# --- Versiones anteriores (iterrows + clean_text por celda) ---
+
+def generate_pdf_anterior(resident_row, df_consumos, start, end, label):
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, f"Residente: {clean_text(resident_row['Nombre'])}", 0, 1)
+    pdf.set_font("Arial", size=10)
+    pdf.cell(0, 6, f"RUT: {resident_row['RUT']}", 0, 1)
+    pdf.cell(0, 6, f"Ubicacion: Piso {clean_text(resident_row['Piso'])} - Hab {clean_text(resident_row['Habitacion'])}", 0, 1)
+    pdf.cell(0, 6, f"Apoderado: {clean_text(resident_row['Apoderado'])}", 0, 1)
+    pdf.ln(3)
+    pdf.set_font("Arial", 'I', 9)
+    pdf.cell(0, 6, f"Reporte: {clean_text(label)} | Del {start} al {end}", 0, 1)
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(40, 8, "Fecha", 1)
+    pdf.cell(80, 8, "Insumo", 1)
+    pdf.cell(40, 8, "Gestion", 1)
+    pdf.cell(30, 8, "Cantidad", 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+    for _, row in df_consumos.iterrows():
+        f_str = row['Fecha'] if isinstance(row['Fecha'], str) else row['Fecha'].strftime("%Y-%m-%d %H:%M")
+        pdf.cell(40, 8, str(f_str), 1)
+        pdf.cell(80, 8, clean_text(row['NombreInsumo']), 1)
+        pdf.cell(40, 8, clean_text(row['Gestion']), 1)
+        pdf.cell(30, 8, str(row['Cantidad']), 1)
+        pdf.ln()
+    return pdf.output(dest='S').encode('latin-1')
+
+def generate_inventory_pdf_anterior(df_inv, user):
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "Inventario General", 0, 1, 'C')
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(0, 10, f"Generado por: {clean_text(user)} | {datetime.now().strftime('%d/%m/%Y')}", 0, 1, 'C')
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 9)
+    pdf.cell(70, 8, "Nombre", 1)
+    pdf.cell(30, 8, "Gestion", 1)
+    pdf.cell(30, 8, "Unidad", 1)
+    pdf.cell(30, 8, "Stock", 1)
+    pdf.cell(30, 8, "Minimo", 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+    for _, row in df_inv.iterrows():
+        pdf.cell(70, 8, clean_text(row['Nombre']), 1)
+        pdf.cell(30, 8, clean_text(row['Gestion']), 1)
+        pdf.cell(30, 8, clean_text(row['Unidad']), 1)
+        pdf.cell(30, 8, str(row['Stock']), 1)
+        pdf.cell(30, 8, str(row['StockMinimo']), 1)
+        pdf.ln()
+    return pdf.output(dest='S').encode('latin-1')
+
+def sin_fecha(pdf_bytes):
+    """El PDF incluye /CreationDate; se omite para comparar contenido"""
+    return re.sub(rb"/CreationDate \(D:\d+\)", b"", pdf_bytes)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--filas", type=int, default=10_000)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    df_inv = inventario(args.filas)
+    df_con = consumos(args.filas)
+    d0, d1 = date(2024, 1, 1), date(2024, 12, 31)
+    casos = [
+        ("inventario", (generate_inventory_pdf_anterior, generate_inventory_pdf), (df_inv, "admin")),
+        ("residente", (generate_pdf_anterior, generate_pdf), (RESIDENTE, df_con, d0, d1, "General (Todos)")),
+    ]
+    for nombre, (antes, despues), fn_args in casos:
+        t_a = medir(lambda: antes(*fn_args), args.repeticiones)["mediana_ms"]
+        t_d = medir(lambda: despues(*fn_args), args.repeticiones)["mediana_ms"]
+        igual = "idéntico" if sin_fecha(antes(*fn_args)) == sin_fecha(despues(*fn_args)) else "DISTINTO"
+        print(f"{nombre:<11} {args.filas} filas: iterrows {t_a:8.1f} ms | columnas {t_d:8.1f} ms | x{t_a / t_d:4.1f} | PDF {igual}")
+
+if __name__ == "__main__":
+    main()
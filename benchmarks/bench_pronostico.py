@@ -0,0 +1,59 @@
+"""Benchmark del pronóstico de consumo: historial completo desde movements vs ventana incremental.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_pronostico --movimientos 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+import db
+import forecast
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from dispense import dispense
+
+def pronostico_desde_movements(window=forecast.WINDOW_DAYS):
+    """Enfoque directo: leer todos los consumos y agrupar en pandas"""
+    with db.connection() as conn:
+        mov = pd.read_sql("SELECT Fecha, InsumoID, Cantidad FROM movements WHERE Tipo = 'CONSUMO'", conn)
+    mov['Dia'] = mov['Fecha'].str[:10]
+    desde = (date.today() - timedelta(days=window - 1)).isoformat()
+    return mov[(mov['Dia'] >= desde) & (mov['Dia'] <= date.today().isoformat())].groupby('InsumoID')['Cantidad'].sum() / window
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--insumos", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        generar(os.path.join(tmp, "pronostico.db"), insumos=args.insumos, movimientos=args.movimientos)
+        with db.connection() as conn:
+            dias = conn.execute("SELECT COUNT(DISTINCT Dia) FROM consumption_daily").fetchone()[0]
+            res_id = conn.execute("SELECT ID FROM residents LIMIT 1").fetchone()[0]
+            ins_id, nombre = conn.execute("SELECT ID, Nombre FROM inventory ORDER BY Stock DESC LIMIT 1").fetchone()
+        print(f"{args.movimientos} movimientos, {dias} días, {args.insumos} insumos (carga {time.perf_counter() - t0:.1f}s)")
+
+        # Una sola llamada por medición: cada una deja la caché del pronóstico en otro estado
+        t_mov = medir(pronostico_desde_movements, 1)["mediana_ms"]
+        print(f"Historial completo desde movements: {t_mov:.0f} ms")
+        t_ini = medir(forecast.get_forecast, 1)["mediana_ms"]
+        print(f"Primer cálculo (ventana desde consumption_daily): {t_ini:.0f} ms")
+        tasas, df = pronostico_desde_movements(), forecast.get_forecast()
+        iguales = (df.set_index('ID')['ConsumoDia'].reindex(tasas.index) - tasas).abs().max() < 0.01
+        print(f"Consumo diario coincide con el cálculo directo: {iguales}")
+
+        dispense(res_id, ins_id, nombre, 1)
+        t_inc = medir(forecast.get_forecast, 1)["mediana_ms"]
+        print(f"Recalculo incremental tras una dispensa: {t_inc:.0f} ms")
+        t_cache = medir(forecast.get_forecast, 1)["mediana_ms"]
+        print(f"Rerun sin cambios: {t_cache:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark de la página Reportes: pipeline pandas anterior vs consultas SQL indexadas.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_reportes --movimientos 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+import db
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from reports import get_report_residents, get_resident_consumos
+
+def reporte_pandas(d_ini, d_fin, gestion):
+    """Ruta anterior: SELECT * de las tres tablas + merges y máscaras en pandas"""
+    conn = db.get_db_connection()
+    df_inv = pd.read_sql("SELECT * FROM inventory", conn)
+    df_res = pd.read_sql("SELECT * FROM residents", conn)
+    df_mov = pd.read_sql("SELECT * FROM movements", conn)
+    conn.close()
+    df_inv['Gestion'] = df_inv['Gestion'].fillna('Farmacia').astype(str).str.strip()
+    df_merged = pd.merge(df_mov, df_inv[['ID', 'Gestion']], left_on='InsumoID', right_on='ID', how='left')
+    df_merged['Gestion'] = df_merged['Gestion'].fillna('Farmacia')
+    df_consumos = df_merged[df_merged['Tipo'] == 'CONSUMO'].copy()
+    df_consumos['FechaDT'] = pd.to_datetime(df_consumos['Fecha'], errors='coerce')
+    df_consumos = df_consumos.dropna(subset=['FechaDT'])
+    mask_date = (df_consumos['FechaDT'].dt.date >= d_ini) & (df_consumos['FechaDT'].dt.date <= d_fin)
+    df_final = df_consumos[mask_date]
+    if gestion:
+        df_final = df_final[df_final['Gestion'] == gestion]
+    df_final = df_final.assign(ResidenteID=df_final['ResidenteID'].astype(str))
+    df_view = pd.merge(df_final, df_res[['ID', 'Nombre', 'RUT', 'Piso', 'Habitacion', 'Apoderado']],
+                       left_on='ResidenteID', right_on='ID', how='left')
+    nombres = sorted(df_view['Nombre'].dropna().unique().tolist())
+    if not nombres:
+        return 0, 0
+    # Residentes por ID: el generador repite algunos nombres
+    return df_view['ResidenteID'].nunique(), len(df_view[df_view['Nombre'] == nombres[0]])
+
+def reporte_sql(d_ini, d_fin, gestion):
+    """Ruta nueva: lista de residentes + consumos del seleccionado, filtrados en SQL"""
+    df_enc = get_report_residents(d_ini, d_fin, gestion)
+    if df_enc.empty:
+        return 0, 0
+    return len(df_enc), len(get_resident_consumos(df_enc['ID'].iloc[0], d_ini, d_fin, gestion))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--dias", type=int, default=3 * 365)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        generar(os.path.join(tmp, "bench.db"), movimientos=args.movimientos, dias=args.dias)
+        print(f"Datos sintéticos: {args.movimientos} movimientos en {time.perf_counter() - t0:.1f}s")
+
+        hoy = date.today()
+        casos = [("mes actual", hoy.replace(day=1), hoy, None),
+                 ("mes actual / Farmacia", hoy.replace(day=1), hoy, "Farmacia"),
+                 ("último año", hoy - timedelta(days=365), hoy, None)]
+        for nombre, d_ini, d_fin, gestion in casos:
+            t_pd = medir(lambda: reporte_pandas(d_ini, d_fin, gestion), args.repeticiones)["mediana_ms"]
+            t_sql = medir(lambda: reporte_sql(d_ini, d_fin, gestion), args.repeticiones)["mediana_ms"]
+            r_pd, r_sql = reporte_pandas(d_ini, d_fin, gestion), reporte_sql(d_ini, d_fin, gestion)
+            ok = "OK" if r_pd == r_sql else f"DIFERENCIA {r_pd} vs {r_sql}"
+            print(f"{nombre:<24} pandas {t_pd:9.1f} ms | sql {t_sql:8.1f} ms | x{t_pd / t_sql:6.1f} | {ok}")
+
+if __name__ == "__main__":
+    main()
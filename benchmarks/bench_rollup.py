@@ -0,0 +1,70 @@
+"""Benchmark de totales por periodo: GROUP BY sobre movements vs resumen consumption_daily.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_rollup --movimientos 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+import db
+import rollup
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from reports import GESTION_SQL, _date_bounds
+
+def totales_residente_desde_movements(res_id, d_ini, d_fin):
+    desde, hasta = _date_bounds(d_ini, d_fin)
+    sql = f"""SELECT COALESCE(i.Nombre, m.InsumoID) AS Insumo, {GESTION_SQL} AS Gestion, COUNT(*) AS Entregas, SUM(m.Cantidad) AS Cantidad
+              FROM movements m LEFT JOIN inventory i ON i.ID = m.InsumoID
+              WHERE m.Tipo = 'CONSUMO' AND m.ResidenteID = ? AND m.Fecha >= ? AND m.Fecha < ?
+              GROUP BY m.InsumoID, Gestion ORDER BY Cantidad DESC"""
+    with db.connection() as conn:
+        return pd.read_sql(sql, conn, params=[res_id, desde, hasta])
+
+def resumen_desde_movements(d_ini, d_fin):
+    desde, hasta = _date_bounds(d_ini, d_fin)
+    sql = f"""SELECT r.Nombre AS Residente, COUNT(DISTINCT m.InsumoID) AS Insumos, COUNT(*) AS Entregas, SUM(m.Cantidad) AS Cantidad
+              FROM movements m JOIN residents r ON r.ID = m.ResidenteID
+              LEFT JOIN inventory i ON i.ID = m.InsumoID
+              WHERE m.Tipo = 'CONSUMO' AND m.Fecha >= ? AND m.Fecha < ?
+              GROUP BY m.ResidenteID ORDER BY r.Nombre"""
+    with db.connection() as conn:
+        return pd.read_sql(sql, conn, params=[desde, hasta])
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--movimientos", type=int, default=1_000_000)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        generar(os.path.join(tmp, "rollup.db"), movimientos=args.movimientos)
+        print(f"Datos sintéticos: {args.movimientos} movimientos en {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        filas = rollup.rebuild()
+        print(f"Reconstrucción completa: {filas} filas de resumen en {time.perf_counter() - t0:.1f}s")
+        with db.connection() as conn:
+            res_id = conn.execute("SELECT ResidenteID FROM movements WHERE Tipo = 'CONSUMO' LIMIT 1").fetchone()[0]
+
+        hoy = date.today()
+        n = args.repeticiones
+        for nombre, d0 in [("mes actual", hoy.replace(day=1)), ("último año", hoy - timedelta(days=365))]:
+            t_mov = medir(lambda: resumen_desde_movements(d0, hoy), n)["mediana_ms"]
+            t_rol = medir(lambda: rollup.get_period_summary(d0, hoy), n)["mediana_ms"]
+            a, b = resumen_desde_movements(d0, hoy), rollup.get_period_summary(d0, hoy)
+            igual = "OK" if a["Cantidad"].tolist() == b["Cantidad"].tolist() else "DIFERENCIA"
+            print(f"{nombre:<11} todos      movements {t_mov:8.1f} ms | resumen {t_rol:7.1f} ms | x{t_mov / t_rol:5.1f} | {igual}")
+            t_mov = medir(lambda: totales_residente_desde_movements(res_id, d0, hoy), n)["mediana_ms"]
+            t_rol = medir(lambda: rollup.get_resident_totals(res_id, d0, hoy), n)["mediana_ms"]
+            a, b = totales_residente_desde_movements(res_id, d0, hoy), rollup.get_resident_totals(res_id, d0, hoy)
+            igual = "OK" if sorted(a["Cantidad"].tolist()) == sorted(b["Cantidad"].tolist()) else "DIFERENCIA"
+            print(f"{nombre:<11} residente  movements {t_mov:8.1f} ms | resumen {t_rol:7.1f} ms | x{t_mov / t_rol:5.1f} | {igual}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark de sedes: dispensas concurrentes en una base compartida vs una base por sede,
+y consolidado de consumo consultando las sedes una tras otra vs en paralelo.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_sedes --sedes 8 --movimientos 500000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import db
+import sites
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from dispense import dispense
+from rollup import get_item_totals
+
+def dispensas(paths, por_sede):
+    """Una sesión (hilo) por sede, cada una dispensando sobre su base. Devuelve dispensas/s."""
+    with db.connection() as conn:
+        res = conn.execute("SELECT ID FROM residents LIMIT 1").fetchone()[0]
+        ins = [tuple(r) for r in conn.execute("SELECT ID, Nombre FROM inventory ORDER BY Stock DESC LIMIT 50")]
+    def sesion(path, n):
+        with db.using(path):
+            for k in range(por_sede):
+                i, nombre = ins[(n + k) % len(ins)]
+                dispense(res, i, nombre, 1)
+    hilos = [threading.Thread(target=sesion, args=(p, n)) for n, p in enumerate(paths)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return len(paths) * por_sede / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sedes", type=int, default=8)
+    ap.add_argument("--movimientos", type=int, default=500_000, help="movimientos por sede")
+    ap.add_argument("--dispensas", type=int, default=500, help="dispensas por sesión")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Todas las sedes parten de la misma base generada (copias del archivo)
+        base = os.path.join(tmp, "sede_0.db")
+        generar(base, movimientos=args.movimientos)
+        db.get_pool(base).close()
+        paths = [base] + [shutil.copy(base, os.path.join(tmp, f"sede_{n}.db")) for n in range(1, args.sedes)]
+        sedes = {f"Sede {n}": p for n, p in enumerate(paths)}
+        sites.init_sites(sedes)
+
+        # Con un solo núcleo los hilos no se solapan: se ve el costo por sede, no la aceleración
+        print(f"{os.cpu_count()} núcleos; {args.sedes} sesiones dispensando {args.dispensas} veces cada una")
+        print(f"  una base compartida:  {dispensas([base] * args.sedes, args.dispensas):8.0f} dispensas/s")
+        print(f"  una base por sede:    {dispensas(paths, args.dispensas):8.0f} dispensas/s")
+
+        d_fin = date.today()
+        d_ini = d_fin - timedelta(days=90)
+        print(f"Consumo consolidado de 90 días ({args.movimientos} movimientos por sede)")
+        print(f"{'sedes':>6} {'una tras otra':>14} {'en paralelo':>12} {'ms por sede':>12}")
+        n = 1
+        while n <= args.sedes:
+            sub = dict(list(sedes.items())[:n])
+            def secuencial():
+                for p in sub.values():
+                    with db.using(p):
+                        get_item_totals(d_ini, d_fin)
+            ms_sec = medir(secuencial, args.repeticiones)["mediana_ms"]
+            ms_par = medir(lambda: sites.consolidated_consumption(d_ini, d_fin, sites=sub), args.repeticiones)["mediana_ms"]
+            print(f"{n:>6} {ms_sec:>11.1f} ms {ms_par:>9.1f} ms {ms_par / n:>9.1f} ms")
+            n *= 2
+        for p in paths:
+            db.get_pool(p).close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmark de la exportación masiva: ZIP con un PDF por residente, variando procesos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_zip --residentes 150 --consumos 60 --workers 1 2 4
+"""
+import argparse
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date
+
+from benchmarks.generador import generar
+from benchmarks.suite import medir
+from bulk_reports import export_residents_zip
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--residentes", type=int, default=150)
+    ap.add_argument("--consumos", type=int, default=60, help="consumos por residente en el mes")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--split", action="store_true", help="separar por Gestión")
+    args = ap.parse_args()
+
+    hoy = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Solo el mes en curso: cada residente con ~--consumos movimientos en el periodo exportado
+        generar(os.path.join(tmp, "zip.db"), residentes=args.residentes, insumos=300,
+                movimientos=args.residentes * args.consumos, dias=hoy.day)
+        print(f"Núcleos disponibles: {os.cpu_count()}")
+        base = None
+        for w in args.workers:
+            salida = []
+            dur = medir(lambda: salida.append(export_residents_zip(hoy.replace(day=1), hoy, "General (Todos)",
+                                                                    split_gestion=args.split, workers=w)), 1)["mediana_ms"] / 1000
+            data = salida[0]
+            base = base or dur
+            n = len(zipfile.ZipFile(io.BytesIO(data)).namelist())
+            print(f"workers={w:<3} {n} PDF en {dur:6.2f}s | {len(data) / 2**20:5.1f} MB | aceleración x{base / dur:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Generador de datos sintéticos para farmacia.db (volúmenes y distribuciones configurables).
+
+Residentes con tratamientos fijos (varias dosis al día en horarios de ronda), popularidad
+de insumos tipo Zipf, menos actividad los fines de semana, reposiciones (ENTRADA) y
+reparto Farmacia / Enfermera Jefe configurable.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.generador --db bench.db --residentes 200 --insumos 5000 --movimientos 5000000
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import db
+import ledger
+
+NOMBRES = ["María", "José", "Ana", "Luis", "Carmen", "Jorge", "Rosa", "Pedro", "Elena", "Juan",
+           "Isabel", "Manuel", "Teresa", "Carlos", "Gloria", "Raúl", "Inés", "Hugo", "Olga", "Víctor"]
+APELLIDOS = ["González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez",
+             "Sepúlveda", "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya"]
+BASES = ["Paracetamol", "Ibuprofeno", "Omeprazol", "Losartán", "Metformina", "Atorvastatina", "Enalapril",
+         "Levotiroxina", "Quetiapina", "Sertralina", "Gasa", "Jeringa", "Pañal", "Guante", "Suero",
+         "Apósito", "Sonda", "Crema", "Alcohol", "Algodón", "Vitamina D", "Laxante", "Colirio"]
+PRESENTACIONES = ["10 mg", "20 mg", "50 mg", "100 mg", "500 mg", "1 g", "5 ml", "talla M", "talla L", "estéril"]
+HORARIOS = [8 * 60, 14 * 60, 20 * 60]   # rondas (minutos desde medianoche)
+
+def _residentes(rnd, n):
+    return [(f"R{i:05d}", f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+             f"{rnd.integers(5_000_000, 25_000_000)}-{rnd.integers(0, 10)}", str(rnd.integers(1, 5)),
+             str(rnd.integers(100, 140)), f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}") for i in range(n)]
+
+def _insumos(rnd, n, farmacia):
+    gestion = np.where(rnd.random(n) < farmacia, "Farmacia", "Enfermera Jefe")
+    unidades = rnd.choice(["unidades", "cajas", "ml", "mg"], n)
+    return [(f"I{i:06d}", f"{BASES[i % len(BASES)]} {PRESENTACIONES[(i // len(BASES)) % len(PRESENTACIONES)]} #{i}",
+             str(unidades[i]), int(rnd.integers(0, 500)), int(rnd.integers(5, 50)), str(gestion[i])) for i in range(n)]
+
+def _sin_triggers(conn, tabla):
+    """Quita los triggers de `tabla` y devuelve su SQL para recrearlos"""
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                            (tabla,)).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in triggers]
+
+def _movimientos(rnd, n, residentes, insumos, dias, entradas, por_residente, zipf):
+    """Filas de movements en orden cronológico, generadas por bloques de días"""
+    n_ins = len(insumos)
+    # Popularidad tipo Zipf: pocos insumos concentran la mayoría de las entregas
+    peso = 1.0 / np.arange(1, n_ins + 1) ** zipf
+    peso = rnd.permutation(peso / peso.sum())
+    tratamientos = np.array([rnd.choice(n_ins, por_residente, replace=False, p=peso) for _ in residentes])
+
+    hoy = date.today()
+    dias_fecha = [hoy - timedelta(days=dias - 1 - d) for d in range(dias)]
+    actividad = np.array([0.8 if d.weekday() >= 5 else 1.0 for d in dias_fecha])
+    por_dia = rnd.multinomial(n, actividad / actividad.sum())
+    hhmm = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)]
+    res_ids = [r[0] for r in residentes]
+    ins_ids = [i[0] for i in insumos]
+    ins_nom = [i[1] for i in insumos]
+
+    for d, cantidad in zip(dias_fecha, por_dia):
+        if not cantidad:
+            continue
+        dia = d.isoformat()
+        es_entrada = rnd.random(cantidad) < entradas
+        res = rnd.integers(0, len(residentes), cantidad)
+        # 90 % de las entregas siguen el tratamiento del residente, el resto es ocasional
+        ins = np.where(rnd.random(cantidad) < 0.9, tratamientos[res, rnd.integers(0, por_residente, cantidad)],
+                       rnd.choice(n_ins, cantidad, p=peso))
+        minuto = np.array(HORARIOS)[rnd.integers(0, len(HORARIOS), cantidad)] + rnd.integers(-30, 31, cantidad)
+        minuto = np.where(rnd.random(cantidad) < 0.05, rnd.integers(0, 24 * 60, cantidad), minuto)
+        cant = np.where(es_entrada, rnd.integers(10, 101, cantidad), rnd.choice([1, 1, 1, 1, 2, 3], cantidad))
+        orden = np.argsort(minuto, kind="stable")
+        for k in orden:
+            i = ins[k]
+            if es_entrada[k]:
+                yield (f"{dia} {hhmm[minuto[k]]}", "ENTRADA", None, ins_ids[i], ins_nom[i], int(cant[k]))
+            else:
+                yield (f"{dia} {hhmm[minuto[k]]}", "CONSUMO", res_ids[res[k]], ins_ids[i], ins_nom[i], int(cant[k]))
+
+def generar(path, residentes=200, insumos=5000, movimientos=500_000, dias=365, farmacia=0.6,
+            entradas=0.02, por_residente=6, zipf=1.1, seed=42):
+    """Crea (o reemplaza) la base en `path` con datos sintéticos. Deja db.DB_PATH apuntando a ella."""
+    rnd = np.random.default_rng(seed)
+    for f in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(f):
+            os.remove(f)
+    db.DB_PATH = path
+    db.init_db()
+    filas_res = _residentes(rnd, residentes)
+    filas_ins = _insumos(rnd, insumos, farmacia)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO residents VALUES (?,?,?,?,?,?)", filas_res)
+        conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?,?)", filas_ins)
+    # Carga masiva sin triggers por fila; después se recrean y se reconstruye el resumen
+    with db.transaction(immediate=True) as conn:
+        triggers = _sin_triggers(conn, "movements")
+        conn.executemany("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
+                         _movimientos(rnd, movimientos, filas_res, filas_ins, dias, entradas, min(por_residente, insumos), zipf))
+        for sql in triggers:
+            conn.execute(sql)
+        db.rebuild_consumption_daily(conn)
+        conn.execute("UPDATE table_versions SET Version = Version + 1 WHERE Tabla = 'movements'")
+    # El stock generado no sale de los movimientos: el contador pasa a ser la única base del libro
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM stock_snapshot_items")
+        conn.execute("DELETE FROM stock_snapshots")
+    ledger.take_snapshot('contador')
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+    return {"residentes": residentes, "insumos": insumos, "movimientos": movimientos, "dias": dias,
+            "farmacia": farmacia, "entradas": entradas, "por_residente": por_residente, "zipf": zipf, "seed": seed}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", default="bench.db", help="archivo a crear (se reemplaza si existe)")
+    ap.add_argument("--residentes", type=int, default=200)
+    ap.add_argument("--insumos", type=int, default=5000)
+    ap.add_argument("--movimientos", type=int, default=500_000)
+    ap.add_argument("--dias", type=int, default=365, help="días de historial hasta hoy")
+    ap.add_argument("--farmacia", type=float, default=0.6, help="fracción de insumos de Farmacia (resto Enfermera Jefe)")
+    ap.add_argument("--entradas", type=float, default=0.02, help="fracción de movimientos que son reposiciones")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    generar(args.db, args.residentes, args.insumos, args.movimientos, args.dias, args.farmacia, args.entradas, seed=args.seed)
+    print(f"{args.db}: {args.movimientos} movimientos en {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    main()
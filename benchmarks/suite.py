@@ -0,0 +1,180 @@
+"""Suite de benchmarks de las funciones principales sobre datos sintéticos, con salida JSON.
+
+Mide get_data_frames (frío y en caché), la consulta de Reportes, el ritmo de dispensa
+(lo que hace register_consumption), las dos importaciones de Excel y los dos PDF.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.suite --movimientos 500000 --salida base.json
+    python -m benchmarks.suite --db bench.db --reusar --salida nuevo.json
+    python -m benchmarks.suite --comparar base.json nuevo.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import db
+from benchmarks.generador import generar
+
+UMBRAL_REGRESION = 1.10   # más de 10 % más lento que la base
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+def medir(fn, repeticiones, antes=None):
+    """Tiempos en ms de `repeticiones` llamadas (antes() se ejecuta fuera de la medición)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return {"n": repeticiones, "min_ms": round(min(tiempos), 3), "mediana_ms": round(statistics.median(tiempos), 3),
+            "media_ms": round(statistics.fmean(tiempos), 3)}
+
+def _planilla(filas):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for fila in filas:
+        ws.append(fila)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+def correr(repeticiones, dispensas, filas_import):
+    import data_access
+    from data_access import get_data_frames, get_inventory
+    from dispense import dispense
+    from ingest import import_inventory_file, import_residents_file
+    from pdf_reports import generate_inventory_pdf, generate_pdf
+    from reports import get_report_residents, get_resident, get_resident_consumos, has_movements
+    from rollup import get_period_summary, get_resident_totals
+
+    r = {}
+    r["get_data_frames_frio"] = medir(get_data_frames, repeticiones, antes=data_access._frames.clear)
+    r["get_data_frames_cache"] = medir(get_data_frames, repeticiones)
+
+    # Reportes: mismo recorrido que la página (último mes, todas las gestiones)
+    d_fin = date.today()
+    d_ini = d_fin - timedelta(days=30)
+    residentes = get_report_residents(d_ini, d_fin)
+    res_id = residentes["ID"].iloc[0]
+    def reportes():
+        has_movements()
+        get_report_residents(d_ini, d_fin)
+        get_resident_consumos(res_id, d_ini, d_fin)
+        get_resident_totals(res_id, d_ini, d_fin)
+        get_period_summary(d_ini, d_fin)
+    r["reportes"] = medir(reportes, repeticiones)
+
+    # PDF del residente con el mes completo y del inventario completo
+    consumos = get_resident_consumos(res_id, d_ini, d_fin)
+    fila_res = get_resident(res_id)
+    r["pdf_residente"] = medir(lambda: generate_pdf(fila_res, consumos, d_ini, d_fin, "General (Todos)"), repeticiones)
+    r["pdf_residente"]["filas"] = len(consumos)
+    inv = get_inventory()
+    r["pdf_inventario"] = medir(lambda: generate_inventory_pdf(inv, "admin"), repeticiones)
+    r["pdf_inventario"]["filas"] = len(inv)
+
+    # Dispensa (register_consumption sin la capa de Streamlit): una transacción por entrega
+    ins = inv.nlargest(50, "Stock")[["ID", "Nombre"]].to_records(index=False)
+    res = residentes["ID"].tolist()
+    t0 = time.perf_counter()
+    for k in range(dispensas):
+        i = ins[k % len(ins)]
+        dispense(res[k % len(res)], i[0], i[1], 1)
+    seg = time.perf_counter() - t0
+    r["dispensa"] = {"n": dispensas, "por_segundo": round(dispensas / seg, 1), "media_ms": round(seg / dispensas * 1000, 3)}
+
+    # Importaciones: mitad de nombres existentes, mitad nuevos
+    nombres = inv["Nombre"].tolist()
+    xlsx_inv = _planilla([["Nombre", "Cantidad", "Gestion"]] +
+                         [[nombres[k % len(nombres)] if k % 2 else f"Nuevo insumo {k}", k % 50,
+                           "Farmacia" if k % 3 else "Enfermera Jefe"] for k in range(filas_import)])
+    r["importacion_inventario"] = medir(lambda: import_inventory_file(io.BytesIO(xlsx_inv), "inventario.xlsx"), 1)
+    r["importacion_inventario"]["filas"] = filas_import
+    xlsx_res = _planilla([["Nombre", "RUT", "Piso", "Habitacion", "Apoderado"]] +
+                         [[f"Residente nuevo {k}", f"{k}-K", "1", str(100 + k % 40), "Apoderado"] for k in range(filas_import)])
+    r["importacion_residentes"] = medir(lambda: import_residents_file(io.BytesIO(xlsx_res), "residentes.xlsx"), 1)
+    r["importacion_residentes"]["filas"] = filas_import
+    return r
+
+def comparar(base, nuevo, umbral=UMBRAL_REGRESION):
+    """Imprime la razón nuevo/base por benchmark; devuelve los nombres con regresión"""
+    a, b = json.load(open(base, encoding="utf-8")), json.load(open(nuevo, encoding="utf-8"))
+    print(f"base {a.get('commit')} ({a['fecha']}) vs nuevo {b.get('commit')} ({b['fecha']})")
+    if a["parametros"] != b["parametros"]:
+        print("Aviso: las bases sintéticas no tienen los mismos parámetros")
+    regresiones = []
+    for nombre, res in b["resultados"].items():
+        if nombre not in a["resultados"]:
+            continue
+        clave = "mediana_ms" if "mediana_ms" in res else "media_ms"
+        razon = res[clave] / a["resultados"][nombre][clave]
+        marca = "REGRESIÓN" if razon > umbral else ""
+        if marca:
+            regresiones.append(nombre)
+        print(f"{nombre:24} {a['resultados'][nombre][clave]:10.2f} -> {res[clave]:10.2f} ms  x{razon:5.2f} {marca}")
+    return regresiones
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", help="archivo de la base sintética (por defecto uno temporal)")
+    ap.add_argument("--reusar", action="store_true", help="usar --db tal como está, sin regenerarla")
+    ap.add_argument("--residentes", type=int, default=200)
+    ap.add_argument("--insumos", type=int, default=5000)
+    ap.add_argument("--movimientos", type=int, default=500_000)
+    ap.add_argument("--dias", type=int, default=365)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--dispensas", type=int, default=2000)
+    ap.add_argument("--filas-import", type=int, default=5000)
+    ap.add_argument("--salida", help="archivo JSON (por defecto se imprime)")
+    ap.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="comparar dos resultados JSON")
+    args = ap.parse_args()
+
+    if args.comparar:
+        sys.exit(1 if comparar(*args.comparar) else 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "suite.db")
+        t0 = time.perf_counter()
+        if args.reusar and args.db:
+            db.DB_PATH = path
+            db.init_db()
+            with db.connection() as conn:
+                parametros = {"db": path, "movimientos": conn.execute("SELECT COUNT(*) FROM movements").fetchone()[0]}
+        else:
+            parametros = generar(path, args.residentes, args.insumos, args.movimientos, args.dias, seed=args.seed)
+        t_gen = time.perf_counter() - t0
+        resultados = correr(args.repeticiones, args.dispensas, args.filas_import)
+
+    salida = {"fecha": datetime.now().isoformat(timespec="seconds"), "commit": _commit(),
+              "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "pandas": pd.__version__,
+              "parametros": parametros, "generacion_s": round(t_gen, 1), "resultados": resultados}
+    texto = json.dumps(salida, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+        print(f"Resultados en {args.salida}")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
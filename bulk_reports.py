@@ -0,0 +1,70 @@
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_reports import generate_pdf
+from perf import timed_fn
+from reports import get_period_consumos
+
+# --- EXPORTACIÓN MASIVA (TODOS LOS RESIDENTES EN UN ZIP) ---
+# Una consulta agrupada trae el periodo completo; cada PDF se renderiza en un
+# proceso aparte y se escribe en el ZIP apenas está listo.
+
+RESIDENT_COLS = ['Nombre', 'RUT', 'Piso', 'Habitacion', 'Apoderado']
+TABLE_COLS = ['Fecha', 'NombreInsumo', 'Gestion', 'Cantidad']
+
+def _safe_name(text):
+    return re.sub(r'[^\w\- ]+', '_', str(text)).strip() or 'residente'
+
+def _render(task):
+    """Worker: (ruta en el zip, datos del residente, consumos, desde, hasta, etiqueta) -> (ruta, bytes)"""
+    path, resident, df, start, end, label = task
+    return path, generate_pdf(resident, df, start, end, label)
+
+def _tasks(df, start, end, label, split_gestion):
+    usados = set()
+    for res_id, grupo in df.groupby('ResidenteID', sort=False):
+        resident = grupo.iloc[0][RESIDENT_COLS].to_dict()
+        base = _safe_name(resident['Nombre'])
+        if base in usados:
+            base = f"{base}_{_safe_name(res_id)}"
+        usados.add(base)
+        if split_gestion:
+            for gestion, sub in grupo.groupby('Gestion', sort=True):
+                yield (f"{_safe_name(gestion)}/Reporte_{base}.pdf", resident, sub[TABLE_COLS].reset_index(drop=True),
+                       start, end, f"Solo {gestion}")
+        else:
+            yield (f"Reporte_{base}.pdf", resident, grupo[TABLE_COLS].reset_index(drop=True), start, end, label)
+
+@timed_fn('pdf.zip')
+def export_residents_zip(d_ini, d_fin, label, gestion=None, split_gestion=False, workers=None, progress=None):
+    """ZIP (bytes) con un PDF por residente con consumos en el periodo.
+    split_gestion=True separa cada residente en una carpeta por Gestión.
+    workers=None usa un proceso por núcleo; workers=1 renderiza en este proceso.
+    progress(pdfs_escritos, total) se llama después de cada PDF."""
+    df = get_period_consumos(d_ini, d_fin, gestion)
+    tasks = _tasks(df, d_ini, d_fin, label, split_gestion)
+    total = len(df.groupby(['ResidenteID', 'Gestion'] if split_gestion else 'ResidenteID', sort=False)) if progress else None
+    workers = workers or os.cpu_count() or 1
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if workers == 1:
+            results = map(_render, tasks)
+            pool = None
+        else:
+            # spawn: no se copia el estado del servidor de Streamlit (hilos, conexiones) a los workers
+            ctx = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+            results = pool.map(_render, tasks, chunksize=4)
+        try:
+            for n, (path, pdf_bytes) in enumerate(results, 1):
+                zf.writestr(path, pdf_bytes)
+                if progress:
+                    progress(n, total)
+        finally:
+            if pool:
+                pool.shutdown()
+    return buf.getvalue()
@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+
+# --- CACHÉ EN MEMORIA (LRU) ---
+# Compartida por todas las sesiones del proceso. Las claves incluyen la versión
+# de las tablas (db.get_versions), así un cambio en la base nunca devuelve datos viejos.
+
+class LRUCache:
+    """Caché con tope de entradas: al llenarse descarta la usada hace más tiempo"""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, build):
+        """Valor en caché o build() si no está (build se ejecuta fuera del lock)"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = build()
+            self.set(key, value)
+        return value
+
+    def get_versioned(self, key_prefix, version, factory, params=()):
+        """Valor para (key_prefix, version, params), o factory() si no está. Antes descarta las
+        entradas del mismo key_prefix con otra versión: ya no se volverán a pedir."""
+        self.discard(lambda k: k[0] == key_prefix and k[1] != version)
+        return self.get_or_set((key_prefix, version, params), factory)
+
+    def discard(self, match):
+        """Elimina las entradas cuya clave cumple match(key)"""
+        with self._lock:
+            for key in [k for k in self._data if match(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,43 @@
+import pandas as pd
+
+import db
+from cache import LRUCache
+from db import connection, get_versions
+from perf import timed_fn
+
+# --- ACCESO A DATOS CON CACHÉ POR VERSIÓN ---
+# Cada tabla se lee una vez por versión (db.get_versions, en memoria) y se
+# comparte entre reruns y sesiones. Si nada cambió, un rerun no hace lecturas SQL.
+
+FRAME_CACHE_SIZE = 16
+
+_frames = LRUCache(FRAME_CACHE_SIZE)
+
+@timed_fn('db.tabla')
+def _read_table(name):
+    with connection() as conn:
+        return pd.read_sql(f"SELECT * FROM {name}", conn)
+
+def get_table(name):
+    """DataFrame de la tabla, desde caché mientras su versión no cambie"""
+    (version,) = get_versions(name)
+    # Las versiones anteriores de la misma tabla se descartan: ya no se volverán a pedir
+    df = _frames.get_versioned((db.current_path(), name), version, lambda: _read_table(name))
+    # Copia superficial: con copy-on-write, modificar el resultado no toca la caché
+    return df.copy(deep=False)
+
+def get_inventory():
+    return get_table('inventory')
+
+def get_residents():
+    return get_table('residents')
+
+def get_movements():
+    return get_table('movements')
+
+def get_data_frames():
+    """Inventario, residentes y movimientos (cacheados por versión de cada tabla)"""
+    return get_inventory(), get_residents(), get_movements()
+
+def cache_stats():
+    return {'hits': _frames.hits, 'misses': _frames.misses, 'entradas': len(_frames)}
@@ -0,0 +1,521 @@
+import contextvars
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from perf import CONNECTION_FACTORY
+
+# --- BASE DE DATOS (GESTIÓN ROBUSTA) ---
+
+DB_PATH = 'farmacia.db'
+
+# Archivo de la sede activa (una base por sede, ver sites.py). Va en un ContextVar: cada
+# sesión de Streamlit y cada hilo de trabajo usa su propia base sin pasarla por parámetro.
+# Sin sede elegida (una sola farmacia, CLI, benchmarks) se usa DB_PATH.
+_current_path = contextvars.ContextVar("db_path", default=None)
+
+# Ajustes por conexión: WAL deja leer mientras otro escribe, NORMAL evita un fsync
+# por commit (seguro con WAL) y busy_timeout espera el lock en vez de fallar.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",      # ~20 MB de caché de páginas
+    "PRAGMA mmap_size=268435456",    # 256 MB mapeados en memoria
+    "PRAGMA temp_store=MEMORY",
+)
+POOL_SIZE = 8
+
+# Formato de movements.Fecha (texto ISO: el orden de texto es el orden cronológico)
+FECHA_FMT = "%Y-%m-%d %H:%M"
+# Válida si reformatearla no la cambia. El modificador obliga a SQLite a normalizar la fecha:
+# sin él, strftime acepta días 29 a 31 en cualquier mes ('2024-02-30' pasaría tal cual).
+# IS y no =: con texto ilegible strftime da NULL, y un CHECK que da NULL se cumple.
+FECHA_VALIDA = "strftime('%Y-%m-%d %H:%M', Fecha, '+0 days') IS Fecha"
+
+# Tablas con contador de versión (ver get_versions)
+VERSIONED_TABLES = ('inventory', 'residents', 'movements', 'users')
+
+def current_path():
+    """Archivo de la base activa en este contexto"""
+    return _current_path.get() or DB_PATH
+
+def set_current_path(path):
+    """Fija la base activa del contexto actual (None = DB_PATH)"""
+    _current_path.set(path)
+
+@contextmanager
+def using(path):
+    """Bloque en el que connection()/transaction() van a la base `path`"""
+    token = _current_path.set(path)
+    try:
+        yield
+    finally:
+        _current_path.reset(token)
+
+def bind(fn):
+    """fn fijada a la base activa al crearla: para callbacks que Streamlit corre en otro hilo
+    (descargas diferidas, fragmentos) y para hilos de trabajo"""
+    path = current_path()
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with using(path):
+            return fn(*args, **kwargs)
+    return run
+
+def get_db_connection(path=None):
+    """Conexión nueva ya configurada (usar connection()/transaction() en la app)"""
+    # perf.TimedConnection registra cada consulta para el panel Rendimiento
+    conn = sqlite3.connect(path or current_path(), check_same_thread=False, factory=CONNECTION_FACTORY)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def generate_id():
+    return uuid.uuid4().hex
+
+class ConnectionPool:
+    """Conexiones reutilizables a un archivo SQLite, compartidas por todo el proceso"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_db_connection(self.path)
+
+    def release(self, conn):
+        # Nunca devolver al pool una transacción a medias
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    """Pool de la base `path` (por defecto la activa): uno por archivo, creado al primer uso"""
+    path = path or current_path()
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+@contextmanager
+def connection():
+    """Conexión del pool para lecturas (se devuelve al salir del bloque)"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def transaction(immediate=False):
+    """Conexión del pool dentro de una transacción: commit al salir, rollback si hay error.
+    immediate=True toma el lock de escritura al inicio (BEGIN IMMEDIATE)."""
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        refresh_versions(conn)
+
+# --- MIGRACIONES VERSIONADAS ---
+# Cada paso se aplica una sola vez y queda registrado en schema_version.
+# Para cambiar el esquema se agrega un paso nuevo al final de MIGRATIONS.
+
+def _m001_tablas_base(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS inventory
+                 (ID TEXT PRIMARY KEY, Nombre TEXT, Unidad TEXT, Stock INTEGER, StockMinimo INTEGER, Gestion TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS residents
+                 (ID TEXT PRIMARY KEY, Nombre TEXT, RUT TEXT, Piso TEXT, Habitacion TEXT, Apoderado TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS movements
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT, Fecha TEXT, Tipo TEXT, ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT, Cantidad INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (Username TEXT PRIMARY KEY, Password TEXT, Role TEXT)''')
+
+def _m002_columna_gestion(c):
+    # Asegurar columna Gestion (bases anteriores a la separación Farmacia / Enfermera Jefe)
+    try:
+        c.execute("SELECT Gestion FROM inventory LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE inventory ADD COLUMN Gestion TEXT DEFAULT 'Farmacia'")
+    # Rellenar nulos antiguos con Farmacia
+    c.execute("UPDATE inventory SET Gestion = 'Farmacia' WHERE Gestion IS NULL OR Gestion = ''")
+
+def _m003_indices_reportes(c):
+    # Índices para los filtros de Reportes (tipo + rango de fechas, residente, insumo)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_movements_tipo_fecha ON movements(Tipo, Fecha)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_movements_residente_fecha ON movements(ResidenteID, Fecha)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_movements_insumo ON movements(InsumoID)")
+
+def _m004_usuarios_por_defecto(c):
+    # Usuarios por defecto (Actualizado con los 4 perfiles)
+    c.execute('SELECT count(*) FROM users')
+    if c.fetchone()[0] == 0:
+        users = [
+            ("visita", "visita123", "Visita"),
+            ("farma", "farma2024", "Farmacia"),
+            ("enfermera", "enfermera2024", "Enfermera Jefe"),
+            ("admin", "admin2024", "Administrador")
+        ]
+        c.executemany('INSERT INTO users VALUES (?,?,?)', users)
+
+def _m005_indice_nombre_inventario(c):
+    # Búsqueda por nombre en la importación de Excel
+    c.execute("CREATE INDEX IF NOT EXISTS idx_inventory_nombre ON inventory(Nombre)")
+
+def _m006_indice_nombre_residentes(c):
+    # Búsqueda por nombre en la carga de residentes
+    c.execute("CREATE INDEX IF NOT EXISTS idx_residents_nombre ON residents(Nombre)")
+
+def _version_triggers(c, t):
+    for op in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{t}_{op.lower()}_version AFTER {op} ON {t}
+                      BEGIN UPDATE table_versions SET Version = Version + 1 WHERE Tabla = '{t}'; END""")
+
+def _m007_versiones_tablas(c):
+    # Contador por tabla, subido por triggers en cada escritura (sirve de clave de caché)
+    c.execute("CREATE TABLE IF NOT EXISTS table_versions (Tabla TEXT PRIMARY KEY, Version INTEGER NOT NULL DEFAULT 0)")
+    for t in VERSIONED_TABLES:
+        c.execute("INSERT OR IGNORE INTO table_versions VALUES (?, 0)", (t,))
+        _version_triggers(c, t)
+
+def _parse_fechas(fechas):
+    """Texto -> Timestamp (NaT si no se puede leer). Primero formatos ISO (año primero); el resto
+    como fechas chilenas, día primero: '05/01/2024' es el 5 de enero, no el 1 de mayo."""
+    import pandas as pd
+    iso = pd.to_datetime(fechas, errors='coerce', format='ISO8601')
+    resto = iso.isna() & fechas.notna()
+    if resto.any():
+        iso[resto] = pd.to_datetime(fechas[resto], errors='coerce', format='mixed', dayfirst=True)
+    return iso
+
+def _rebuild_movements(c):
+    """Recrea movements con el CHECK de FECHA_VALIDA vigente, conservando filas, índices,
+    triggers y la secuencia de IDs (SQLite no cambia el CHECK de una tabla existente)"""
+    seq = c.execute("SELECT seq FROM sqlite_sequence WHERE name='movements'").fetchone()
+    extras = [r[0] for r in c.execute("""SELECT sql FROM sqlite_master
+                                         WHERE tbl_name = 'movements' AND type IN ('index', 'trigger') AND sql IS NOT NULL""")]
+    c.execute(f'''CREATE TABLE movements_new
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT, Fecha TEXT NOT NULL CHECK ({FECHA_VALIDA}), Tipo TEXT,
+                  ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT, Cantidad INTEGER)''')
+    cols = "ID, Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad"
+    c.execute(f"INSERT INTO movements_new ({cols}) SELECT {cols} FROM movements ORDER BY ID")
+    c.execute("DROP TABLE movements")
+    c.execute("ALTER TABLE movements_new RENAME TO movements")
+    for sql in extras:
+        c.execute(sql)
+    if seq:
+        # No reutilizar IDs de movimientos borrados
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name='movements'", (seq[0],))
+
+def _m008_fecha_iso(c):
+    # movements.Fecha pasa a ser texto ISO validado por CHECK (ordenable e indexable tal cual).
+    # Las fechas en otro formato se normalizan; las que no se pueden leer van a cuarentena.
+    import pandas as pd
+    c.execute('''CREATE TABLE IF NOT EXISTS movements_quarantine
+                 (ID INTEGER PRIMARY KEY, Fecha TEXT, Tipo TEXT, ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT,
+                  Cantidad INTEGER, Motivo TEXT, Movido TEXT)''')
+    malas = c.execute(f"SELECT ID, Fecha FROM movements WHERE Fecha IS NULL OR NOT ({FECHA_VALIDA})").fetchall()
+    if malas:
+        ids = [row[0] for row in malas]
+        parsed = _parse_fechas(pd.Series([row[1] for row in malas], dtype=object))
+        c.executemany("UPDATE movements SET Fecha=? WHERE ID=?",
+                      [(ts.strftime(FECHA_FMT), i) for i, ts in zip(ids, parsed) if not pd.isna(ts)])
+        ilegibles = [i for i, ts in zip(ids, parsed) if pd.isna(ts)]
+        now = datetime.now().strftime(FECHA_FMT)
+        c.executemany("""INSERT INTO movements_quarantine
+                         SELECT ID, Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad, 'Fecha ilegible', ?
+                         FROM movements WHERE ID=?""", [(now, i) for i in ilegibles])
+        c.executemany("DELETE FROM movements WHERE ID=?", [(i,) for i in ilegibles])
+
+    _rebuild_movements(c)
+    _m003_indices_reportes(c)
+    _version_triggers(c, 'movements')
+
+# Gestión efectiva de un insumo (sin gestión o borrado = Farmacia, igual que en Reportes)
+def _gestion_sql(col):
+    return f"COALESCE(NULLIF(TRIM({col}), ''), 'Farmacia')"
+
+# Particiones anuales de movimientos archivados (ver archive.py)
+ARCHIVE_PREFIX = "movements_archive_"
+
+def movement_tables(c):
+    """movements más sus particiones de archivo, de la más antigua a la más nueva"""
+    rows = c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                     (ARCHIVE_PREFIX + "[0-9]*",)).fetchall()
+    return sorted(r[0] for r in rows) + ["movements"]
+
+def rebuild_consumption_daily(c):
+    """Recalcula consumption_daily completo desde movements y su archivo (triggers la mantienen al día después)"""
+    origen = " UNION ALL ".join(f"SELECT * FROM {t}" for t in movement_tables(c))
+    c.execute("DELETE FROM consumption_daily")
+    c.execute(f"""INSERT INTO consumption_daily (Dia, ResidenteID, InsumoID, Gestion, Cantidad, Movimientos)
+                  SELECT substr(m.Fecha, 1, 10), COALESCE(m.ResidenteID, ''), m.InsumoID, {_gestion_sql('i.Gestion')},
+                         SUM(m.Cantidad), COUNT(*)
+                  FROM ({origen}) m LEFT JOIN inventory i ON i.ID = m.InsumoID
+                  WHERE m.Tipo = 'CONSUMO'
+                  GROUP BY 1, 2, 3, 4""")
+
+def _m009_consumo_diario(c):
+    # Resumen diario por (día, residente, insumo, gestión), mantenido por triggers
+    # en la misma transacción que cada movimiento. La gestión es siempre la actual
+    # del insumo: si cambia (o se borra el insumo) sus filas se reasignan.
+    c.execute('''CREATE TABLE IF NOT EXISTS consumption_daily
+                 (Dia TEXT NOT NULL, ResidenteID TEXT NOT NULL, InsumoID TEXT, Gestion TEXT NOT NULL,
+                  Cantidad INTEGER NOT NULL, Movimientos INTEGER NOT NULL,
+                  PRIMARY KEY (Dia, ResidenteID, InsumoID, Gestion))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_consumption_daily_residente ON consumption_daily(ResidenteID, Dia)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_consumption_daily_insumo ON consumption_daily(InsumoID)")
+
+    def sumar(row, signo):
+        gestion = _gestion_sql(f"(SELECT Gestion FROM inventory WHERE ID = {row}.InsumoID)")
+        return f"""INSERT INTO consumption_daily (Dia, ResidenteID, InsumoID, Gestion, Cantidad, Movimientos)
+                   VALUES (substr({row}.Fecha, 1, 10), COALESCE({row}.ResidenteID, ''), {row}.InsumoID, {gestion},
+                           {signo}{row}.Cantidad, {signo}1)
+                   ON CONFLICT (Dia, ResidenteID, InsumoID, Gestion) DO UPDATE
+                   SET Cantidad = Cantidad + excluded.Cantidad, Movimientos = Movimientos + excluded.Movimientos;"""
+    limpiar = "DELETE FROM consumption_daily WHERE Movimientos <= 0;"
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_insert AFTER INSERT ON movements
+                  WHEN NEW.Tipo = 'CONSUMO' BEGIN {sumar('NEW', '')} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_delete AFTER DELETE ON movements
+                  WHEN OLD.Tipo = 'CONSUMO' BEGIN {sumar('OLD', '-')} {limpiar} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_update_old AFTER UPDATE ON movements
+                  WHEN OLD.Tipo = 'CONSUMO' BEGIN {sumar('OLD', '-')} {limpiar} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_movements_rollup_update_new AFTER UPDATE ON movements
+                  WHEN NEW.Tipo = 'CONSUMO' BEGIN {sumar('NEW', '')} END""")
+
+    def reasignar(item_id, gestion):
+        return f"""INSERT INTO consumption_daily (Dia, ResidenteID, InsumoID, Gestion, Cantidad, Movimientos)
+                   SELECT Dia, ResidenteID, InsumoID, {gestion}, SUM(Cantidad), SUM(Movimientos)
+                   FROM consumption_daily WHERE InsumoID = {item_id} AND Gestion != {gestion}
+                   GROUP BY Dia, ResidenteID, InsumoID
+                   ON CONFLICT (Dia, ResidenteID, InsumoID, Gestion) DO UPDATE
+                   SET Cantidad = Cantidad + excluded.Cantidad, Movimientos = Movimientos + excluded.Movimientos;
+                   DELETE FROM consumption_daily WHERE InsumoID = {item_id} AND Gestion != {gestion};"""
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_inventory_rollup_gestion AFTER UPDATE OF Gestion ON inventory
+                  BEGIN {reasignar('NEW.ID', _gestion_sql('NEW.Gestion'))} END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_inventory_rollup_delete AFTER DELETE ON inventory
+                  BEGIN {reasignar('OLD.ID', "'Farmacia'")} END""")
+    rebuild_consumption_daily(c)
+
+# Columnas con búsqueda de texto por tabla (la primera es la que se muestra)
+SEARCH_COLUMNS = {'inventory': ('Nombre',), 'residents': ('Nombre', 'RUT')}
+
+def _m010_busqueda_fts(c):
+    # Índices FTS5 (external content) para buscar por nombre mientras se escribe.
+    # Se enlazan por rowid y se mantienen con triggers; los cambios de stock no los tocan.
+    # Las tablas no tienen INTEGER PRIMARY KEY, así que tras un VACUUM hay que
+    # reconstruirlos (search.rebuild_index()).
+    for t, cols in SEARCH_COLUMNS.items():
+        try:
+            c.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {t}_fts
+                          USING fts5({', '.join(cols)}, content = '{t}', content_rowid = 'rowid',
+                                     tokenize = 'unicode61 remove_diacritics 2')""")
+        except sqlite3.OperationalError:
+            # SQLite sin FTS5: search.py recurre a LIKE
+            return
+        campos = ', '.join(cols)
+        nuevos = ', '.join(f"NEW.{col}" for col in cols)
+        viejos = ', '.join(f"OLD.{col}" for col in cols)
+        borrar = f"INSERT INTO {t}_fts ({t}_fts, rowid, {campos}) VALUES ('delete', OLD.rowid, {viejos});"
+        insertar = f"INSERT INTO {t}_fts (rowid, {campos}) VALUES (NEW.rowid, {nuevos});"
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_insert AFTER INSERT ON {t}
+                      BEGIN {insertar} END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_update AFTER UPDATE OF {campos} ON {t}
+                      BEGIN {borrar} {insertar} END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_delete AFTER DELETE ON {t}
+                      BEGIN {borrar} END""")
+        c.execute(f"INSERT INTO {t}_fts ({t}_fts) VALUES ('rebuild')")
+
+# Contadores de lo que muestran los selectores (nombres, gestión, RUT), sin Stock:
+# las listas de opciones solo se rearman cuando cambia alguna de estas columnas.
+LABEL_VERSIONS = {'inventory': ('inventory_labels', ('Nombre', 'Gestion')),
+                  'residents': ('residents_labels', ('Nombre', 'RUT'))}
+
+def _m011_versiones_etiquetas(c):
+    for t, (nombre, cols) in LABEL_VERSIONS.items():
+        c.execute("INSERT OR IGNORE INTO table_versions VALUES (?, 0)", (nombre,))
+        subir = f"BEGIN UPDATE table_versions SET Version = Version + 1 WHERE Tabla = '{nombre}'; END"
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_insert_version AFTER INSERT ON {t} {subir}")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_delete_version AFTER DELETE ON {t} {subir}")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_update_version AFTER UPDATE OF ID, {', '.join(cols)} ON {t} {subir}")
+
+def _m012_stock_bajo(c):
+    # Insumos con Stock <= StockMinimo, mantenidos por triggers en la misma transacción
+    # que cada cambio de stock: la alerta se lee de esta tabla (pocas filas) sin recorrer
+    # inventory. Desde = cuándo bajó del mínimo (se conserva mientras siga bajo).
+    c.execute("CREATE TABLE IF NOT EXISTS low_stock (ID TEXT PRIMARY KEY, Desde TEXT NOT NULL)")
+    c.execute("INSERT OR IGNORE INTO table_versions VALUES ('low_stock', 0)")
+    _version_triggers(c, 'low_stock')
+    bajo = "NEW.StockMinimo IS NOT NULL AND COALESCE(NEW.Stock, 0) <= NEW.StockMinimo"
+    marcar = f"""INSERT OR IGNORE INTO low_stock SELECT NEW.ID, strftime('%Y-%m-%d %H:%M', 'now', 'localtime')
+                 WHERE {bajo};"""
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_inventory_low_stock_insert AFTER INSERT ON inventory BEGIN {marcar} END")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_inventory_low_stock_update AFTER UPDATE OF ID, Stock, StockMinimo ON inventory
+                  BEGIN DELETE FROM low_stock WHERE ID = OLD.ID AND (OLD.ID IS NOT NEW.ID OR NOT ({bajo})); {marcar} END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_inventory_low_stock_delete AFTER DELETE ON inventory
+                 BEGIN DELETE FROM low_stock WHERE ID = OLD.ID; END""")
+    c.execute("""INSERT OR IGNORE INTO low_stock
+                 SELECT ID, strftime('%Y-%m-%d %H:%M', 'now', 'localtime') FROM inventory
+                 WHERE StockMinimo IS NOT NULL AND COALESCE(Stock, 0) <= StockMinimo""")
+
+def _m013_archivo_movimientos(c):
+    # Catálogo de meses cerrados que archive.py movió a las particiones movements_archive_AAAA
+    c.execute('''CREATE TABLE IF NOT EXISTS movements_archive_periods
+                 (Periodo TEXT PRIMARY KEY, Tabla TEXT NOT NULL, Movimientos INTEGER NOT NULL, Archivado TEXT NOT NULL)''')
+    c.execute("INSERT OR IGNORE INTO table_versions VALUES ('movements_archive_periods', 0)")
+    _version_triggers(c, 'movements_archive_periods')
+
+def _m014_trabajos(c):
+    # Trabajos en segundo plano (jobs.py): importaciones y exportaciones con su avance
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (ID TEXT PRIMARY KEY, Tipo TEXT NOT NULL, Descripcion TEXT, Usuario TEXT,
+                  Estado TEXT NOT NULL CHECK (Estado IN ('PENDIENTE', 'EN CURSO', 'OK', 'ERROR')),
+                  Progreso REAL NOT NULL DEFAULT 0, Mensaje TEXT, Resultado TEXT, Archivo TEXT,
+                  Creado TEXT NOT NULL, Inicio TEXT, Fin TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_usuario_creado ON jobs(Usuario, Creado)")
+
+def _m015_fotos_stock(c):
+    # Fotos periódicas del stock por insumo (ledger.py). HastaID es el último movimiento
+    # incluido: el stock a otra fecha es la foto más cercana más los movimientos entre medio.
+    c.execute('''CREATE TABLE IF NOT EXISTS stock_snapshots
+                 (ID INTEGER PRIMARY KEY, Fecha TEXT NOT NULL, HastaID INTEGER NOT NULL,
+                  Insumos INTEGER NOT NULL, Deriva INTEGER NOT NULL, Origen TEXT NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS stock_snapshot_items
+                 (SnapshotID INTEGER NOT NULL, InsumoID TEXT NOT NULL, Stock INTEGER NOT NULL,
+                  PRIMARY KEY (SnapshotID, InsumoID)) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stock_snapshots_fecha ON stock_snapshots(Fecha)")
+    # Foto base: el contador actual (los movimientos anteriores no explican todo el stock,
+    # las importaciones no los registraban)
+    c.execute("""INSERT INTO stock_snapshots (Fecha, HastaID, Insumos, Deriva, Origen)
+                 SELECT strftime('%Y-%m-%d %H:%M', 'now', 'localtime'),
+                        COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'movements'), 0),
+                        (SELECT COUNT(*) FROM inventory), 0, 'contador'""")
+    c.execute("""INSERT INTO stock_snapshot_items
+                 SELECT (SELECT MAX(ID) FROM stock_snapshots), ID, COALESCE(Stock, 0) FROM inventory""")
+
+def _m016_fecha_dia_valido(c):
+    # El CHECK anterior (GLOB + datetime()) dejaba pasar días inexistentes como '2024-02-30'.
+    # Esas filas van a cuarentena (los triggers descuentan su consumo del resumen diario) y
+    # movements se reconstruye con el CHECK nuevo. Las particiones de archivo no se tocan.
+    now = datetime.now().strftime(FECHA_FMT)
+    c.execute(f"""INSERT INTO movements_quarantine
+                   SELECT ID, Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad, 'Fecha inexistente', ?
+                   FROM movements WHERE NOT ({FECHA_VALIDA})""", (now,))
+    c.execute(f"DELETE FROM movements WHERE NOT ({FECHA_VALIDA})")
+    _rebuild_movements(c)
+
+def _m017_version_fotos_stock(c):
+    # Las vistas del libro (ledger.py) se cachean por versión de las fotos
+    c.execute("INSERT OR IGNORE INTO table_versions VALUES ('stock_snapshots', 0)")
+    _version_triggers(c, 'stock_snapshots')
+
+MIGRATIONS = [
+    (1, "Tablas base", _m001_tablas_base),
+    (2, "Columna Gestion en inventory", _m002_columna_gestion),
+    (3, "Indices de movements para Reportes", _m003_indices_reportes),
+    (4, "Usuarios por defecto", _m004_usuarios_por_defecto),
+    (5, "Indice por nombre en inventory", _m005_indice_nombre_inventario),
+    (6, "Indice por nombre en residents", _m006_indice_nombre_residentes),
+    (7, "Versiones por tabla", _m007_versiones_tablas),
+    (8, "Fecha ISO validada en movements", _m008_fecha_iso),
+    (9, "Resumen diario de consumos", _m009_consumo_diario),
+    (10, "Busqueda FTS5 por nombre", _m010_busqueda_fts),
+    (11, "Versiones de etiquetas de selectores", _m011_versiones_etiquetas),
+    (12, "Tabla low_stock de insumos bajo minimo", _m012_stock_bajo),
+    (13, "Catalogo del archivo de movimientos", _m013_archivo_movimientos),
+    (14, "Tabla jobs de trabajos en segundo plano", _m014_trabajos),
+    (15, "Fotos periodicas del stock", _m015_fotos_stock),
+    (16, "Fecha con dia valido en movements", _m016_fecha_dia_valido),
+    (17, "Version de stock_snapshots", _m017_version_fotos_stock),
+]
+
+# Copia en memoria de table_versions por archivo, para que los lectores no vayan a la base.
+# Se refresca tras cada commit de transaction(), al migrar, y cuando cambia el archivo
+# de la base o su WAL (escrituras de otros procesos); revisarlo es un stat, no una consulta.
+_versions = {}
+
+def _file_stamp(path):
+    """Tamaño y mtime de la base y su WAL: cambian con cualquier escritura"""
+    stamp = []
+    for f in (path, path + "-wal"):
+        try:
+            s = os.stat(f)
+            stamp.append((s.st_size, s.st_mtime_ns))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def refresh_versions(conn=None):
+    """Relee table_versions (una consulta de pocas filas) y actualiza la copia en memoria"""
+    path = current_path()
+    # El stamp se toma antes de leer: una escritura concurrente fuerza otro refresh
+    stamp = _file_stamp(path)
+    try:
+        if conn is None:
+            with connection() as c:
+                versions = dict(c.execute("SELECT Tabla, Version FROM table_versions").fetchall())
+        else:
+            versions = dict(conn.execute("SELECT Tabla, Version FROM table_versions").fetchall())
+    except sqlite3.OperationalError:
+        # Base aún sin migración 7
+        versions = {}
+    _versions[path] = (stamp, versions)
+    return versions
+
+def get_versions(*tables):
+    """Versión actual de cada tabla pedida; cambia con cualquier INSERT/UPDATE/DELETE"""
+    path = current_path()
+    stamp, versions = _versions.get(path, (None, None))
+    if versions is None or stamp != _file_stamp(path):
+        versions = refresh_versions()
+    return tuple(versions.get(t, 0) for t in tables)
+
+def get_schema_version(conn):
+    row = conn.execute("SELECT MAX(Version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def init_db():
+    """Aplica las migraciones pendientes y devuelve la versión final del esquema"""
+    with connection() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                        (Version INTEGER PRIMARY KEY, Descripcion TEXT, Aplicada TEXT)''')
+        version = get_schema_version(conn)
+        for num, desc, step in MIGRATIONS:
+            if num <= version:
+                continue
+            # Cada paso en su propia transacción: si falla, no queda a medias
+            with conn:
+                conn.execute("BEGIN")
+                step(conn.cursor())
+                conn.execute("INSERT INTO schema_version VALUES (?,?,?)",
+                             (num, desc, datetime.now().strftime("%Y-%m-%d %H:%M")))
+            version = num
+        refresh_versions(conn)
+        return version
@@ -0,0 +1,70 @@
+from collections import namedtuple
+from datetime import datetime
+
+from db import transaction
+from perf import timed_fn
+
+# --- MOTOR DE DISPENSACIÓN (DESCUENTO ATÓMICO) ---
+# El descuento es condicional (Stock >= cantidad) y se hace dentro de
+# BEGIN IMMEDIATE, así dos enfermeras dispensando el mismo insumo a la vez
+# nunca dejan el stock negativo, aunque ambas vieran el mismo stock en pantalla.
+
+OK = 'OK'
+SIN_STOCK = 'SIN_STOCK'
+NO_EXISTE = 'NO_EXISTE'
+
+# status: OK / SIN_STOCK / NO_EXISTE; stock: disponible al momento del rechazo (None si OK)
+DispenseResult = namedtuple('DispenseResult', ['status', 'stock'])
+
+@timed_fn('db.dispensa')
+def dispense(res_id, ins_id, ins_name, qty):
+    """Descuenta qty del insumo y registra el CONSUMO en una sola transacción"""
+    if qty <= 0:
+        raise ValueError("La cantidad debe ser positiva")
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with transaction(immediate=True) as conn:
+        cur = conn.execute("UPDATE inventory SET Stock = Stock - ? WHERE ID = ? AND Stock >= ?", (qty, ins_id, qty))
+        if cur.rowcount == 0:
+            # Solo en el camino de rechazo se consulta el stock real para informarlo
+            row = conn.execute("SELECT Stock FROM inventory WHERE ID = ?", (ins_id,)).fetchone()
+            if row is None:
+                return DispenseResult(NO_EXISTE, None)
+            return DispenseResult(SIN_STOCK, row['Stock'])
+        conn.execute("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
+                     (now, 'CONSUMO', res_id, ins_id, ins_name, qty))
+    return DispenseResult(OK, None)
+
+@timed_fn('db.ronda')
+def dispense_batch(lines):
+    """Ronda de dispensación: lista de (res_id, ins_id, ins_name, qty) en una sola transacción.
+    Las líneas sin stock suficiente se rechazan (en orden) y el resto se aplica.
+    Devuelve un DispenseResult por línea, en el mismo orden."""
+    if not lines:
+        return []
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    ids = sorted({ins_id for _, ins_id, _, _ in lines})
+    results = []
+    with transaction(immediate=True) as conn:
+        # Una sola lectura de stock; con el lock de escritura tomado no puede cambiar.
+        # Stock NULL (importaciones antiguas) cuenta como 0: SIN_STOCK, como en dispense.
+        marks = ",".join("?" * len(ids))
+        disponible = {r['ID']: r['Stock'] for r in
+                      conn.execute(f"SELECT ID, COALESCE(Stock, 0) AS Stock FROM inventory WHERE ID IN ({marks})", ids)}
+        descuento = {}
+        movs = []
+        for res_id, ins_id, ins_name, qty in lines:
+            if qty <= 0:
+                raise ValueError("La cantidad debe ser positiva")
+            if ins_id not in disponible:
+                results.append(DispenseResult(NO_EXISTE, None))
+            elif disponible[ins_id] < qty:
+                results.append(DispenseResult(SIN_STOCK, disponible[ins_id]))
+            else:
+                disponible[ins_id] -= qty
+                descuento[ins_id] = descuento.get(ins_id, 0) + qty
+                movs.append((now, 'CONSUMO', res_id, ins_id, ins_name, qty))
+                results.append(DispenseResult(OK, None))
+        conn.executemany("UPDATE inventory SET Stock = Stock - ? WHERE ID = ? AND Stock >= ?",
+                         [(q, i, q) for i, q in descuento.items()])
+        conn.executemany("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)", movs)
+    return results
@@ -1,10 +1,23 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 from datetime import datetime, date
-from fpdf import FPDF
-import uuid
-import io
+
+from alerts import low_stock_count, get_reorder_list, reorder_csv
+from archive import archive_closed_months, get_archive_periods, cutoff, ARCHIVE_MONTHS
+from data_access import get_inventory, get_table, cache_stats
+from db import connection, transaction, generate_id, get_versions, using, bind, set_current_path
+from forecast import get_forecast, get_gestion_forecast, WINDOW_DAYS, SHORT_DAYS, LEAD_DAYS
+from dispense import dispense, dispense_batch, OK, SIN_STOCK, NO_EXISTE
+from ledger import inventory_at, reconcile, take_snapshot, snapshot_if_due, get_snapshots
+from parquet_export import get_export_state, export_zip
+from jobs import submit_import, submit_zip_export, submit_parquet_export, get_job, job_file, import_result, list_jobs, JOB_WORKERS
+from perf import begin_page, end_page, ops_summary, queries_summary, profile_bytes, last_profile
+import perf
+from pdf_reports import generate_pdf, generate_inventory_pdf, cached_pdf
+from reports import has_movements, get_report_residents, get_resident_consumos, get_resident
+from rollup import get_period_summary, get_resident_totals
+from search import search_inventory, search_residents, search_options, get_stock, PAGE_SIZE
+from sites import load_sites, init_sites, consolidated_consumption, consolidated_low_stock
 
 # --- 1. CONFIGURACIÓN ---
 st.set_page_config(
@@ -13,166 +26,132 @@ st.set_page_config(
     page_icon="🏥"
 )
 
-# --- 2. BASE DE DATOS (GESTIÓN ROBUSTA) ---
+# --- 2. BASE DE DATOS ---
 
-def get_db_connection():
-    conn = sqlite3.connect('farmacia.db', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Una base por sede (sites.py); sin sedes.json, una sola sobre farmacia.db
+SITES = load_sites()
+MULTI_SEDE = len(SITES) > 1
 
-def init_db():
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Crear tablas
-    c.execute('''CREATE TABLE IF NOT EXISTS inventory
-                 (ID TEXT PRIMARY KEY, Nombre TEXT, Unidad TEXT, Stock INTEGER, StockMinimo INTEGER, Gestion TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS residents
-                 (ID TEXT PRIMARY KEY, Nombre TEXT, RUT TEXT, Piso TEXT, Habitacion TEXT, Apoderado TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS movements
-                 (ID INTEGER PRIMARY KEY AUTOINCREMENT, Fecha TEXT, Tipo TEXT, ResidenteID TEXT, InsumoID TEXT, NombreInsumo TEXT, Cantidad INTEGER)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (Username TEXT PRIMARY KEY, Password TEXT, Role TEXT)''')
-    
-    # Migración: Asegurar columna Gestion
-    try:
-        c.execute("SELECT Gestion FROM inventory LIMIT 1")
-    except sqlite3.OperationalError:
-        c.execute("ALTER TABLE inventory ADD COLUMN Gestion TEXT DEFAULT 'Farmacia'")
-    
-    # Migración: Rellenar nulos antiguos con Farmacia
-    c.execute("UPDATE inventory SET Gestion = 'Farmacia' WHERE Gestion IS NULL OR Gestion = ''")
-    
-    # Usuarios por defecto (Actualizado con los 4 perfiles)
-    c.execute('SELECT count(*) FROM users')
-    if c.fetchone()[0] == 0:
-        users = [
-            ("visita", "visita123", "Visita"),
-            ("farma", "farma2024", "Farmacia"),
-            ("enfermera", "enfermera2024", "Enfermera Jefe"),
-            ("admin", "admin2024", "Administrador")
-        ]
-        c.executemany('INSERT INTO users VALUES (?,?,?)', users)
-    
-    conn.commit()
-    conn.close()
+@st.cache_resource
+def setup_db(paths):
+    """Migraciones una sola vez por proceso y sede (no en cada rerun)"""
+    return init_sites(dict(zip(SITES, paths)))
+
+setup_db(tuple(SITES.values()))
 
-init_db()
+# Cada rerun corre sobre la base de la sede de la sesión
+set_current_path(SITES.get(st.session_state.get('site')))
 
 # --- 3. LOGICA DE NEGOCIO (FILTRADO PYTHON) ---
 
-def get_data_frames():
-    """Extrae toda la data cruda para procesarla con Pandas (Más seguro que SQL complejo)"""
-    conn = get_db_connection()
-    df_inv = pd.read_sql("SELECT * FROM inventory", conn)
-    df_res = pd.read_sql("SELECT * FROM residents", conn)
-    df_mov = pd.read_sql("SELECT * FROM movements", conn)
-    conn.close()
-    return df_inv, df_res, df_mov
+# Opciones del filtro de Reportes -> valor de Gestion (None = todos)
+FILTROS_GESTION = {
+    "General (Todos)": None,
+    "Solo Farmacia": "Farmacia",
+    "Solo Enfermera Jefe": "Enfermera Jefe",
+}
 
 def register_consumption(res_id, ins_id, ins_name, qty):
-    conn = get_db_connection()
     try:
-        # Descontar stock
-        conn.execute("UPDATE inventory SET Stock = Stock - ? WHERE ID = ?", (qty, ins_id))
-        # Registrar movimiento
-        now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        conn.execute("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
-                     (now, 'CONSUMO', res_id, ins_id, ins_name, qty))
-        conn.commit()
-        return True
+        result = dispense(res_id, ins_id, ins_name, qty)
     except Exception as e:
         st.error(f"Error DB: {e}")
         return False
-    finally:
-        conn.close()
-
-# --- 4. GENERACIÓN PDF ---
+    if result.status == SIN_STOCK:
+        st.error(f"Stock insuficiente (disponible: {result.stock})")
+    elif result.status == NO_EXISTE:
+        st.error("El insumo ya no existe")
+    return result.status == OK
 
-def clean_text(text):
+def register_consumptions(batch):
+    """Ronda completa [(res_id, ins_id, ins_name, qty), ...] en una transacción.
+    Devuelve un DispenseResult por línea (None si falló la base de datos)."""
     try:
-        return str(text).encode('latin-1', 'replace').decode('latin-1')
-    except:
-        return str(text)
+        return dispense_batch(batch)
+    except Exception as e:
+        st.error(f"Error DB: {e}")
+        return None
 
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Farmacia Ac - Reporte Oficial', 0, 1, 'C')
-        self.ln(5)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+def _job_progress(job_id):
+    job = get_job(job_id)
+    if job['Estado'] not in ('PENDIENTE', 'EN CURSO'):
+        st.rerun()   # terminó: recarga la página completa (datos nuevos) y deja de consultar
+    texto = "En cola..." if job['Estado'] == 'PENDIENTE' else f"{job['Descripcion']}... {job['Mensaje'] or ''}"
+    st.progress(job['Progreso'], text=texto)
 
-def generate_pdf(resident_row, df_consumos, start, end, label):
-    pdf = PDF()
-    pdf.add_page()
-    
-    # Info Residente
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, f"Residente: {clean_text(resident_row['Nombre'])}", 0, 1)
-    
-    pdf.set_font("Arial", size=10)
-    pdf.cell(0, 6, f"RUT: {resident_row['RUT']}", 0, 1)
-    pdf.cell(0, 6, f"Ubicacion: Piso {clean_text(resident_row['Piso'])} - Hab {clean_text(resident_row['Habitacion'])}", 0, 1)
-    pdf.cell(0, 6, f"Apoderado: {clean_text(resident_row['Apoderado'])}", 0, 1)
-    pdf.ln(3)
-    
-    pdf.set_font("Arial", 'I', 9)
-    pdf.cell(0, 6, f"Reporte: {clean_text(label)} | Del {start} al {end}", 0, 1)
-    pdf.ln(5)
-    
-    # Tabla
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(40, 8, "Fecha", 1)
-    pdf.cell(80, 8, "Insumo", 1)
-    pdf.cell(40, 8, "Gestion", 1)
-    pdf.cell(30, 8, "Cantidad", 1)
-    pdf.ln()
-    
-    pdf.set_font("Arial", size=9)
-    for _, row in df_consumos.iterrows():
-        # Fecha limpia
-        f_str = row['Fecha'] if isinstance(row['Fecha'], str) else row['Fecha'].strftime("%Y-%m-%d %H:%M")
-        
-        pdf.cell(40, 8, str(f_str), 1)
-        pdf.cell(80, 8, clean_text(row['NombreInsumo']), 1)
-        pdf.cell(40, 8, clean_text(row['Gestion']), 1)
-        pdf.cell(30, 8, str(row['Cantidad']), 1)
-        pdf.ln()
-        
-    return pdf.output(dest='S').encode('latin-1')
+def job_status(key):
+    """Trabajo en segundo plano guardado en st.session_state[key]. Mientras corre muestra el
+    avance (se refresca cada segundo sin recargar la página); terminado, devuelve la fila."""
+    job_id = st.session_state.get(key)
+    job = get_job(job_id) if job_id else None
+    if job is None:
+        st.session_state.pop(key, None)
+        return None
+    if job['Estado'] in ('PENDIENTE', 'EN CURSO'):
+        # El fragmento se refresca sin volver a correr el script: lleva fijada la base de la sede
+        st.fragment(bind(_job_progress), run_every=1)(job_id)
+        return None
+    if job['Estado'] == 'ERROR':
+        st.error(f"Error: {job['Mensaje']}")
+        st.session_state.pop(key)
+        return None
+    return job
 
-def generate_inventory_pdf(df_inv, user):
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Inventario General", 0, 1, 'C')
-    pdf.set_font("Arial", 'I', 10)
-    pdf.cell(0, 10, f"Generado por: {clean_text(user)} | {datetime.now().strftime('%d/%m/%Y')}", 0, 1, 'C')
-    pdf.ln(5)
-    
-    pdf.set_font("Arial", 'B', 9)
-    pdf.cell(70, 8, "Nombre", 1)
-    pdf.cell(30, 8, "Gestion", 1)
-    pdf.cell(30, 8, "Unidad", 1)
-    pdf.cell(30, 8, "Stock", 1)
-    pdf.cell(30, 8, "Minimo", 1)
-    pdf.ln()
-    
-    pdf.set_font("Arial", size=9)
-    for _, row in df_inv.iterrows():
-        pdf.cell(70, 8, clean_text(row['Nombre']), 1)
-        pdf.cell(30, 8, clean_text(row['Gestion']), 1)
-        pdf.cell(30, 8, clean_text(row['Unidad']), 1)
-        pdf.cell(30, 8, str(row['Stock']), 1)
-        pdf.cell(30, 8, str(row['StockMinimo']), 1)
-        pdf.ln()
-        
-    return pdf.output(dest='S').encode('latin-1')
+def import_status(key):
+    """Resultado de la importación en segundo plano de st.session_state[key]"""
+    job = job_status(key)
+    if job is None:
+        return
+    c, errores, n_errores = import_result(job)
+    st.success(f"{c} procesados")
+    if n_errores:
+        # Las filas con error no bloquean el resto del archivo
+        st.warning(f"{n_errores} filas con error (no importadas)")
+        st.dataframe(errores, use_container_width=True)
+        if st.button("Cerrar", key=f"{key}_cerrar"):
+            st.session_state.pop(key)
+            st.rerun()
+    else:
+        st.session_state.pop(key)
+
+def paged_table(key, search_fn):
+    """Tabla con buscador y paginación; solo se pide a SQLite la página visible"""
+    c1, c2 = st.columns([4, 1])
+    texto = c1.text_input("Buscar", key=f"{key}_buscar",
+                          on_change=lambda: st.session_state.update({f"{key}_pagina": 1}))
+    pagina = c2.number_input("Página", min_value=1, step=1, key=f"{key}_pagina")
+    df, total = search_fn(texto, pagina - 1)
+    st.dataframe(df, use_container_width=True)
+    st.caption(f"{total} registros · página {pagina} de {max(1, -(-total // PAGE_SIZE))}")
+
+def frame_search(df, col='Nombre'):
+    """search_fn de paged_table sobre un DataFrame ya calculado (filtro y página en memoria)"""
+    def search(texto, page):
+        filas = df[df[col].str.contains(texto.strip(), case=False, regex=False, na=False)] if texto else df
+        return filas.iloc[page * PAGE_SIZE:(page + 1) * PAGE_SIZE], len(filas)
+    return search
 
-# --- 5. INTERFAZ Y SESSION STATE ---
+def search_select(label, key, table, format_func, selected_id=None):
+    """Selector con buscador: ofrece las primeras coincidencias en vez de todo el catálogo.
+    Devuelve la fila elegida como dict, con Stock si es inventario (None si no hay coincidencias)."""
+    texto = st.text_input(f"Buscar {label.lower()}", key=f"{key}_buscar")
+    opts = search_options(table, texto)
+    if not opts.ids:
+        st.selectbox(label, ["(sin coincidencias)"], disabled=True)
+        return None
+    # Las opciones no cambian con el stock; el stock se consulta aparte
+    stock = get_stock(opts.ids) if table == 'inventory' else None
+    def fila(i):
+        return opts.rows[i] if stock is None else {**opts.rows[i], 'Stock': stock.get(i)}
+    sel = st.selectbox(label, opts.ids, index=opts.index.get(selected_id, 0), format_func=lambda i: format_func(fila(i)))
+    if opts.total > len(opts.ids):
+        st.caption(f"Mostrando {len(opts.ids)} de {opts.total}; escriba para filtrar")
+    return fila(sel)
+
+def fmt_residente(r):
+    return f"{r['Nombre']} ({r['RUT']})"
+
+# --- 4. INTERFAZ Y SESSION STATE ---
 
 if 'role' not in st.session_state: st.session_state.role = None
 if 'current_user' not in st.session_state: st.session_state.current_user = None
@@ -182,19 +161,26 @@ def login_ui():
     c1,c2,c3 = st.columns([1,2,1])
     with c2:
         with st.form("login"):
+            sede = st.selectbox("Sede", list(SITES)) if MULTI_SEDE else next(iter(SITES))
             u = st.text_input("Usuario")
             p = st.text_input("Contraseña", type="password")
             if st.form_submit_button("Entrar", use_container_width=True):
-                conn = get_db_connection()
-                res = conn.execute("SELECT * FROM users WHERE Username=? AND Password=?", (u,p)).fetchone()
-                conn.close()
+                # Usuarios propios de cada sede: se validan en su base
+                with using(SITES[sede]), connection() as conn:
+                    res = conn.execute("SELECT * FROM users WHERE Username=? AND Password=?", (u,p)).fetchone()
                 if res:
                     st.session_state.role = res['Role']
                     st.session_state.current_user = res['Username']
+                    st.session_state.site = sede
                     st.rerun()
                 else:
                     st.error("Acceso denegado")
 
+if 'site' not in st.session_state: st.session_state.site = None
+if MULTI_SEDE and st.session_state.role and st.session_state.site not in SITES:
+    # La sede de la sesión ya no está en sedes.json
+    st.session_state.role = None
+
 if not st.session_state.role:
     login_ui()
 else:
@@ -204,12 +190,13 @@ else:
     
     # Barra Superior
     c1, c2 = st.columns([6,1])
-    with c1: st.title("🏥 Farmacia Ac")
+    with c1: st.title(f"🏥 Farmacia Ac · {st.session_state.site}" if MULTI_SEDE else "🏥 Farmacia Ac")
     with c2:
         st.write(f"👤 **{user}** ({role})")
         if st.button("Salir"):
             st.session_state.role = None
             st.session_state.current_user = None
+            st.session_state.site = None
             st.rerun()
             
     # Permisos
@@ -223,20 +210,85 @@ else:
         opts.extend(["Cargar insumo a residente", "Reportes"])
     if is_admin or is_farma or is_enfermera:
         opts.append("Gestión")
+    if is_admin:
+        opts.append("Rendimiento")
         
     menu = st.sidebar.radio("Navegación", opts)
+    # Tiempos del rerun (y perfil cProfile si se pidió desde Rendimiento)
+    begin_page(menu, profile=st.session_state.pop('perf_profile', False))
+    # Foto semanal del stock (libro): solo escribe cuando toca
+    snapshot_if_due()
+    if is_admin or is_farma or is_enfermera:
+        n_bajo = low_stock_count()
+        if n_bajo:
+            st.sidebar.warning(f"⚠️ {n_bajo} insumos en o bajo el stock mínimo")
+    if is_admin:
+        stats = cache_stats()
+        st.sidebar.caption(f"Caché de tablas: {stats['hits']} aciertos / {stats['misses']} lecturas")
     
     # --- PÁGINA: INVENTARIO ---
     if menu == "Inventario":
         st.header("📦 Inventario")
-        df_i, _, _ = get_data_frames()
+        inv_version = get_versions('inventory')
+        _, n_items = search_inventory()
         
-        if not df_i.empty:
+        if n_items:
+            # El PDF se arma solo al hacer clic (y se reutiliza si el inventario no cambió)
             st.download_button("📥 Descargar PDF Inventario", 
-                               data=generate_inventory_pdf(df_i, user), 
+                               data=bind(lambda: cached_pdf('inventario', inv_version, (user, date.today()),
+                                                            lambda: generate_inventory_pdf(get_inventory(), user))), 
                                file_name="Inventario.pdf", mime="application/pdf")
         
-        st.dataframe(df_i, use_container_width=True)
+        paged_table("inv", search_inventory)
+        
+        # Lista de reposición (insumos en o bajo StockMinimo)
+        n_bajo = low_stock_count()
+        if n_bajo and role != "Visita":
+            with st.expander(f"⚠️ Reposición: {n_bajo} insumos bajo mínimo"):
+                filtro_repo = st.radio("Gestión", list(FILTROS_GESTION.keys()), horizontal=True, key="repo_gestion")
+                df_repo = get_reorder_list(FILTROS_GESTION[filtro_repo])
+                st.dataframe(df_repo, use_container_width=True)
+                st.download_button("📥 Descargar lista de reposición (CSV)", data=reorder_csv(df_repo),
+                                   file_name=f"Reposicion_{date.today()}.csv", mime="text/csv")
+        
+        # Pronóstico: consumo diario, días de cobertura y pedido sugerido
+        if n_items and role != "Visita":
+            with st.expander("📈 Cobertura y pedido sugerido"):
+                st.dataframe(get_gestion_forecast(), use_container_width=True, hide_index=True)
+                filtro_pron = st.radio("Gestión", list(FILTROS_GESTION.keys()), horizontal=True, key="pron_gestion")
+                df_pron = get_forecast(FILTROS_GESTION[filtro_pron])
+                st.caption(f"Consumo diario promedio de los últimos {WINDOW_DAYS} y {SHORT_DAYS} días; "
+                           f"el sugerido cubre {LEAD_DAYS} días sobre el mínimo.")
+                st.dataframe(df_pron, use_container_width=True, hide_index=True)
+                st.download_button("📥 Descargar pedido sugerido (CSV)", data=reorder_csv(df_pron[df_pron['Sugerido'] > 0]),
+                                   file_name=f"Pedido_{date.today()}.csv", mime="text/csv")
+        
+        # Stock histórico desde el libro (foto más cercana + movimientos). El cuerpo de un
+        # expander corre en cada rerun: el libro se consulta solo con el interruptor activo
+        # (y se cachea por versión); la tabla se pagina.
+        if n_items and role != "Visita":
+            with st.expander("📅 Stock a una fecha"):
+                if st.toggle("Calcular stock a una fecha", key="stock_ver"):
+                    c_f, c_g = st.columns(2)
+                    fecha_stock = c_f.date_input("Fecha", value=date.today(), max_value=date.today(), key="stock_fecha")
+                    filtro_stock = c_g.radio("Gestión", list(FILTROS_GESTION.keys()), horizontal=True, key="stock_gestion")
+                    paged_table("stock", frame_search(inventory_at(fecha_stock, FILTROS_GESTION[filtro_stock])))
+        
+        # Conciliación del contador inventory.Stock con el libro
+        if is_admin:
+            with st.expander("🧮 Conciliación de stock"):
+                if st.toggle("Revisar conciliación", key="conc_ver"):
+                    df_dif = reconcile()
+                    if df_dif.empty:
+                        st.success("El stock de todos los insumos coincide con sus movimientos.")
+                    else:
+                        st.warning(f"{len(df_dif)} insumos con diferencia entre el stock y sus movimientos.")
+                        paged_table("conc", frame_search(df_dif))
+                        if st.button("Tomar el stock actual como base (tras un conteo físico)"):
+                            take_snapshot('contador')
+                            st.rerun()
+                    st.caption("Últimas fotos del stock")
+                    st.dataframe(get_snapshots(5), use_container_width=True, hide_index=True)
         
         # Admin, Farmacia y Enfermera pueden ver operaciones
         if is_admin or is_farma or is_enfermera:
@@ -252,119 +304,69 @@ else:
                     stk = c_b.number_input("Stock Inicial", min_value=0)
                     stm = c_a.number_input("Mínimo", min_value=1)
                     if st.form_submit_button("Crear"):
-                        conn = get_db_connection()
                         try:
-                            conn.execute("INSERT INTO inventory VALUES (?,?,?,?,?,?)", 
-                                         (generate_id(), nm, un, stk, stm, gs))
-                            conn.commit()
+                            with transaction() as conn:
+                                nuevo_id = generate_id()
+                                conn.execute("INSERT INTO inventory VALUES (?,?,?,?,?,?)", 
+                                             (nuevo_id, nm, un, stk, stm, gs))
+                                if stk:
+                                    # El stock inicial también queda en el libro (ledger.py)
+                                    conn.execute("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
+                                                 (datetime.now().strftime("%Y-%m-%d %H:%M"), 'INICIAL', None, nuevo_id, nm, stk))
                             st.success("Creado")
                             st.rerun()
-                        except: st.error("Error")
-                        finally: conn.close()
+                        except Exception: st.error("Error")
             with t2:
                 # Cargar Stock Simple
-                all_items = df_i['Nombre'].tolist() if not df_i.empty else []
-                if all_items:
-                    sel = st.selectbox("Item", all_items)
+                item = search_select("Item", "stock_item", 'inventory', lambda r: r['Nombre'])
+                if item:
                     qty = st.number_input("Cantidad", min_value=1)
                     if st.button("Agregar Stock"):
-                        conn = get_db_connection()
-                        # Buscar ID
-                        itm_id = df_i[df_i['Nombre'] == sel].iloc[0]['ID']
-                        conn.execute("UPDATE inventory SET Stock = Stock + ? WHERE ID=?", (qty, itm_id))
-                        # Registrar entrada como movimiento
-                        now = datetime.now().strftime("%Y-%m-%d %H:%M")
-                        conn.execute("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
-                                     (now, 'ENTRADA', None, itm_id, sel, qty))
-                        conn.commit()
-                        conn.close()
+                        itm_id, sel = item['ID'], item['Nombre']
+                        with transaction() as conn:
+                            conn.execute("UPDATE inventory SET Stock = Stock + ? WHERE ID=?", (qty, itm_id))
+                            # Registrar entrada como movimiento
+                            now = datetime.now().strftime("%Y-%m-%d %H:%M")
+                            conn.execute("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)",
+                                         (now, 'ENTRADA', None, itm_id, sel, qty))
                         st.success("Stock actualizado")
                         st.rerun()
             with t3:
-                f = st.file_uploader("Excel", type=["xlsx"])
-                if f and st.button("Procesar"):
-                    try:
-                        df = pd.read_excel(f)
-                        conn = get_db_connection()
-                        c = 0
-                        for _, r in df.iterrows():
-                            nm = str(r.iloc[0])
-                            qt = int(r.iloc[1]) if len(r)>1 else 0
-                            gs = str(r.iloc[2]) if len(r)>2 else "Farmacia"
-                            
-                            ex = conn.execute("SELECT ID FROM inventory WHERE Nombre=?", (nm,)).fetchone()
-                            if ex:
-                                conn.execute("UPDATE inventory SET Stock = Stock + ? WHERE ID=?", (qt, ex['ID']))
-                            else:
-                                conn.execute("INSERT INTO inventory VALUES (?,?,?,?,?,?)", 
-                                             (generate_id(), nm, "unidades", qt, 5, gs))
-                            c += 1
-                        conn.commit()
-                        conn.close()
-                        st.success(f"{c} procesados")
-                        st.rerun()
-                    except Exception as e: st.error(f"Error: {e}")
+                f = st.file_uploader("Excel / CSV", type=["xlsx", "csv"])
+                if f and st.button("Procesar", disabled='job_inv' in st.session_state):
+                    # En segundo plano: sigue aunque se cambie de página o se recargue
+                    st.session_state.job_inv = submit_import('inventario', f, user)
+                import_status('job_inv')
 
     # --- PÁGINA: CARGAR INSUMO (UPDATED) ---
     elif menu == "Cargar insumo a residente":
         st.header("💊 Dispensar a Residente")
         
-        # 1. Obtener datos frescos de la DB
-        conn = get_db_connection()
-        try:
-            res_rows = conn.execute("SELECT ID, Nombre, RUT FROM residents ORDER BY Nombre").fetchall()
-            inv_rows = conn.execute("SELECT ID, Nombre, Stock, Gestion FROM inventory ORDER BY Nombre").fetchall()
-        finally:
-            conn.close()
-            
-        if not res_rows or not inv_rows:
+        # 1. Selectores con búsqueda (solo las primeras coincidencias viajan al navegador)
+        if not search_residents()[1] or not search_inventory()[1]:
             st.warning("Faltan residentes o insumos.")
         else:
             c1, c2, c3 = st.columns([3,3,2])
             
+            # La selección se recupera por ID tras cada recarga
             with c1:
-                # Diccionario para Residente
-                res_dict = {f"{r['Nombre']} ({r['RUT']})": r['ID'] for r in res_rows}
-                res_options = list(res_dict.keys())
-                
-                # --- MEMORIA DE SELECCIÓN RESIDENTE ---
-                idx_res = 0
-                if 'last_res_id' in st.session_state:
-                    # Buscar el índice del ID guardado
-                    for i, name in enumerate(res_options):
-                        if res_dict[name] == st.session_state.last_res_id:
-                            idx_res = i
-                            break
-                            
-                sel_res_txt = st.selectbox("Residente", res_options, index=idx_res)
-                sel_res_id = res_dict[sel_res_txt]
-                
+                res_sel = search_select("Residente", "disp_res", 'residents', fmt_residente,
+                                    st.session_state.get('last_res_id'))
             with c2:
-                # Diccionario para Insumo con formato (Stock entre paréntesis)
-                inv_dict = {}
-                for i in inv_rows:
-                    display = f"{i['Nombre']} ({i['Gestion']}) (Stock: {i['Stock']})"
-                    inv_dict[display] = {'id': i['ID'], 'stk': i['Stock'], 'nm': i['Nombre']}
-                
-                inv_options = list(inv_dict.keys())
-                
-                # --- MEMORIA DE SELECCIÓN INSUMO ---
-                idx_inv = 0
-                if 'last_inv_id' in st.session_state:
-                    for i, key in enumerate(inv_options):
-                        if inv_dict[key]['id'] == st.session_state.last_inv_id:
-                            idx_inv = i
-                            break
-                            
-                sel_inv_txt = st.selectbox("Insumo", inv_options, index=idx_inv)
-                sel_inv_data = inv_dict[sel_inv_txt]
-                
+                inv_sel = search_select("Insumo", "disp_inv", 'inventory',
+                                    lambda i: f"{i['Nombre']} ({i['Gestion']}) (Stock: {i['Stock']})",
+                                    st.session_state.get('last_inv_id'))
             with c3:
                 cant = st.number_input("Cantidad", min_value=1, value=1)
-                
+            
             st.write("")
-            if st.button("Confirmar Carga", type="primary"):
-                if sel_inv_data['stk'] >= cant:
+            if 'ronda' not in st.session_state: st.session_state.ronda = []
+            if res_sel and inv_sel:
+                sel_res_id, sel_res_txt = res_sel['ID'], fmt_residente(res_sel)
+                sel_inv_data = {'id': inv_sel['ID'], 'stk': inv_sel['Stock'], 'nm': inv_sel['Nombre']}
+                
+                if st.button("Confirmar Carga", type="primary"):
+                    # El stock se valida dentro de la transacción, no contra el dato en pantalla
                     if register_consumption(sel_res_id, sel_inv_data['id'], sel_inv_data['nm'], cant):
                         # Guardar IDs en sesión para recuperar selección tras recarga
                         st.session_state.last_res_id = sel_res_id
@@ -372,10 +374,44 @@ else:
                         
                         st.success("Registrado correctamente")
                         st.rerun()
-                else:
-                    st.error("Stock insuficiente")
 
-    # --- PÁGINA: REPORTES (LÓGICA BLINDADA) ---
+                
+                if st.button("➕ Agregar a la ronda"):
+                    st.session_state.ronda.append({'res_id': sel_res_id, 'Residente': sel_res_txt,
+                                                   'ins_id': sel_inv_data['id'], 'Insumo': sel_inv_data['nm'], 'Cantidad': cant})
+                    st.session_state.last_res_id = sel_res_id
+                    st.session_state.last_inv_id = sel_inv_data['id']
+                    st.rerun()
+            
+            # --- RONDA (DISPENSACIÓN POR LOTE) ---
+            if st.session_state.get('ronda_msg'):
+                st.info(st.session_state.pop('ronda_msg'))
+            
+            if st.session_state.ronda:
+                st.subheader(f"Ronda pendiente ({len(st.session_state.ronda)} líneas)")
+                df_ronda = pd.DataFrame(st.session_state.ronda)
+                st.dataframe(df_ronda[[c for c in df_ronda.columns if c in ('Residente', 'Insumo', 'Cantidad', 'Error')]],
+                             use_container_width=True)
+                b1, b2 = st.columns(2)
+                if b1.button("Confirmar ronda", type="primary"):
+                    lineas = st.session_state.ronda
+                    results = register_consumptions([(l['res_id'], l['ins_id'], l['Insumo'], l['Cantidad']) for l in lineas])
+                    if results is not None:
+                        # Quedan en la ronda solo las líneas rechazadas, con su motivo
+                        fallidas = []
+                        for linea, res in zip(lineas, results):
+                            if res.status == SIN_STOCK:
+                                fallidas.append({**linea, 'Error': f"Stock insuficiente (disponible: {res.stock})"})
+                            elif res.status == NO_EXISTE:
+                                fallidas.append({**linea, 'Error': "El insumo ya no existe"})
+                        st.session_state.ronda = fallidas
+                        st.session_state.ronda_msg = f"Ronda registrada: {len(lineas) - len(fallidas)} líneas OK, {len(fallidas)} rechazadas."
+                        st.rerun()
+                if b2.button("Vaciar ronda"):
+                    st.session_state.ronda = []
+                    st.rerun()
+
+    # --- PÁGINA: REPORTES (FILTRADO EN SQL) ---
     elif menu == "Reportes":
         st.header("📄 Reportes de Consumo")
         
@@ -389,74 +425,92 @@ else:
         st.divider()
         
         # 2. Selector de Gestión
-        filtro_gestion = st.radio("Filtrar por Gestión:", ["General (Todos)", "Solo Farmacia", "Solo Enfermera Jefe"], horizontal=True)
-        
-        # 3. Procesamiento de Datos (PANDAS EN MEMORIA PARA SEGURIDAD)
-        df_inv, df_res, df_mov = get_data_frames()
+        filtro_gestion = st.radio("Filtrar por Gestión:", list(FILTROS_GESTION.keys()), horizontal=True)
+        gestion = FILTROS_GESTION[filtro_gestion]
         
-        if df_mov.empty:
+        # 3. Consulta filtrada en SQL (solo se leen las filas del periodo)
+        if not has_movements():
             st.info("No hay movimientos registrados en el sistema.")
         else:
-            # Limpieza y preparación para merge
-            # Asegurar que Gestion existe y está limpia
-            df_inv['Gestion'] = df_inv['Gestion'].fillna('Farmacia').astype(str).str.strip()
-            
-            # Merge 1: Movimientos + Inventario (Left join para no perder movimientos si borraron insumo)
-            df_merged = pd.merge(df_mov, df_inv[['ID', 'Gestion']], left_on='InsumoID', right_on='ID', how='left')
-            # Si no cruzó (insumo borrado), asignamos Farmacia por defecto
-            df_merged['Gestion'] = df_merged['Gestion'].fillna('Farmacia')
-            
-            # Filtro Tipo Consumo
-            df_consumos = df_merged[df_merged['Tipo'] == 'CONSUMO'].copy()
-            
-            # Filtro Fechas (Conversión robusta)
-            # Convertimos la columna Fecha (string) a datetime object
-            df_consumos['FechaDT'] = pd.to_datetime(df_consumos['Fecha'], errors='coerce') # Si falla, NaT
-            df_consumos = df_consumos.dropna(subset=['FechaDT']) # Eliminar fechas corruptas
-            
-            # Aplicar rango
-            mask_date = (df_consumos['FechaDT'].dt.date >= d_ini) & (df_consumos['FechaDT'].dt.date <= d_fin)
-            df_periodo = df_consumos[mask_date]
-            
-            # Filtro Gestión
-            if filtro_gestion == "Solo Farmacia":
-                df_final = df_periodo[df_periodo['Gestion'] == 'Farmacia']
-            elif filtro_gestion == "Solo Enfermera Jefe":
-                df_final = df_periodo[df_periodo['Gestion'] == 'Enfermera Jefe']
-            else:
-                df_final = df_periodo # Todos
-                
-            # Merge 2: Agregar nombres de residentes
-            # Asegurar IDs string
-            df_final['ResidenteID'] = df_final['ResidenteID'].astype(str)
-            df_res['ID'] = df_res['ID'].astype(str)
-            
-            df_view = pd.merge(df_final, df_res[['ID', 'Nombre', 'RUT', 'Piso', 'Habitacion', 'Apoderado']], 
-                               left_on='ResidenteID', right_on='ID', how='left')
+            rep_version = get_versions('inventory', 'residents', 'movements')
+            df_encontrados = get_report_residents(d_ini, d_fin, gestion)
+            nombres_res = dict(zip(df_encontrados['ID'], df_encontrados['Nombre']))
             
             # 4. Selector de Residente (SIEMPRE VISIBLE)
-            # Lista única de residentes encontrados en la data filtrada
-            residentes_encontrados = sorted(df_view['Nombre'].dropna().unique().tolist())
-            
             st.subheader("Selección de Residente")
             
-            if not residentes_encontrados:
+            if not nombres_res:
                 sel_res = st.selectbox("Residente", ["(No se encontraron consumos con este filtro)"], disabled=True)
                 st.warning("No hay datos para mostrar con los filtros seleccionados.")
             else:
-                sel_res = st.selectbox("Residente", residentes_encontrados)
+                sel_res_id = st.selectbox("Residente", list(nombres_res.keys()), format_func=nombres_res.get)
+                sel_res = nombres_res[sel_res_id]
                 
                 # Filtrar data para ese residente específico
-                df_res_filtrado = df_view[df_view['Nombre'] == sel_res]
+                df_res_filtrado = get_resident_consumos(sel_res_id, d_ini, d_fin, gestion)
                 
                 # Mostrar Tabla
                 st.info(f"Mostrando: **{filtro_gestion}** para **{sel_res}**")
-                st.dataframe(df_res_filtrado[['Fecha', 'NombreInsumo', 'Gestion', 'Cantidad']], use_container_width=True)
+                st.dataframe(df_res_filtrado, use_container_width=True)
+                
+                # Totales del residente (desde el resumen diario, sin recorrer movements)
+                with st.expander("Totales por insumo"):
+                    st.dataframe(get_resident_totals(sel_res_id, d_ini, d_fin, gestion), use_container_width=True)
                 
-                # Botón PDF
-                res_data = df_res[df_res['Nombre'] == sel_res].iloc[0]
-                pdf_bytes = generate_pdf(res_data, df_res_filtrado, d_ini, d_fin, filtro_gestion)
-                st.download_button("📥 Descargar Reporte PDF", data=pdf_bytes, file_name=f"Reporte_{sel_res}.pdf", mime="application/pdf")
+                # Botón PDF (se genera al hacer clic, memoizado por versión de datos + filtros)
+                def build_pdf():
+                    return generate_pdf(get_resident(sel_res_id), df_res_filtrado, d_ini, d_fin, filtro_gestion)
+                # Las descargas diferidas corren fuera del script: cada una lleva fijada la base de la sede
+                pdf_bytes = lambda: cached_pdf('residente', rep_version, (sel_res_id, d_ini, d_fin, filtro_gestion), build_pdf)
+                st.download_button("📥 Descargar Reporte PDF", data=bind(pdf_bytes), file_name=f"Reporte_{sel_res}.pdf", mime="application/pdf")
+            
+            # 5. Resumen y exportación masiva (cobro mensual a apoderados)
+            if nombres_res:
+                with st.expander("📊 Resumen del periodo por residente"):
+                    st.dataframe(get_period_summary(d_ini, d_fin, gestion), use_container_width=True)
+                with st.expander(f"📦 Exportar todos los residentes ({len(nombres_res)})"):
+                    split = st.checkbox("Separar por Gestión (una carpeta por Gestión)")
+                    if st.button("Generar ZIP de reportes"):
+                        st.session_state.job_zip = submit_zip_export(d_ini, d_fin, filtro_gestion, gestion, split, user)
+                    job = job_status('job_zip')
+                    if job:
+                        st.download_button("📥 Descargar ZIP de reportes", data=bind(lambda: job_file(job['ID'])),
+                                           file_name=job['Archivo'], mime="application/zip")
+        
+        # 6. Consolidado de todas las sedes (cada base se consulta en paralelo)
+        if is_admin and MULTI_SEDE:
+            with st.expander(f"🏢 Consolidado de sedes ({len(SITES)})"):
+                st.caption(f"Consumo del {d_ini} al {d_fin} ({filtro_gestion}) por insumo en cada sede.")
+                df_sedes = consolidated_consumption(d_ini, d_fin, gestion, sites=SITES)
+                st.dataframe(df_sedes, use_container_width=True, hide_index=True)
+                st.download_button("📥 Descargar consumo consolidado (CSV)", data=reorder_csv(df_sedes),
+                                   file_name=f"Consumo_sedes_{d_ini}_{d_fin}.csv", mime="text/csv")
+                df_bajo = consolidated_low_stock(gestion, sites=SITES)
+                st.markdown(f"**Stock bajo mínimo:** {len(df_bajo)} insumos en todas las sedes")
+                st.dataframe(df_bajo, use_container_width=True, hide_index=True)
+                st.download_button("📥 Descargar reposición de todas las sedes (CSV)", data=reorder_csv(df_bajo),
+                                   file_name=f"Reposicion_sedes_{date.today()}.csv", mime="text/csv")
+        
+        # 7. Exportación Parquet para auditoría y finanzas (todos los movimientos, incremental)
+        if is_admin:
+            with st.expander("🗂️ Exportación para análisis (Parquet)"):
+                estado = get_export_state()
+                if estado['Fecha']:
+                    st.caption(f"Última exportación: {estado['Fecha']} — {estado['Filas']} movimientos "
+                               f"en {len(estado['Meses'])} meses (hasta el movimiento {estado['HastaID']}).")
+                else:
+                    st.caption("Todavía no se ha exportado.")
+                if estado.get('Omitidos'):
+                    st.warning(f"{len(estado['Omitidos'])} movimientos con fecha inválida no se exportaron "
+                               f"(ID {', '.join(map(str, estado['Omitidos'][:20]))}).")
+                if st.button("Actualizar exportación", disabled='job_parquet' in st.session_state):
+                    st.session_state.job_parquet = submit_parquet_export(user)
+                if job_status('job_parquet'):
+                    st.session_state.pop('job_parquet')
+                    st.success("Exportación actualizada.")
+                if estado['Fecha']:
+                    st.download_button("📥 Descargar exportación (ZIP de Parquet)", data=bind(export_zip),
+                                       file_name=f"Movimientos_parquet_{estado['Fecha'][:10]}.zip", mime="application/zip")
 
     # --- PÁGINA: GESTIÓN ---
     elif menu == "Gestión":
@@ -470,15 +524,15 @@ else:
         # Residentes: Visible para Admin y Enfermera
         if is_admin or is_enfermera:
             tabs_gestion.append("Residentes")
+        if is_admin:
+            tabs_gestion.append("Archivo")
             
         tabs = st.tabs(tabs_gestion)
         
         # === TAB: USUARIOS (SOLO ADMIN) ===
         if is_admin:
             with tabs[0]:
-                conn = get_db_connection()
-                df_users = pd.read_sql("SELECT Username, Role FROM users", conn)
-                conn.close()
+                df_users = get_table('users')[['Username', 'Role']]
                 st.dataframe(df_users, use_container_width=True)
                 
                 c_create, c_edit = st.columns(2)
@@ -490,42 +544,35 @@ else:
                         np = st.text_input("Clave", type="password")
                         nr = st.selectbox("Rol", ["Administrador", "Enfermera Jefe", "Farmacia", "Visita"])
                         if st.form_submit_button("Crear"):
-                            conn = get_db_connection()
                             try:
-                                conn.execute("INSERT INTO users VALUES (?,?,?)", (nu, np, nr))
-                                conn.commit()
+                                with transaction() as conn:
+                                    conn.execute("INSERT INTO users VALUES (?,?,?)", (nu, np, nr))
                                 st.success("Creado")
                                 st.rerun()
-                            except: st.error("Error/Duplicado")
-                            finally: conn.close()
+                            except Exception: st.error("Error/Duplicado")
                 
                 with c_edit:
                     st.markdown("#### Editar / Eliminar")
                     user_edit = st.selectbox("Seleccionar Usuario", df_users['Username'].tolist())
                     if user_edit:
-                        conn = get_db_connection()
-                        cur_role = conn.execute("SELECT Role FROM users WHERE Username=?", (user_edit,)).fetchone()[0]
-                        conn.close()
+                        with connection() as conn:
+                            cur_role = conn.execute("SELECT Role FROM users WHERE Username=?", (user_edit,)).fetchone()[0]
                         
                         with st.form("edit_user"):
                             er = st.selectbox("Nuevo Rol", ["Administrador", "Enfermera Jefe", "Farmacia", "Visita"], index=["Administrador", "Enfermera Jefe", "Farmacia", "Visita"].index(cur_role))
                             ep = st.text_input("Nueva Clave (opcional)", type="password")
                             c1, c2 = st.columns(2)
                             if c1.form_submit_button("Actualizar"):
-                                conn = get_db_connection()
-                                if ep: conn.execute("UPDATE users SET Role=?, Password=? WHERE Username=?", (er, ep, user_edit))
-                                else: conn.execute("UPDATE users SET Role=? WHERE Username=?", (er, user_edit))
-                                conn.commit()
-                                conn.close()
+                                with transaction() as conn:
+                                    if ep: conn.execute("UPDATE users SET Role=?, Password=? WHERE Username=?", (er, ep, user_edit))
+                                    else: conn.execute("UPDATE users SET Role=? WHERE Username=?", (er, user_edit))
                                 st.success("Actualizado")
                                 st.rerun()
                             if c2.form_submit_button("Eliminar", type="primary"):
                                 if user_edit == user: st.error("No puedes eliminarte.")
                                 else:
-                                    conn = get_db_connection()
-                                    conn.execute("DELETE FROM users WHERE Username=?", (user_edit,))
-                                    conn.commit()
-                                    conn.close()
+                                    with transaction() as conn:
+                                        conn.execute("DELETE FROM users WHERE Username=?", (user_edit,))
                                     st.success("Eliminado")
                                     st.rerun()
 
@@ -534,8 +581,7 @@ else:
         idx_res_tab = 1 if is_admin else 0 
         
         with tabs[idx_res_tab]:
-            _, df_r, _ = get_data_frames()
-            st.dataframe(df_r, use_container_width=True)
+            paged_table("res", search_residents)
             
             # Sub-tabs para acciones
             t_m, t_edit, t_e = st.tabs(["Nuevo (Manual)", "Editar / Eliminar", "Cargar Excel"])
@@ -550,19 +596,16 @@ else:
                     ha = c2.text_input("Habitación")
                     ap = st.text_input("Apoderado")
                     if st.form_submit_button("Guardar") and nm:
-                        conn = get_db_connection()
-                        conn.execute("INSERT INTO residents VALUES (?,?,?,?,?,?)", (generate_id(), nm, rt, pi, ha, ap))
-                        conn.commit()
-                        conn.close()
+                        with transaction() as conn:
+                            conn.execute("INSERT INTO residents VALUES (?,?,?,?,?,?)", (generate_id(), nm, rt, pi, ha, ap))
                         st.success("Guardado")
                         st.rerun()
             
             # 2. Editar / Eliminar (NUEVO)
             with t_edit:
-                if not df_r.empty:
-                    res_to_edit_name = st.selectbox("Seleccionar Residente", df_r['Nombre'].tolist())
-                    res_data = df_r[df_r['Nombre'] == res_to_edit_name].iloc[0]
-                    
+                res_sel = search_select("Seleccionar Residente", "edit_res", 'residents', fmt_residente)
+                if res_sel:
+                    res_data = get_resident(res_sel['ID'])
                     with st.form("edit_res_form"):
                         c1, c2 = st.columns(2)
                         enm = c1.text_input("Nombre", value=res_data['Nombre'])
@@ -573,39 +616,72 @@ else:
                         
                         col_upd, col_del = st.columns(2)
                         if col_upd.form_submit_button("Actualizar Datos"):
-                            conn = get_db_connection()
-                            conn.execute("UPDATE residents SET Nombre=?, RUT=?, Piso=?, Habitacion=?, Apoderado=? WHERE ID=?",
-                                         (enm, ert, epi, eha, eap, res_data['ID']))
-                            conn.commit()
-                            conn.close()
+                            with transaction() as conn:
+                                conn.execute("UPDATE residents SET Nombre=?, RUT=?, Piso=?, Habitacion=?, Apoderado=? WHERE ID=?",
+                                             (enm, ert, epi, eha, eap, res_data['ID']))
                             st.success("Residente actualizado.")
                             st.rerun()
                             
                         if col_del.form_submit_button("Eliminar Residente", type="primary"):
-                            conn = get_db_connection()
-                            conn.execute("DELETE FROM residents WHERE ID=?", (res_data['ID'],))
-                            conn.commit()
-                            conn.close()
+                            with transaction() as conn:
+                                conn.execute("DELETE FROM residents WHERE ID=?", (res_data['ID'],))
                             st.success("Residente eliminado.")
                             st.rerun()
             
             # 3. Carga Excel
             with t_e:
-                f = st.file_uploader("Excel", type=["xlsx"])
-                if f and st.button("Cargar"):
-                    try:
-                        d = pd.read_excel(f)
-                        conn = get_db_connection()
-                        c = 0
-                        for _,r in d.iterrows():
-                            n = str(r.iloc[0])
-                            ex = conn.execute("SELECT ID FROM residents WHERE Nombre=?", (n,)).fetchone()
-                            if not ex:
-                                conn.execute("INSERT INTO residents VALUES (?,?,?,?,?,?)",
-                                             (generate_id(), n, str(r.iloc[1]), str(r.iloc[2]), str(r.iloc[3]), str(r.iloc[4])))
-                                c += 1
-                        conn.commit()
-                        conn.close()
-                        st.success(f"{c} cargados")
+                f = st.file_uploader("Excel / CSV", type=["xlsx", "csv"])
+                if f and st.button("Cargar", disabled='job_res' in st.session_state):
+                    st.session_state.job_res = submit_import('residentes', f, user)
+                import_status('job_res')
+
+        # === TAB: ARCHIVO DE MOVIMIENTOS (SOLO ADMIN) ===
+        if is_admin:
+            with tabs[-1]:
+                st.caption("Los meses cerrados pasan a tablas de archivo por año (solo lectura). "
+                           "Reportes y totales siguen incluyéndolos.")
+                periodos = get_archive_periods()
+                if periodos.empty:
+                    st.info("No hay meses archivados.")
+                else:
+                    st.dataframe(periodos, use_container_width=True, hide_index=True)
+                meses = st.number_input("Meses que quedan en la tabla viva", min_value=1, value=ARCHIVE_MONTHS, step=1)
+                st.write(f"Se archivarán los movimientos anteriores al {cutoff(int(meses)).strftime('%d-%m-%Y')}.")
+                if st.button("Archivar meses cerrados"):
+                    archivados = archive_closed_months(int(meses))
+                    if archivados:
+                        st.session_state.msg_archivo = f"{len(archivados)} meses archivados ({sum(n for _, n in archivados)} movimientos)."
                         st.rerun()
-                    except Exception as e: st.error(f"Error: {e}")
\ No newline at end of file
+                    st.info("No hay movimientos para archivar.")
+                if 'msg_archivo' in st.session_state:
+                    st.success(st.session_state.pop('msg_archivo'))
+
+    # --- PÁGINA: RENDIMIENTO (SOLO ADMIN) ---
+    elif menu == "Rendimiento":
+        st.header("⏱️ Rendimiento")
+        st.caption(f"Últimas {perf.MAX_SAMPLES} mediciones por operación, en ms ('consultas por rerun' es una cantidad).")
+        st.dataframe(ops_summary(), use_container_width=True, hide_index=True)
+        
+        st.subheader("Consultas SQL")
+        st.caption("Duración de execute: incluye esperas por bloqueo de escritura.")
+        st.dataframe(queries_summary(), use_container_width=True, hide_index=True)
+        
+        b1, b2 = st.columns(2)
+        if b1.button("Perfilar el próximo rerun (cProfile)"):
+            st.session_state.perf_profile = True
+            st.info("Se perfilará la próxima recarga de cualquier página.")
+        if b2.button("Reiniciar métricas"):
+            perf.reset()
+            st.rerun()
+        
+        if last_profile:
+            st.subheader(f"Perfil del último rerun perfilado: {last_profile['page']}")
+            st.code(last_profile['text'])
+            st.download_button("📥 Descargar perfil (.prof)", data=profile_bytes(),
+                               file_name="rerun.prof", mime="application/octet-stream")
+        
+        st.subheader("Trabajos en segundo plano")
+        st.caption(f"Importaciones y exportaciones ZIP; hasta {JOB_WORKERS} a la vez (FARMACIA_JOBS).")
+        st.dataframe(list_jobs(), use_container_width=True, hide_index=True)
+
+    end_page()
\ No newline at end of file
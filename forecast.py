@@ -0,0 +1,107 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import db
+from cache import LRUCache
+from db import connection, get_versions
+from perf import timed_fn
+from reports import GESTION_SQL
+
+# --- PRONÓSTICO DE CONSUMO Y DÍAS DE COBERTURA ---
+# Consumo diario por insumo en una ventana móvil, leído de consumption_daily (no de
+# movements). Se guarda la matriz insumos x días de la ventana y en cada cálculo solo
+# se leen los días desde el último cargado (el último puede haber crecido); los días
+# que salen de la ventana se descartan. La gestión se toma del inventario actual.
+
+WINDOW_DAYS = 30      # ventana para el consumo promedio
+SHORT_DAYS = 7        # ventana corta (detecta aumentos recientes)
+LEAD_DAYS = 14        # días a cubrir con el pedido sugerido
+
+_state = {}
+_lock = threading.Lock()
+_results = LRUCache(8)
+
+def _read_days(desde):
+    sql = """SELECT Dia, InsumoID, SUM(Cantidad) AS Cantidad
+             FROM consumption_daily
+             WHERE Dia >= ? AND InsumoID IS NOT NULL
+             GROUP BY Dia, InsumoID"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=[desde])
+
+def daily_matrix(hoy=None, window=WINDOW_DAYS):
+    """DataFrame InsumoID x día (últimos `window` días hasta hoy) con la cantidad consumida.
+    Incremental: reutiliza la matriz anterior y lee solo los días nuevos."""
+    hoy = hoy or date.today()
+    dias = [(hoy - timedelta(days=n)).isoformat() for n in range(window - 1, -1, -1)]
+    key = (db.current_path(), window)
+    with _lock:
+        prev = _state.get(key)
+        if prev is not None and dias[0] <= prev.columns[-1] <= dias[-1]:
+            # Se relee el último día cargado (pudo crecer) y los siguientes
+            desde = prev.columns[-1]
+            base = prev[[d for d in prev.columns if dias[0] <= d < desde]]
+        else:
+            desde, base = dias[0], None
+        nuevos = _read_days(desde).pivot_table(index='InsumoID', columns='Dia', values='Cantidad', aggfunc='sum')
+        matriz = nuevos if base is None else pd.concat([base, nuevos], axis=1)
+        matriz = matriz.reindex(columns=dias).fillna(0)
+        matriz = matriz[matriz.to_numpy().any(axis=1)]
+        _state[key] = matriz
+    return matriz
+
+def reset():
+    """Descarta el estado incremental (p. ej. tras rollup --rebuild o borrar movimientos)"""
+    with _lock:
+        _state.clear()
+    _results.clear()
+
+@timed_fn('proceso.pronostico')
+def _forecast(hoy, window, lead_days):
+    matriz = daily_matrix(hoy, window)
+    valores = matriz.to_numpy()
+    corta = min(SHORT_DAYS, window)
+    consumo = pd.DataFrame({'ConsumoDia': valores.sum(axis=1) / window,
+                            'ConsumoDia7': valores[:, -corta:].sum(axis=1) / corta},
+                           index=matriz.index)
+    sql = f"""SELECT i.ID, i.Nombre, {GESTION_SQL} AS Gestion, i.Unidad,
+                     COALESCE(i.Stock, 0) AS Stock, COALESCE(i.StockMinimo, 0) AS StockMinimo
+              FROM inventory i"""
+    with connection() as conn:
+        inv = pd.read_sql(sql, conn).set_index('ID')
+    df = inv.join(consumo, how='left').fillna({'ConsumoDia': 0.0, 'ConsumoDia7': 0.0})
+    # Se proyecta con el mayor de los dos promedios: un aumento reciente adelanta el pedido
+    tasa = np.maximum(df['ConsumoDia'].to_numpy(), df['ConsumoDia7'].to_numpy())
+    stock = df['Stock'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['DiasCobertura'] = np.where(tasa > 0, stock / tasa, np.inf)
+    # Pedido para terminar el plazo de reposición con al menos StockMinimo
+    objetivo = df['StockMinimo'].to_numpy() + tasa * lead_days
+    df['Sugerido'] = np.ceil(np.maximum(objetivo - stock, 0)).astype(int)
+    df[['ConsumoDia', 'ConsumoDia7']] = df[['ConsumoDia', 'ConsumoDia7']].round(2)
+    df['DiasCobertura'] = df['DiasCobertura'].round(1)
+    return df.reset_index().sort_values(['DiasCobertura', 'Nombre'], ignore_index=True)
+
+def get_forecast(gestion=None, hoy=None, window=WINDOW_DAYS, lead_days=LEAD_DAYS):
+    """Por insumo: consumo diario promedio (ventana y últimos 7 días), días de cobertura
+    con el stock actual y cantidad sugerida a pedir. Ordenado por urgencia."""
+    hoy = hoy or date.today()
+    # Un solo resultado por base: otro día, ventana o plazo reemplaza al anterior
+    version = (get_versions('inventory', 'movements'), hoy, window, lead_days)
+    df = _results.get_versioned((db.current_path(),), version, lambda: _forecast(hoy, window, lead_days))
+    if gestion:
+        df = df[df['Gestion'] == gestion]
+    return df.copy(deep=False)
+
+def get_gestion_forecast(hoy=None, window=WINDOW_DAYS, lead_days=LEAD_DAYS):
+    """Consumo diario por gestión e insumos que no alcanzan a cubrir el plazo de reposición"""
+    df = get_forecast(None, hoy, window, lead_days)
+    df = df.assign(EnRiesgo=df['DiasCobertura'] < lead_days)
+    return (df.groupby('Gestion', as_index=False)
+              .agg(Insumos=('ID', 'size'), ConsumoDia=('ConsumoDia', 'sum'),
+                   ConsumoDia7=('ConsumoDia7', 'sum'), EnRiesgo=('EnRiesgo', 'sum'),
+                   Sugerido=('Sugerido', 'sum'))
+              .round(2))
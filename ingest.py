@@ -0,0 +1,211 @@
+import csv
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from db import transaction, generate_id, FECHA_FMT
+from perf import timed_fn
+
+# --- IMPORTACIÓN MASIVA DE EXCEL / CSV ---
+# La planilla se procesa por columnas (sin iterrows): se validan las filas,
+# se agrupan los nombres repetidos y se resuelven los existentes con una
+# sola consulta indexada; luego todo se aplica con executemany en una transacción.
+# Los archivos se leen en bloques de CHUNK_SIZE filas (xlsx en modo read-only,
+# CSV con chunksize), así la memoria no depende del tamaño del archivo.
+
+CHUNK_SIZE = 5000
+
+def _texto(v):
+    """Celda de Excel como texto, igual en todos los bloques (3 y 3.0 -> '3')"""
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def _xlsx_chunks(f, chunk_size):
+    wb = load_workbook(f, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        # Primera fila = encabezado (igual que pd.read_excel); las columnas se leen por posición.
+        # Las celdas pasan a texto al leerlas, como el CSV (dtype=str): si pandas infiriera los
+        # tipos por bloque, Piso saldría '3' en uno y '3.0' en otro del mismo archivo.
+        if next(rows, None) is None:
+            return
+        buf = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            buf.append([_texto(v) for v in row])
+            if len(buf) >= chunk_size:
+                yield pd.DataFrame(buf, dtype=object)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, dtype=object)
+    finally:
+        wb.close()
+
+def _csv_chunks(f, chunk_size):
+    # Separador detectado con una muestra (Excel en español suele exportar con ';')
+    sample = f.read(64 * 1024)
+    f.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8", errors="replace")
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+    except csv.Error:
+        sep = ","
+    yield from pd.read_csv(f, sep=sep, chunksize=chunk_size, dtype=str,
+                           encoding="utf-8-sig", encoding_errors="replace", skip_blank_lines=True)
+
+def _count_rows(f, filename):
+    """Total aproximado de filas para la barra de progreso (None si no se sabe barato)"""
+    if filename.lower().endswith(".xlsx"):
+        wb = load_workbook(f, read_only=True)
+        try:
+            total = wb.worksheets[0].max_row
+        finally:
+            wb.close()
+            f.seek(0)
+        return total - 1 if total else None
+    return None
+
+def iter_chunks(f, filename, chunk_size=CHUNK_SIZE):
+    """Recorre un .xlsx o .csv en DataFrames de a lo más chunk_size filas (sin cargar el archivo completo)"""
+    if filename.lower().endswith(".csv"):
+        return _csv_chunks(f, chunk_size)
+    return _xlsx_chunks(f, chunk_size)
+
+def _stream(f, filename, parse, apply, progress=None, chunk_size=CHUNK_SIZE):
+    """Aplica parse/apply bloque a bloque (un commit por bloque para no retener el lock de escritura).
+    progress(filas_leidas, total_o_None) se llama después de cada bloque."""
+    total = _count_rows(f, filename)
+    fila = 2
+    aplicadas = 0
+    errores = []
+    for chunk in iter_chunks(f, filename, chunk_size):
+        validas, err = parse(chunk, fila)
+        # apply lee y después escribe: con BEGIN diferido, una dispensa que confirma entre
+        # medio deja la lectura vieja (SQLITE_BUSY_SNAPSHOT, sin busy_timeout) y el archivo
+        # a medio importar. IMMEDIATE toma el lock antes de leer, como dispense.
+        with transaction(immediate=True) as conn:
+            aplicadas += apply(conn, validas)
+        if not err.empty:
+            errores.append(err)
+        fila += len(chunk)
+        if progress:
+            progress(fila - 2, total)
+    errores = pd.concat(errores, ignore_index=True) if errores else pd.DataFrame(columns=["Fila", "Nombre", "Error"])
+    return aplicadas, errores
+
+def _parse_inventory(df, fila_inicial=2):
+    """Columnas: Nombre, Cantidad (opcional), Gestión (opcional).
+    Devuelve (filas válidas, errores) como DataFrames; Fila es la fila de Excel."""
+    n = len(df)
+    filas = pd.Series(range(fila_inicial, fila_inicial + n), index=df.index)
+    nombres = df.iloc[:, 0].astype("string").str.strip()
+    if df.shape[1] > 1:
+        cant = pd.to_numeric(df.iloc[:, 1], errors="coerce")
+    else:
+        cant = pd.Series(0, index=df.index)
+    if df.shape[1] > 2:
+        gestion = df.iloc[:, 2].astype("string").str.strip().fillna("Farmacia").replace("", "Farmacia")
+    else:
+        gestion = pd.Series("Farmacia", index=df.index)
+
+    motivo = pd.Series(pd.NA, index=df.index, dtype="string")
+    motivo = motivo.mask(cant < 0, "Cantidad negativa")
+    motivo = motivo.mask(cant.isna() | (cant != cant.round()), "Cantidad no es un número entero")
+    motivo = motivo.mask(nombres.isna() | (nombres == ""), "Nombre vacío")
+
+    malas = motivo.notna()
+    errores = pd.DataFrame({"Fila": filas[malas], "Nombre": nombres[malas], "Error": motivo[malas]})
+    validas = pd.DataFrame({"Fila": filas[~malas], "Nombre": nombres[~malas],
+                            "Cantidad": cant[~malas].astype("int64"), "Gestion": gestion[~malas]})
+    return validas, errores.reset_index(drop=True)
+
+def _upsert_inventory(conn, validas):
+    """Suma stock a los insumos existentes e inserta los nuevos. Devuelve (actualizados, nuevos).
+    Cada cambio de stock queda en movements (ENTRADA o INICIAL), como en la carga manual.
+    conn debe venir de transaction(immediate=True): los movimientos se calculan de lo leído."""
+    if validas.empty:
+        return 0, 0
+    # Nombres repetidos en la planilla: se suman (la Gestión es la de la primera aparición)
+    agg = validas.groupby("Nombre", sort=False).agg(Cantidad=("Cantidad", "sum"), Gestion=("Gestion", "first"))
+    # Listas Python una sola vez (iterar columnas de pandas elemento a elemento es lento)
+    nombres = agg.index.tolist()
+    cants = agg["Cantidad"].tolist()
+    gestiones = agg["Gestion"].tolist()
+
+    # Una sola consulta: tabla temporal de nombres unida al índice de inventory.Nombre
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_nombres (Nombre TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM import_nombres")
+    conn.executemany("INSERT INTO import_nombres VALUES (?)", [(n,) for n in nombres])
+    # (se parte de la tabla temporal para que cada nombre sea una búsqueda en el índice)
+    existentes = dict(conn.execute("""SELECT Nombre, ID FROM (
+                                          SELECT t.Nombre, (SELECT i.ID FROM inventory i WHERE i.Nombre = t.Nombre
+                                                            ORDER BY i.rowid LIMIT 1) AS ID
+                                          FROM import_nombres t)
+                                      WHERE ID IS NOT NULL""").fetchall())
+    conn.execute("DELETE FROM import_nombres")
+
+    upd = [(q, existentes[n]) for n, q in zip(nombres, cants) if n in existentes]
+    new = [(generate_id(), n, "unidades", q, 5, g)
+           for n, q, g in zip(nombres, cants, gestiones) if n not in existentes]
+    conn.executemany("UPDATE inventory SET Stock = Stock + ? WHERE ID=?", upd)
+    conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?,?)", new)
+    now = datetime.now().strftime(FECHA_FMT)
+    nombre_id = {i: n for n, i in existentes.items()}
+    movs = ([(now, 'ENTRADA', None, i, nombre_id[i], q) for q, i in upd if q] +
+            [(now, 'INICIAL', None, i, n, q) for i, n, _, q, _, _ in new if q])
+    conn.executemany("INSERT INTO movements (Fecha, Tipo, ResidenteID, InsumoID, NombreInsumo, Cantidad) VALUES (?,?,?,?,?,?)", movs)
+    return len(upd), len(new)
+
+@timed_fn('import.inventario')
+def import_inventory_file(f, filename, progress=None, chunk_size=CHUNK_SIZE):
+    """Importa inventario desde .xlsx/.csv por bloques. Devuelve (filas procesadas, errores)."""
+    def apply(conn, validas):
+        _upsert_inventory(conn, validas)
+        return len(validas)
+    return _stream(f, filename, _parse_inventory, apply, progress, chunk_size)
+
+def _parse_residents(df, fila_inicial=2):
+    """Columnas: Nombre, RUT, Piso, Habitación, Apoderado (las cuatro últimas opcionales)"""
+    filas = pd.Series(range(fila_inicial, fila_inicial + len(df)), index=df.index)
+    cols = {}
+    for i, nombre in enumerate(["Nombre", "RUT", "Piso", "Habitacion", "Apoderado"]):
+        if i < df.shape[1]:
+            cols[nombre] = df.iloc[:, i].astype("string").str.strip()
+        else:
+            cols[nombre] = pd.Series("", index=df.index, dtype="string")
+    data = pd.DataFrame(cols)
+    malas = data["Nombre"].isna() | (data["Nombre"] == "")
+    errores = pd.DataFrame({"Fila": filas[malas], "Nombre": data["Nombre"][malas], "Error": "Nombre vacío"})
+    validas = data[~malas].fillna("")
+    validas.insert(0, "Fila", filas[~malas])
+    return validas, errores.reset_index(drop=True)
+
+def _insert_new_residents(conn, validas):
+    """Inserta solo residentes cuyo nombre no existe (ni se repite en la planilla). Devuelve cuántos.
+    conn debe venir de transaction(immediate=True), igual que en _upsert_inventory."""
+    if validas.empty:
+        return 0
+    nuevos = validas.drop_duplicates("Nombre")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_nombres (Nombre TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM import_nombres")
+    conn.executemany("INSERT INTO import_nombres VALUES (?)", [(n,) for n in nuevos["Nombre"].tolist()])
+    existentes = {r[0] for r in conn.execute("""SELECT t.Nombre FROM import_nombres t
+                                                WHERE EXISTS (SELECT 1 FROM residents r WHERE r.Nombre = t.Nombre)""")}
+    conn.execute("DELETE FROM import_nombres")
+    filas = [(generate_id(), n, rt, pi, ha, ap) for n, rt, pi, ha, ap in
+             zip(*(nuevos[c].tolist() for c in ["Nombre", "RUT", "Piso", "Habitacion", "Apoderado"]))
+             if n not in existentes]
+    conn.executemany("INSERT INTO residents VALUES (?,?,?,?,?,?)", filas)
+    return len(filas)
+
+@timed_fn('import.residentes')
+def import_residents_file(f, filename, progress=None, chunk_size=CHUNK_SIZE):
+    """Importa residentes desde .xlsx/.csv por bloques. Devuelve (residentes nuevos, errores)."""
+    return _stream(f, filename, _parse_residents, _insert_new_residents, progress, chunk_size)
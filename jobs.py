@@ -0,0 +1,195 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import db
+from bulk_reports import export_residents_zip
+from db import connection, transaction
+from ingest import import_inventory_file, import_residents_file
+from parquet_export import export_parquet
+from perf import timed
+
+# --- TRABAJOS EN SEGUNDO PLANO ---
+# Importaciones y exportaciones masivas corren en un pool acotado de hilos, fuera del
+# hilo del script de Streamlit: un rerun no las corta y la sesión sigue respondiendo.
+# La tabla jobs guarda estado, avance y resultado; la página solo la consulta.
+# JOB_WORKERS limita cuántos trabajos corren a la vez (el resto espera PENDIENTE) y
+# cuántos procesos usa una exportación ZIP. Los archivos generados van a jobs_dir().
+# Cada sede tiene su tabla jobs: un trabajo corre sobre la base de la sede que lo encoló.
+
+JOB_WORKERS = int(os.environ.get("FARMACIA_JOBS", "2"))
+KEEP_DAYS = 7            # los trabajos terminados y sus archivos se borran después
+PROGRESS_EVERY = 0.5     # segundos mínimos entre escrituras de avance
+MAX_ERRORES = 1000       # filas con error que se guardan en el resultado de una importación
+ABIERTOS = ('PENDIENTE', 'EN CURSO')
+FIN_INTENTOS = 5         # intentos de escribir el estado final si la base está ocupada
+
+log = logging.getLogger("jobs")
+
+_pool = None
+_pool_lock = threading.Lock()
+_recovered = set()
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def jobs_dir():
+    """Carpeta de los archivos generados, junto a la base"""
+    return os.path.join(os.path.dirname(os.path.abspath(db.current_path())), "jobs")
+
+def _file_path(job_id, archivo):
+    return os.path.join(jobs_dir(), f"{job_id}_{archivo}")
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _pool
+
+def _recover():
+    """Los trabajos abiertos de un proceso anterior (reinicio del servidor) ya no corren: pasan a ERROR"""
+    path = db.current_path()
+    if path in _recovered:
+        return
+    with transaction() as conn:
+        conn.execute("""UPDATE jobs SET Estado = 'ERROR', Mensaje = 'Interrumpido por un reinicio del servidor', Fin = ?
+                        WHERE Estado IN (?, ?)""", (_now(), *ABIERTOS))
+    _recovered.add(path)
+
+def _progress(job_id):
+    """progress(hechas, total) con la firma de ingest/bulk_reports, que escribe el avance en jobs"""
+    last = [0.0]
+    def update(done, total):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_EVERY and (not total or done < total):
+            return
+        last[0] = now
+        with transaction() as conn:
+            conn.execute("UPDATE jobs SET Progreso = COALESCE(?, Progreso), Mensaje = ? WHERE ID = ?",
+                         (min(done / total, 1.0) if total else None, f"{done}/{total}" if total else f"{done}", job_id))
+    return update
+
+def _finish(job_id, estado, mensaje, resultado):
+    """Estado final del trabajo. Reintenta si la base está ocupada; si el resultado no se puede
+    guardar, lo deja en ERROR: un trabajo nunca queda EN CURSO para siempre."""
+    intentos = [(estado, mensaje, resultado)] * FIN_INTENTOS
+    if estado == 'OK':
+        intentos += [('ERROR', 'No se pudo guardar el resultado', None)] * FIN_INTENTOS
+    for n, (estado, mensaje, resultado) in enumerate(intentos):
+        try:
+            with transaction() as conn:
+                conn.execute("""UPDATE jobs SET Estado = ?, Progreso = CASE WHEN ? = 'OK' THEN 1 ELSE Progreso END,
+                                Mensaje = ?, Resultado = ?, Fin = ? WHERE ID = ?""",
+                             (estado, estado, mensaje, resultado, _now(), job_id))
+            return
+        except Exception:
+            log.exception("trabajo %s: no se pudo escribir el estado %s (intento %d)", job_id, estado, n + 1)
+            time.sleep(min(0.2 * 2 ** (n % FIN_INTENTOS), 2.0))
+
+def _run(job_id, tipo, fn, args, kwargs, archivo):
+    # Corre en un hilo del pool (envuelto con db.bind): usa la base de la sede que lo encoló
+    estado, mensaje, resultado = 'ERROR', 'Interrumpido', None
+    try:
+        with transaction() as conn:
+            conn.execute("UPDATE jobs SET Estado = 'EN CURSO', Inicio = ? WHERE ID = ?", (_now(), job_id))
+        with timed(f"trabajo.{tipo}"):
+            out = fn(*args, progress=_progress(job_id), **kwargs)
+        resultado = None
+        if archivo:
+            os.makedirs(jobs_dir(), exist_ok=True)
+            with open(_file_path(job_id, archivo), "wb") as fh:
+                fh.write(out)
+        else:
+            resultado = json.dumps(out, ensure_ascii=False, default=str)
+        estado, mensaje = 'OK', None
+    except Exception as e:
+        estado, mensaje, resultado = 'ERROR', str(e) or type(e).__name__, None
+    finally:
+        _finish(job_id, estado, mensaje, resultado)
+
+def submit(tipo, descripcion, fn, *args, usuario=None, archivo=None, **kwargs):
+    """Encola fn(*args, progress=..., **kwargs) y devuelve el ID del trabajo.
+    Con `archivo`, fn devuelve bytes que se guardan para descargar (job_file);
+    si no, su resultado se guarda como JSON en jobs.Resultado."""
+    _recover()
+    purge()
+    job_id = uuid.uuid4().hex
+    with transaction() as conn:
+        conn.execute("""INSERT INTO jobs (ID, Tipo, Descripcion, Usuario, Estado, Archivo, Creado)
+                        VALUES (?, ?, ?, ?, 'PENDIENTE', ?, ?)""", (job_id, tipo, descripcion, usuario, archivo, _now()))
+    _executor().submit(db.bind(_run), job_id, tipo, fn, args, kwargs, archivo)
+    return job_id
+
+def get_job(job_id):
+    """Fila del trabajo como dict (Resultado ya decodificado) o None"""
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE ID = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['Resultado'] = json.loads(job['Resultado']) if job['Resultado'] else None
+    return job
+
+def list_jobs(usuario=None, limit=20):
+    """Últimos trabajos (de un usuario o de todos), sin el resultado"""
+    _recover()
+    sql = """SELECT Creado, Usuario, Descripcion, Estado, ROUND(Progreso * 100) AS Avance, Mensaje, Inicio, Fin
+             FROM jobs WHERE (? IS NULL OR Usuario = ?) ORDER BY Creado DESC LIMIT ?"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=[usuario, usuario, limit])
+
+def job_file(job_id):
+    """Bytes del archivo generado por un trabajo terminado"""
+    job = get_job(job_id)
+    with open(_file_path(job_id, job['Archivo']), "rb") as fh:
+        return fh.read()
+
+def purge(days=KEEP_DAYS):
+    """Borra los trabajos terminados hace más de `days` días y sus archivos"""
+    limite = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    # Lee y después borra: el lock se toma antes de leer (ver ingest._stream)
+    with transaction(immediate=True) as conn:
+        viejos = conn.execute("SELECT ID, Archivo FROM jobs WHERE Fin < ? AND Estado NOT IN (?, ?)",
+                              (limite, *ABIERTOS)).fetchall()
+        conn.executemany("DELETE FROM jobs WHERE ID = ?", [(r['ID'],) for r in viejos])
+    for r in viejos:
+        if r['Archivo'] and os.path.exists(_file_path(r['ID'], r['Archivo'])):
+            os.remove(_file_path(r['ID'], r['Archivo']))
+
+# --- TRABAJOS DE LA APP ---
+
+def _import(kind, data, filename, progress):
+    fn = import_inventory_file if kind == 'inventario' else import_residents_file
+    filas, errores = fn(io.BytesIO(data), filename, progress=progress)
+    return {'filas': filas, 'n_errores': len(errores), 'errores': errores.head(MAX_ERRORES).to_dict('records')}
+
+def submit_import(kind, f, usuario=None):
+    """Importación de inventario o residentes desde un archivo subido ('inventario' / 'residentes').
+    Se copian los bytes: el archivo subido no sobrevive al rerun."""
+    return submit(f"importacion.{kind}", f"Importación de {kind}: {f.name}", _import, kind, f.getvalue(), f.name,
+                  usuario=usuario)
+
+def submit_zip_export(d_ini, d_fin, label, gestion=None, split_gestion=False, usuario=None):
+    """ZIP con un PDF por residente (bulk_reports.export_residents_zip) como trabajo"""
+    return submit("exportacion.zip", f"ZIP de reportes {d_ini} a {d_fin} ({label})", export_residents_zip,
+                  d_ini, d_fin, label, gestion, split_gestion, usuario=usuario,
+                  archivo=f"Reportes_{d_ini}_{d_fin}.zip", workers=JOB_WORKERS)
+
+def submit_parquet_export(usuario=None):
+    """Exportación incremental a Parquet (parquet_export.export_parquet) como trabajo"""
+    return submit("exportacion.parquet", "Exportación Parquet de movimientos", export_parquet, usuario=usuario)
+
+def import_result(job):
+    """(filas aplicadas, DataFrame con las primeras MAX_ERRORES filas con error, total de errores)"""
+    res = job['Resultado'] or {}
+    errores = pd.DataFrame(res.get('errores', []), columns=["Fila", "Nombre", "Error"])
+    return res.get('filas', 0), errores, res.get('n_errores', 0)
@@ -0,0 +1,189 @@
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import db
+from archive import movements_source
+from cache import LRUCache
+from db import connection, transaction, get_versions, FECHA_FMT
+from perf import timed_fn
+from reports import GESTION_SQL
+
+# --- LIBRO DE STOCK (FOTOS + MOVIMIENTOS) ---
+# Todo cambio de inventory.Stock deja un movimiento: CONSUMO resta; ENTRADA (carga manual
+# o importación) e INICIAL (stock con que se crea un insumo) suman. Cada SNAPSHOT_DAYS se
+# guarda una foto del stock según el libro, con HastaID = último movimiento incluido.
+# El stock a una fecha es la foto anterior más los movimientos posteriores (o, antes de la
+# primera foto, la primera menos los movimientos entre medio): se leen solo esos movimientos.
+# La conciliación compara el contador con la última foto más los movimientos desde ella.
+# inventory_at, reconcile y get_snapshots se cachean por versión de inventory, movements y
+# stock_snapshots: un rerun sin cambios no vuelve a recorrer el libro.
+
+SNAPSHOT_DAYS = 7
+SIGNO_SQL = "CASE WHEN m.Tipo = 'CONSUMO' THEN -m.Cantidad ELSE m.Cantidad END"
+
+_last = {}     # última foto por archivo de base, una por sede (para snapshot_if_due sin consultar)
+_views = LRUCache(32)
+LIBRO_TABLES = ('inventory', 'movements', 'stock_snapshots')
+_lock = threading.Lock()
+
+def _limite(cuando):
+    """Fecha (fin del día) o datetime (ese minuto incluido) -> límite de texto exclusivo para Fecha"""
+    if isinstance(cuando, datetime):
+        return (cuando + timedelta(minutes=1)).strftime(FECHA_FMT)
+    return (cuando + timedelta(days=1)).isoformat()
+
+def _snapshot(conn, limite=None):
+    """(foto, avance, tope): la última foto antes de limite y True, o la primera y False si no
+    hay anterior. tope es el HastaID de la foto siguiente (None si no hay): los IDs de movements
+    siguen el orden de Fecha, así que ningún movimiento anterior a limite lo supera."""
+    if limite is None:
+        return conn.execute("SELECT * FROM stock_snapshots ORDER BY Fecha DESC, ID DESC LIMIT 1").fetchone(), True, None
+    foto = conn.execute("SELECT * FROM stock_snapshots WHERE Fecha < ? ORDER BY Fecha DESC, ID DESC LIMIT 1",
+                        (limite,)).fetchone()
+    if foto is None:
+        return conn.execute("SELECT * FROM stock_snapshots ORDER BY Fecha, ID LIMIT 1").fetchone(), False, None
+    tope = conn.execute("SELECT HastaID FROM stock_snapshots WHERE Fecha >= ? ORDER BY Fecha, ID LIMIT 1",
+                        (limite,)).fetchone()
+    return foto, True, tope[0] if tope else None
+
+def _libro(foto, avance, limite=None, item=None, tope=None):
+    """CTE `libro(InsumoID, Stock)`: stock por insumo según el libro en limite (None = ahora)"""
+    filtro_foto, filtro_mov = ("AND InsumoID = ?", "AND m.InsumoID = ?") if item is not None else ("", "")
+    if avance:
+        src = movements_source(foto['Fecha'][:10], limite)
+        cond, params = "m.ID > ?", [foto['HastaID']]
+        if tope is not None:
+            cond, params = cond + " AND m.ID <= ?", params + [tope]
+        if limite:
+            cond, params = cond + " AND m.Fecha < ?", params + [limite]
+        signo = ""
+    else:
+        src = movements_source(limite, None)
+        cond, params = "m.ID <= ? AND m.Fecha >= ?", [foto['HastaID'], limite]
+        signo = "-"
+    sql = f"""libro AS (
+                  SELECT InsumoID, SUM(Stock) AS Stock FROM (
+                      SELECT InsumoID, Stock FROM stock_snapshot_items WHERE SnapshotID = ? {filtro_foto}
+                      UNION ALL
+                      SELECT m.InsumoID, {signo}SUM({SIGNO_SQL}) FROM {src} m
+                      WHERE {cond} {filtro_mov} GROUP BY +m.InsumoID)
+                  GROUP BY InsumoID)"""
+    item_params = [item] if item is not None else []
+    return sql, [foto['ID'], *item_params, *params, *item_params]
+
+@timed_fn('db.libro')
+def stock_at(item_id, cuando):
+    """Stock de un insumo según el libro al final del día `cuando` (o en ese minuto si es datetime)"""
+    limite = _limite(cuando)
+    with connection() as conn:
+        foto, avance, tope = _snapshot(conn, limite)
+        if foto is None:
+            return None
+        cte, params = _libro(foto, avance, limite, item_id, tope)
+        row = conn.execute(f"WITH {cte} SELECT Stock FROM libro", params).fetchone()
+    return row[0] if row else 0
+
+def _cached(name, build, params=()):
+    df = _views.get_versioned((db.current_path(), name), get_versions(*LIBRO_TABLES), build, params)
+    return df.copy(deep=False)
+
+def inventory_at(cuando, gestion=None):
+    """Stock de cada insumo del inventario según el libro al final del día `cuando`"""
+    return _cached('inventario', lambda: _inventory_at(cuando, gestion), (cuando, gestion))
+
+@timed_fn('db.libro')
+def _inventory_at(cuando, gestion):
+    limite = _limite(cuando)
+    with connection() as conn:
+        foto, avance, tope = _snapshot(conn, limite)
+        if foto is None:
+            return pd.DataFrame(columns=['ID', 'Nombre', 'Gestion', 'Unidad', 'Stock'])
+        cte, params = _libro(foto, avance, limite, tope=tope)
+        sql = f"""WITH {cte}
+                  SELECT i.ID, i.Nombre, {GESTION_SQL} AS Gestion, i.Unidad, COALESCE(l.Stock, 0) AS Stock
+                  FROM inventory i LEFT JOIN libro l ON l.InsumoID = i.ID
+                  WHERE (? IS NULL OR {GESTION_SQL} = ?)
+                  ORDER BY i.Nombre"""
+        return pd.read_sql(sql, conn, params=params + [gestion, gestion])
+
+def _conciliacion_sql(cte):
+    # Una sola consulta: contador y movimientos se leen en la misma instantánea de la base
+    return f"""WITH {cte}
+               SELECT i.ID, i.Nombre, {GESTION_SQL} AS Gestion, COALESCE(i.Stock, 0) AS Contador,
+                      COALESCE(l.Stock, 0) AS Libro, COALESCE(i.Stock, 0) - COALESCE(l.Stock, 0) AS Diferencia
+               FROM inventory i LEFT JOIN libro l ON l.InsumoID = i.ID"""
+
+def reconcile():
+    """Insumos cuyo contador inventory.Stock no coincide con el libro (última foto + movimientos desde ella)"""
+    return _cached('conciliacion', _reconcile)
+
+@timed_fn('db.libro')
+def _reconcile():
+    with connection() as conn:
+        foto, _, _ = _snapshot(conn)
+        if foto is None:
+            return pd.DataFrame(columns=['ID', 'Nombre', 'Gestion', 'Contador', 'Libro', 'Diferencia'])
+        cte, params = _libro(foto, True)
+        sql = _conciliacion_sql(cte) + " WHERE Diferencia != 0 ORDER BY ABS(Diferencia) DESC, i.Nombre"
+        return pd.read_sql(sql, conn, params=params)
+
+@timed_fn('db.libro')
+def take_snapshot(origen='libro'):
+    """Guarda una foto del stock de todos los insumos. origen='libro' la calcula desde la foto
+    anterior y los movimientos; 'contador' toma inventory.Stock como nueva base (p. ej. tras
+    un inventario físico). Devuelve (ID de la foto, insumos con deriva)."""
+    with transaction(immediate=True) as conn:
+        foto, _, _ = _snapshot(conn)
+        hasta_id = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'movements'), 0)").fetchone()[0]
+        if foto is None:
+            origen = 'contador'
+            filas = conn.execute("SELECT ID, COALESCE(Stock, 0) AS Contador, COALESCE(Stock, 0) AS Libro FROM inventory").fetchall()
+        else:
+            cte, params = _libro(foto, True)
+            filas = conn.execute(_conciliacion_sql(cte), params).fetchall()
+        deriva = sum(1 for r in filas if r['Contador'] != r['Libro'])
+        campo = 'Contador' if origen == 'contador' else 'Libro'
+        ahora = datetime.now().strftime(FECHA_FMT)
+        cur = conn.execute("INSERT INTO stock_snapshots (Fecha, HastaID, Insumos, Deriva, Origen) VALUES (?, ?, ?, ?, ?)",
+                           (ahora, hasta_id, len(filas), deriva, origen))
+        conn.executemany("INSERT INTO stock_snapshot_items VALUES (?, ?, ?)",
+                         [(cur.lastrowid, r['ID'], r[campo]) for r in filas])
+    _last[db.current_path()] = ahora
+    return cur.lastrowid, deriva
+
+def snapshot_if_due(days=SNAPSHOT_DAYS):
+    """Toma la foto periódica si la última tiene `days` días o más (sin consultar la base si no toca)"""
+    path = db.current_path()
+    with _lock:
+        ultima = _last.get(path)
+        if ultima is None:
+            with connection() as conn:
+                row = conn.execute("SELECT MAX(Fecha) FROM stock_snapshots").fetchone()
+            ultima = _last[path] = row[0] or ""
+        if ultima and ultima[:10] > (date.today() - timedelta(days=days)).isoformat():
+            return None
+        return take_snapshot()
+
+def get_snapshots(limit=20):
+    def build():
+        with connection() as conn:
+            return pd.read_sql("SELECT ID, Fecha, HastaID, Insumos, Deriva, Origen FROM stock_snapshots ORDER BY ID DESC LIMIT ?",
+                               conn, params=[limit])
+    return _cached('fotos', build, (limit,))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fotos de stock y conciliación del contador con el libro")
+    ap.add_argument("--db", default=db.DB_PATH, help="archivo SQLite (por defecto farmacia.db)")
+    ap.add_argument("--foto", action="store_true", help="tomar una foto ahora")
+    ap.add_argument("--base-contador", action="store_true", help="tomar el contador actual como nueva base")
+    args = ap.parse_args()
+    db.DB_PATH = args.db
+    db.init_db()
+    if args.foto or args.base_contador:
+        foto_id, deriva = take_snapshot('contador' if args.base_contador else 'libro')
+        print(f"Foto {foto_id}: {deriva} insumos con deriva")
+    df = reconcile()
+    print(df.to_string(index=False) if not df.empty else "Contador y libro coinciden")
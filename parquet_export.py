@@ -0,0 +1,174 @@
+import argparse
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import db
+from db import connection, movement_tables, FECHA_FMT
+from perf import timed_fn
+from reports import GESTION_SQL
+
+# --- EXPORTACIÓN PARQUET PARA ANÁLISIS ---
+# movements (con su archivo) unido a la gestión del insumo y a los datos del residente,
+# en un archivo Parquet por mes (Mes=AAAA-MM/movimientos.parquet, particiones estilo Hive).
+# Cada exportación lee solo los movimientos con ID mayor a la marca de la anterior, por
+# bloques de ID (lecturas cortas) y reescribe los meses que recibieron filas. La marca
+# (HastaID) se guarda en _estado.json dentro de la carpeta, junto a las filas por mes.
+# Gestión y datos del residente son los vigentes al exportar cada fila. Las filas con una
+# Fecha que no es una fecha real (bases anteriores a la migración 16, archivo) se omiten
+# y sus ID quedan en Omitidos del estado, en vez de cortar la exportación completa.
+
+CHUNK_SIZE = 50_000
+ESTADO = "_estado.json"
+ARCHIVO_MES = "movimientos.parquet"
+
+SCHEMA = pa.schema([
+    ("ID", pa.int64()), ("Fecha", pa.timestamp("s")), ("Tipo", pa.string()),
+    ("InsumoID", pa.string()), ("NombreInsumo", pa.string()), ("Gestion", pa.string()), ("Unidad", pa.string()),
+    ("Cantidad", pa.int64()), ("ResidenteID", pa.string()), ("Residente", pa.string()), ("RUT", pa.string()),
+    ("Piso", pa.string()), ("Habitacion", pa.string()), ("Apoderado", pa.string()),
+])
+
+def export_dir():
+    """Carpeta por defecto de la exportación: analytics/<nombre de la base>, junto a la base
+    (las sedes pueden compartir carpeta sin pisarse la marca)"""
+    path = os.path.abspath(db.current_path())
+    return os.path.join(os.path.dirname(path), "analytics", os.path.splitext(os.path.basename(path))[0])
+
+def get_export_state(path=None):
+    """Marca y filas por mes de la última exportación en `path` (vacío si nunca se exportó)"""
+    try:
+        with open(os.path.join(path or export_dir(), ESTADO), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"HastaID": 0, "Fecha": None, "Filas": 0, "Meses": {}, "Omitidos": []}
+
+def _chunk(conn, tabla, desde_id, hasta_id, chunk_size):
+    """Hasta chunk_size filas de `tabla` con ID en (desde_id, hasta_id], unidas a inventory y residents"""
+    sql = f"""SELECT m.ID, m.Fecha, m.Tipo, m.InsumoID, m.NombreInsumo, {GESTION_SQL} AS Gestion, i.Unidad,
+                     m.Cantidad, m.ResidenteID, r.Nombre AS Residente, r.RUT, r.Piso, r.Habitacion, r.Apoderado
+              FROM {tabla} m
+              LEFT JOIN inventory i ON i.ID = m.InsumoID
+              LEFT JOIN residents r ON r.ID = m.ResidenteID
+              WHERE m.ID > ? AND m.ID <= ?
+              ORDER BY m.ID LIMIT ?"""
+    return pd.read_sql(sql, conn, params=[desde_id, hasta_id, chunk_size])
+
+def _parse_fechas(df):
+    """(filas con Fecha como Timestamp, IDs de las filas cuya Fecha no es una fecha real)"""
+    fechas = pd.to_datetime(df["Fecha"], format=FECHA_FMT, errors="coerce")
+    malas = fechas.isna()
+    return df[~malas].assign(Fecha=fechas[~malas]), df.loc[malas, "ID"].tolist()
+
+def _to_arrow(df):
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+def _write_month(path, mes, nuevas, marca, reescrito):
+    """Une las filas nuevas al archivo del mes y lo reemplaza de forma atómica. Devuelve sus filas."""
+    carpeta = os.path.join(path, f"Mes={mes}")
+    destino = os.path.join(carpeta, ARCHIVO_MES)
+    partes = []
+    if os.path.exists(destino):
+        previo = pq.read_table(destino, schema=SCHEMA)
+        if not reescrito:
+            # Filas de una exportación interrumpida (sobre la marca) se vuelven a leer de la base
+            previo = previo.filter(pc.less_equal(previo["ID"], marca))
+        partes.append(previo)
+    partes.extend(nuevas)
+    tabla = pa.concat_tables(partes).sort_by("ID")
+    os.makedirs(carpeta, exist_ok=True)
+    tmp = destino + ".tmp"
+    # Grupos de filas de 64k: las estadísticas por grupo permiten saltar rangos de Fecha/ID
+    pq.write_table(tabla, tmp, compression="zstd", row_group_size=65_536)
+    os.replace(tmp, destino)
+    return tabla.num_rows
+
+@timed_fn('proceso.parquet')
+def export_parquet(path=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Exporta los movimientos nuevos desde la última marca. Devuelve el estado guardado.
+    progress(movimientos_leidos, total) se llama después de cada bloque."""
+    path = path or export_dir()
+    estado = get_export_state(path)
+    marca = estado["HastaID"]
+    with connection() as conn:
+        # Tope fijo al empezar: lo que llegue mientras tanto queda para la próxima exportación
+        hasta_id = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'movements'), 0)").fetchone()[0]
+        tablas = movement_tables(conn)
+        total = sum(conn.execute(f"SELECT COUNT(*) FROM {t} WHERE ID > ? AND ID <= ?", (marca, hasta_id)).fetchone()[0]
+                    for t in tablas)
+    pendientes, reescritos, leidos = {}, set(), 0
+    omitidos = set(estado.get("Omitidos", []))
+
+    def flush(meses):
+        for mes in sorted(meses):
+            estado["Meses"][mes] = _write_month(path, mes, pendientes.pop(mes), marca, mes in reescritos)
+            reescritos.add(mes)
+
+    for tabla in tablas:
+        # Una conexión por bloque: ninguna lectura retiene la base mientras se escribe Parquet
+        desde_id = marca
+        while True:
+            with connection() as conn:
+                df = _chunk(conn, tabla, desde_id, hasta_id, chunk_size)
+            if df.empty:
+                break
+            desde_id = int(df["ID"].iloc[-1])
+            leidos += len(df)
+            df, malas = _parse_fechas(df)
+            omitidos.update(malas)
+            if not df.empty:
+                meses = df["Fecha"].dt.strftime("%Y-%m")
+                for mes, grupo in df.groupby(meses, sort=True):
+                    pendientes.setdefault(mes, []).append(_to_arrow(grupo))
+                # Los IDs siguen a Fecha: los meses anteriores al bloque ya están completos
+                flush([m for m in pendientes if m < meses.min()])
+            if progress:
+                progress(leidos, total)
+    flush(list(pendientes))
+
+    estado.update(HastaID=hasta_id, Fecha=datetime.now().strftime(FECHA_FMT),
+                  Filas=sum(estado["Meses"].values()), Omitidos=sorted(omitidos))
+    os.makedirs(path, exist_ok=True)
+    tmp = os.path.join(path, ESTADO + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(estado, fh, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(path, ESTADO))
+    return estado
+
+def open_dataset(path=None):
+    """Dataset de pyarrow sobre la exportación (Mes como columna de partición)"""
+    return ds.dataset(path or export_dir(), format="parquet", partitioning="hive",
+                      exclude_invalid_files=True, ignore_prefixes=["_", "."])
+
+def export_zip(path=None):
+    """La exportación completa (Parquet y _estado.json) en un ZIP, para llevarla a otro equipo"""
+    path = path or export_dir()
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:   # Parquet ya va comprimido
+        for raiz, _, archivos in os.walk(path):
+            for nombre in archivos:
+                if not nombre.endswith(".tmp"):
+                    completo = os.path.join(raiz, nombre)
+                    zf.write(completo, os.path.relpath(completo, path))
+    return buf.getvalue()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Exportación incremental de movimientos a Parquet")
+    ap.add_argument("--db", default=db.DB_PATH, help="archivo SQLite (por defecto farmacia.db)")
+    ap.add_argument("--dir", help="carpeta de destino (por defecto analytics/<base> junto a la base)")
+    args = ap.parse_args()
+    db.DB_PATH = args.db
+    db.init_db()
+    antes = get_export_state(args.dir)["HastaID"]
+    estado = export_parquet(args.dir)
+    print(f"Movimientos {antes + 1}..{estado['HastaID']} exportados; {estado['Filas']} filas en {len(estado['Meses'])} meses")
+    if estado["Omitidos"]:
+        print(f"{len(estado['Omitidos'])} movimientos omitidos por fecha inválida (ID {', '.join(map(str, estado['Omitidos'][:20]))})")
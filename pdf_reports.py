@@ -0,0 +1,120 @@
+import pandas as pd
+from datetime import datetime
+from fpdf import FPDF
+
+import db
+from cache import LRUCache
+from perf import timed_fn
+
+# --- GENERACIÓN PDF ---
+# Las filas se recorren como columnas ya convertidas (zip de listas), sin
+# iterrows: la conversión a latin-1 se hace una vez por columna, no por celda.
+
+PDF_CACHE_SIZE = 32
+
+# PDFs ya generados, por (base, tipo, versiones de tablas, filtros)
+_pdf_cache = LRUCache(PDF_CACHE_SIZE)
+
+def cached_pdf(kind, versions, params, build):
+    """Bytes del PDF memoizados; build() solo corre si no hay uno para estas versiones y filtros"""
+    # Al cambiar los datos, los PDF del mismo tipo y sede con versiones viejas ya no sirven
+    return _pdf_cache.get_versioned((db.current_path(), kind), versions, build, params)
+
+def clean_text(text):
+    try:
+        return str(text).encode('latin-1', 'replace').decode('latin-1')
+    except:
+        return str(text)
+
+def clean_column(col):
+    """clean_text vectorizado: Series -> lista de str en latin-1"""
+    return col.astype(str).str.encode('latin-1', 'replace').str.decode('latin-1').tolist()
+
+def _fecha_column(col):
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col.dt.strftime("%Y-%m-%d %H:%M").fillna("").tolist()
+    return col.astype(str).tolist()
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Farmacia Ac - Reporte Oficial', 0, 1, 'C')
+        self.ln(5)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+
+def _table(pdf, widths, columns):
+    """Dibuja las filas de una tabla a partir de listas ya limpias (una por columna)"""
+    cell, ln = pdf.cell, pdf.ln
+    for row in zip(*columns):
+        for w, txt in zip(widths, row):
+            cell(w, 8, txt, 1)
+        ln()
+
+@timed_fn('pdf.residente')
+def generate_pdf(resident_row, df_consumos, start, end, label):
+    pdf = PDF()
+    pdf.add_page()
+    
+    # Info Residente
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, f"Residente: {clean_text(resident_row['Nombre'])}", 0, 1)
+    
+    pdf.set_font("Arial", size=10)
+    pdf.cell(0, 6, f"RUT: {resident_row['RUT']}", 0, 1)
+    pdf.cell(0, 6, f"Ubicacion: Piso {clean_text(resident_row['Piso'])} - Hab {clean_text(resident_row['Habitacion'])}", 0, 1)
+    pdf.cell(0, 6, f"Apoderado: {clean_text(resident_row['Apoderado'])}", 0, 1)
+    pdf.ln(3)
+    
+    pdf.set_font("Arial", 'I', 9)
+    pdf.cell(0, 6, f"Reporte: {clean_text(label)} | Del {start} al {end}", 0, 1)
+    pdf.ln(5)
+    
+    # Tabla
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(40, 8, "Fecha", 1)
+    pdf.cell(80, 8, "Insumo", 1)
+    pdf.cell(40, 8, "Gestion", 1)
+    pdf.cell(30, 8, "Cantidad", 1)
+    pdf.ln()
+    
+    pdf.set_font("Arial", size=9)
+    _table(pdf, (40, 80, 40, 30), (
+        _fecha_column(df_consumos['Fecha']),
+        clean_column(df_consumos['NombreInsumo']),
+        clean_column(df_consumos['Gestion']),
+        df_consumos['Cantidad'].astype(str).tolist(),
+    ))
+        
+    return pdf.output(dest='S').encode('latin-1')
+
+@timed_fn('pdf.inventario')
+def generate_inventory_pdf(df_inv, user):
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "Inventario General", 0, 1, 'C')
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(0, 10, f"Generado por: {clean_text(user)} | {datetime.now().strftime('%d/%m/%Y')}", 0, 1, 'C')
+    pdf.ln(5)
+    
+    pdf.set_font("Arial", 'B', 9)
+    pdf.cell(70, 8, "Nombre", 1)
+    pdf.cell(30, 8, "Gestion", 1)
+    pdf.cell(30, 8, "Unidad", 1)
+    pdf.cell(30, 8, "Stock", 1)
+    pdf.cell(30, 8, "Minimo", 1)
+    pdf.ln()
+    
+    pdf.set_font("Arial", size=9)
+    _table(pdf, (70, 30, 30, 30, 30), (
+        clean_column(df_inv['Nombre']),
+        clean_column(df_inv['Gestion']),
+        clean_column(df_inv['Unidad']),
+        df_inv['Stock'].astype(str).tolist(),
+        df_inv['StockMinimo'].astype(str).tolist(),
+    ))
+        
+    return pdf.output(dest='S').encode('latin-1')
@@ -0,0 +1,187 @@
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+# --- INSTRUMENTACIÓN ---
+# Tiempos por página y operación (DB, procesamiento, PDF, importaciones) y por consulta
+# SQL, guardados en memoria para las últimas ejecuciones. El panel "Rendimiento" los
+# muestra; cada consulta también va al logger "perf" (DEBUG, o WARNING si es lenta).
+
+MAX_SAMPLES = 500        # muestras por (página, operación) y por consulta
+SLOW_QUERY_MS = 200
+# FARMACIA_PERF=0 desactiva la medición por consulta (unos 2 µs cada una)
+QUERY_TIMING = os.environ.get("FARMACIA_PERF", "1") != "0"
+
+log = logging.getLogger("perf")
+
+_lock = threading.Lock()
+_ops = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_queries = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_query_count = defaultdict(int)
+_local = threading.local()   # página en curso del hilo (Streamlit usa un hilo por sesión)
+last_profile = {}
+
+def _page():
+    return getattr(_local, 'page', '-')
+
+def record(op, ms):
+    with _lock:
+        _ops[(_page(), op)].append(ms)
+
+@contextmanager
+def timed(op):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(op, (time.perf_counter() - t0) * 1000)
+
+def timed_fn(op):
+    """Decorador: registra la duración de cada llamada como `op`"""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(op):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# --- CONSULTAS SQL ---
+
+_keys = {}
+
+def _query_key(sql):
+    key = _keys.get(sql)
+    if key is None:
+        key = re.sub(r"\s+", " ", sql).strip()[:120]
+        if len(_keys) < 10_000:
+            _keys[sql] = key
+    return key
+
+def _record_query(sql, t0):
+    ms = (time.perf_counter() - t0) * 1000
+    key = _query_key(sql)
+    # Con lock: una clave nueva agranda los dict que queries_summary recorre desde otra sesión
+    with _lock:
+        _queries[key].append(ms)
+        _query_count[key] += 1
+    _local.queries = getattr(_local, 'queries', 0) + 1
+    if ms >= SLOW_QUERY_MS:
+        log.warning("consulta lenta %.1f ms: %s", ms, key)
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug("%.1f ms: %s", ms, key)
+
+class TimedCursor(sqlite3.Cursor):
+    # La duración es la de execute: preparar, primer paso y esperas por lock (busy_timeout)
+    def execute(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            _record_query(sql, t0)
+
+    def executemany(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            _record_query(sql, t0)
+
+class TimedConnection(sqlite3.Connection):
+    """Conexión que mide cada consulta (factory de sqlite3.connect)"""
+    def cursor(self, factory=None):
+        return super().cursor(factory or TimedCursor)
+
+    def execute(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            _record_query(sql, t0)
+
+    def executemany(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            _record_query(sql, t0)
+
+CONNECTION_FACTORY = TimedConnection if QUERY_TIMING else sqlite3.Connection
+
+# --- PÁGINAS ---
+
+def begin_page(page, profile=False):
+    """Inicio de un rerun de `page`. Con profile=True se perfila este rerun con cProfile."""
+    _local.page = page
+    _local.queries = 0
+    _local.start = time.perf_counter()
+    # Un rerun perfilado que terminó con st.rerun() no pasó por end_page: su perfil
+    # seguiría activo en este hilo (Streamlit lo reutiliza) y frenaría los siguientes
+    previo = getattr(_local, 'profiler', None)
+    if previo:
+        previo.disable()
+    _local.profiler = None
+    if profile:
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+
+def end_page():
+    """Fin del rerun (un st.rerun() previo lo descarta: no llega aquí)"""
+    start = getattr(_local, 'start', None)
+    if start is None:
+        return
+    record('rerun', (time.perf_counter() - start) * 1000)
+    record('consultas por rerun', _local.queries)
+    _local.start = None
+    profiler = getattr(_local, 'profiler', None)
+    if profiler:
+        profiler.disable()
+        _local.profiler = None
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+        profiler.create_stats()
+        last_profile.update(page=_page(), text=out.getvalue(), stats=profiler.stats)
+
+def profile_bytes():
+    """Último perfil en formato .prof (para snakeviz / pstats)"""
+    return marshal.dumps(last_profile['stats']) if last_profile else b""
+
+# --- RESÚMENES ---
+
+def _percentiles(values):
+    a = np.fromiter(values, dtype=float)
+    return len(a), np.percentile(a, 50), np.percentile(a, 95), a.max()
+
+def ops_summary():
+    with _lock:
+        items = [(k, list(v)) for k, v in _ops.items() if v]
+    rows = [(page, op, *_percentiles(v)) for (page, op), v in items]
+    df = pd.DataFrame(rows, columns=['Página', 'Operación', 'N', 'p50', 'p95', 'Máx'])
+    return df.sort_values(['Página', 'p95'], ascending=[True, False], ignore_index=True).round(2)
+
+def queries_summary():
+    with _lock:
+        items = [(k, list(v), _query_count[k]) for k, v in _queries.items() if v]
+    rows = [(sql, total, *_percentiles(v)[1:], sum(v)) for sql, v, total in items]
+    df = pd.DataFrame(rows, columns=['Consulta', 'Total', 'p50 ms', 'p95 ms', 'Máx ms', 'Suma ms'])
+    return df.sort_values('Suma ms', ascending=False, ignore_index=True).round(2)
+
+def reset():
+    with _lock:
+        _ops.clear()
+        _queries.clear()
+        _query_count.clear()
+    last_profile.clear()
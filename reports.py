@@ -0,0 +1,81 @@
+import pandas as pd
+from datetime import timedelta
+
+from archive import movements_source
+from db import connection
+from perf import timed_fn
+
+# --- CONSULTAS DE REPORTES (FILTRADO EN SQL) ---
+# Los filtros de tipo, fechas, gestión y residente se resuelven en SQLite sobre
+# los índices de movements, así cada rerun solo lee las filas que se muestran.
+# Rangos que alcanzan meses archivados leen también esas particiones (archive.py).
+
+# Insumos sin gestión o borrados se reportan como Farmacia (igual que el merge anterior)
+GESTION_SQL = "COALESCE(NULLIF(TRIM(i.Gestion), ''), 'Farmacia')"
+
+def _date_bounds(d_ini, d_fin):
+    """Rango [d_ini, d_fin] inclusivo como límites de texto comparables con Fecha"""
+    return d_ini.strftime("%Y-%m-%d"), (d_fin + timedelta(days=1)).strftime("%Y-%m-%d")
+
+def _consumo_where(d_ini, d_fin, gestion=None, res_id=None):
+    desde, hasta = _date_bounds(d_ini, d_fin)
+    where = ["m.Tipo = 'CONSUMO'", "m.Fecha >= ?", "m.Fecha < ?"]
+    params = [desde, hasta]
+    if res_id is not None:
+        where.append("m.ResidenteID = ?")
+        params.append(str(res_id))
+    if gestion:
+        where.append(f"{GESTION_SQL} = ?")
+        params.append(gestion)
+    return " AND ".join(where), params
+
+def _source(d_ini, d_fin):
+    return movements_source(*_date_bounds(d_ini, d_fin))
+
+def has_movements():
+    with connection() as conn:
+        return conn.execute("""SELECT EXISTS (SELECT 1 FROM movements)
+                                      OR EXISTS (SELECT 1 FROM movements_archive_periods)""").fetchone()[0] == 1
+
+@timed_fn('db.reportes')
+def get_report_residents(d_ini, d_fin, gestion=None):
+    """Residentes (ID, Nombre) con consumos en el periodo y gestión indicados"""
+    where, params = _consumo_where(d_ini, d_fin, gestion)
+    sql = f"""SELECT DISTINCT r.ID, r.Nombre
+              FROM {_source(d_ini, d_fin)} m
+              JOIN residents r ON r.ID = m.ResidenteID
+              LEFT JOIN inventory i ON i.ID = m.InsumoID
+              WHERE {where} AND r.Nombre IS NOT NULL
+              ORDER BY r.Nombre, r.ID"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+@timed_fn('db.reportes')
+def get_resident_consumos(res_id, d_ini, d_fin, gestion=None):
+    """Consumos de un residente en el periodo, listos para tabla y PDF"""
+    where, params = _consumo_where(d_ini, d_fin, gestion, res_id)
+    sql = f"""SELECT m.Fecha, m.NombreInsumo, {GESTION_SQL} AS Gestion, m.Cantidad
+              FROM {_source(d_ini, d_fin)} m
+              LEFT JOIN inventory i ON i.ID = m.InsumoID
+              WHERE {where}
+              ORDER BY m.Fecha, m.ID"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+def get_resident(res_id):
+    with connection() as conn:
+        return conn.execute("SELECT * FROM residents WHERE ID=?", (str(res_id),)).fetchone()
+
+@timed_fn('db.reportes')
+def get_period_consumos(d_ini, d_fin, gestion=None):
+    """Todos los consumos del periodo con los datos de cada residente (una sola consulta, para exportar)"""
+    where, params = _consumo_where(d_ini, d_fin, gestion)
+    sql = f"""SELECT m.ResidenteID, r.Nombre, r.RUT, r.Piso, r.Habitacion, r.Apoderado,
+                     m.Fecha, m.NombreInsumo, {GESTION_SQL} AS Gestion, m.Cantidad
+              FROM {_source(d_ini, d_fin)} m
+              JOIN residents r ON r.ID = m.ResidenteID
+              LEFT JOIN inventory i ON i.ID = m.InsumoID
+              WHERE {where}
+              ORDER BY r.Nombre, m.ResidenteID, m.Fecha, m.ID"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
@@ -0,0 +1,84 @@
+import argparse
+
+import pandas as pd
+
+import db
+import forecast
+from db import connection, transaction
+from perf import timed_fn
+
+# --- RESUMEN DIARIO DE CONSUMOS (consumption_daily) ---
+# Totales por periodo leídos del resumen (una fila por día/residente/insumo/gestión)
+# en vez de recorrer movements. Los triggers de db.py lo mantienen al día.
+
+def _where(d_ini, d_fin, gestion=None, res_id=None):
+    where = ["c.Dia >= ?", "c.Dia <= ?"]
+    params = [d_ini.strftime("%Y-%m-%d"), d_fin.strftime("%Y-%m-%d")]
+    if res_id is not None:
+        where.append("c.ResidenteID = ?")
+        params.append(str(res_id))
+    if gestion:
+        where.append("c.Gestion = ?")
+        params.append(gestion)
+    return " AND ".join(where), params
+
+@timed_fn('db.resumen')
+def get_period_summary(d_ini, d_fin, gestion=None):
+    """Totales del periodo por residente (para cobro a apoderados)"""
+    where, params = _where(d_ini, d_fin, gestion)
+    sql = f"""SELECT r.Nombre AS Residente, r.RUT, r.Apoderado,
+                     COUNT(DISTINCT c.InsumoID) AS Insumos, SUM(c.Movimientos) AS Entregas, SUM(c.Cantidad) AS Cantidad
+              FROM consumption_daily c
+              JOIN residents r ON r.ID = c.ResidenteID
+              WHERE {where}
+              GROUP BY c.ResidenteID
+              ORDER BY r.Nombre"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+@timed_fn('db.resumen')
+def get_resident_totals(res_id, d_ini, d_fin, gestion=None):
+    """Totales del periodo de un residente, por insumo"""
+    where, params = _where(d_ini, d_fin, gestion, res_id)
+    sql = f"""SELECT COALESCE(i.Nombre, c.InsumoID) AS Insumo, c.Gestion,
+                     SUM(c.Movimientos) AS Entregas, SUM(c.Cantidad) AS Cantidad
+              FROM consumption_daily c
+              LEFT JOIN inventory i ON i.ID = c.InsumoID
+              WHERE {where}
+              GROUP BY c.InsumoID, c.Gestion
+              ORDER BY Cantidad DESC"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+@timed_fn('db.resumen')
+def get_item_totals(d_ini, d_fin, gestion=None):
+    """Consumo del periodo por insumo (para reposición)"""
+    where, params = _where(d_ini, d_fin, gestion)
+    sql = f"""SELECT c.InsumoID, COALESCE(i.Nombre, c.InsumoID) AS Insumo, c.Gestion,
+                     SUM(c.Cantidad) AS Cantidad
+              FROM consumption_daily c
+              LEFT JOIN inventory i ON i.ID = c.InsumoID
+              WHERE {where}
+              GROUP BY c.InsumoID, c.Gestion
+              ORDER BY Cantidad DESC"""
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+def rebuild():
+    """Reconstruye consumption_daily desde todo el historial de movements"""
+    with transaction(immediate=True) as conn:
+        db.rebuild_consumption_daily(conn)
+        filas = conn.execute("SELECT COUNT(*) FROM consumption_daily").fetchone()[0]
+    # El pronóstico guarda días ya leídos del resumen
+    forecast.reset()
+    return filas
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Mantenimiento de consumption_daily")
+    ap.add_argument("--db", default=db.DB_PATH, help="archivo SQLite (por defecto farmacia.db)")
+    ap.add_argument("--rebuild", action="store_true", help="recalcular el resumen desde movements")
+    args = ap.parse_args()
+    db.DB_PATH = args.db
+    db.init_db()
+    if args.rebuild:
+        print(f"consumption_daily reconstruida: {rebuild()} filas")
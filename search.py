@@ -0,0 +1,104 @@
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+import db
+from cache import LRUCache
+from db import connection, transaction, get_versions, SEARCH_COLUMNS, LABEL_VERSIONS
+from perf import timed_fn
+
+# --- BÚSQUEDA Y PAGINACIÓN EN SQL ---
+# Las tablas y selectores grandes piden a SQLite solo la página visible. El texto
+# buscado se resuelve con los índices FTS5 (prefijo de cada palabra); sin FTS5 se usa LIKE.
+# Las páginas se guardan por versión de tabla, así un rerun sin cambios no consulta la base.
+
+PAGE_SIZE = 50
+PAGE_CACHE_SIZE = 64
+
+_pages = LRUCache(PAGE_CACHE_SIZE)
+_options = LRUCache(PAGE_CACHE_SIZE)
+_stock = LRUCache(PAGE_CACHE_SIZE)
+_fts = {}
+
+def fts_query(text):
+    """Texto libre -> consulta FTS5: todas las palabras, cada una como prefijo"""
+    palabras = re.findall(r"\w+", text or "")
+    return " ".join(f'"{p}"*' for p in palabras)
+
+def _has_fts(conn, table):
+    key = (db.current_path(), table)
+    if key not in _fts:
+        _fts[key] = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table}_fts",)).fetchone() is not None
+    return _fts[key]
+
+@timed_fn('db.busqueda')
+def _query(table, text, page, page_size):
+    col = SEARCH_COLUMNS[table][0]
+    limit = [page_size, page * page_size]
+    with connection() as conn:
+        q = fts_query(text)
+        if not q:
+            total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            # El OFFSET recorre solo el índice por nombre; se leen las filas de la página
+            sql = f"""SELECT t.* FROM (SELECT rowid AS k FROM {table} ORDER BY {col}, rowid LIMIT ? OFFSET ?) p
+                      JOIN {table} t ON t.rowid = p.k ORDER BY t.{col}, t.rowid"""
+            df = pd.read_sql(sql, conn, params=limit)
+        elif _has_fts(conn, table):
+            total = conn.execute(f"SELECT COUNT(*) FROM {table}_fts WHERE {table}_fts MATCH ?", (q,)).fetchone()[0]
+            sql = f"""SELECT t.* FROM {table} t
+                      WHERE t.rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)
+                      ORDER BY t.{col}, t.rowid LIMIT ? OFFSET ?"""
+            df = pd.read_sql(sql, conn, params=[q] + limit)
+        else:
+            cols = SEARCH_COLUMNS[table]
+            where = " OR ".join(f"{c} LIKE ?" for c in cols)
+            params = [f"%{text.strip()}%"] * len(cols)
+            total = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+            df = pd.read_sql(f"SELECT * FROM {table} WHERE {where} ORDER BY {col}, rowid LIMIT ? OFFSET ?",
+                             conn, params=params + limit)
+    return df, total
+
+def search_table(table, text="", page=0, page_size=PAGE_SIZE):
+    """(filas de la página, total de coincidencias), ordenadas por nombre"""
+    (version,) = get_versions(table)
+    params = ((text or "").strip().lower(), page, page_size)
+    df, total = _pages.get_versioned((db.current_path(), table), version, lambda: _query(table, text, page, page_size), params)
+    return df.copy(deep=False), total
+
+def search_inventory(text="", page=0, page_size=PAGE_SIZE):
+    return search_table('inventory', text, page, page_size)
+
+def search_residents(text="", page=0, page_size=PAGE_SIZE):
+    return search_table('residents', text, page, page_size)
+
+# --- OPCIONES DE SELECTORES ---
+# ids en orden, filas por ID y mapa ID -> posición (restaurar la selección es O(1)).
+# Se rearman solo cuando cambian las columnas visibles (LABEL_VERSIONS); el stock va aparte.
+Options = namedtuple("Options", "ids rows index total")
+
+def search_options(table, text="", limit=PAGE_SIZE):
+    nombre, cols = LABEL_VERSIONS[table]
+    (version,) = get_versions(nombre)
+    def build():
+        df, total = _query(table, text, 0, limit)
+        ids = df['ID'].tolist()
+        rows = dict(zip(ids, df[['ID', *cols]].to_dict('records')))
+        return Options(ids, rows, {i: n for n, i in enumerate(ids)}, total)
+    return _options.get_versioned((db.current_path(), table), version, build, ((text or "").strip().lower(), limit))
+
+def get_stock(ids):
+    """Stock actual de los insumos indicados (se relee solo si cambió inventory)"""
+    (version,) = get_versions('inventory')
+    def build():
+        with connection() as conn:
+            return dict(conn.execute(f"SELECT ID, Stock FROM inventory WHERE ID IN ({','.join('?' * len(ids))})",
+                                     list(ids)).fetchall())
+    return _stock.get_versioned((db.current_path(),), version, build, tuple(ids))
+
+def rebuild_index():
+    """Reconstruye los índices FTS5 desde las tablas (necesario tras un VACUUM)"""
+    with transaction() as conn:
+        for table in SEARCH_COLUMNS:
+            if _has_fts(conn, table):
+                conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
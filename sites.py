@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+
+import db
+from alerts import get_reorder_list
+from perf import timed_fn
+from rollup import get_item_totals
+
+# --- SEDES (UNA BASE POR RESIDENCIA) ---
+# Cada sede tiene su propio archivo SQLite: lock de escritura, índices, pool de conexiones
+# y cachés son por archivo, así que sumar una sede no hace más lenta a las demás. La sede
+# se elige al iniciar sesión y db.set_current_path()/db.using() dirigen connection() y
+# transaction() al pool de su archivo. Los consolidados consultan las sedes en paralelo
+# (un hilo por sede; SQLite suelta el GIL mientras lee) y unen los resultados por Sede.
+# Las sedes se definen en sedes.json ({"Nombre": "archivo.db"}, rutas relativas al JSON);
+# sin ese archivo hay una sola sede sobre db.DB_PATH, como antes.
+
+SITES_FILE = os.environ.get("FARMACIA_SEDES", "sedes.json")
+SITE_WORKERS = 8
+SEDE_UNICA = "Farmacia Ac"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def load_sites(path=SITES_FILE):
+    """{nombre de la sede: archivo de su base}, en el orden de sedes.json"""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            sedes = json.load(fh)
+    except FileNotFoundError:
+        return {SEDE_UNICA: db.DB_PATH}
+    base = os.path.dirname(os.path.abspath(path))
+    return {nombre: os.path.join(base, archivo) for nombre, archivo in sedes.items()}
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=SITE_WORKERS, thread_name_prefix="sede")
+        return _pool
+
+def for_each_site(fn, *args, sites=None, **kwargs):
+    """{sede: fn(*args, **kwargs)} con fn corriendo sobre la base de cada sede, en paralelo"""
+    sites = sites or load_sites()
+    futures = {}
+    for nombre, path in sites.items():
+        with db.using(path):
+            futures[nombre] = _executor().submit(db.bind(fn), *args, **kwargs)
+    return {nombre: f.result() for nombre, f in futures.items()}
+
+def init_sites(sites=None):
+    """Migraciones pendientes de todas las sedes. Devuelve {sede: versión del esquema}"""
+    return for_each_site(db.init_db, sites=sites)
+
+def _merge(resultados):
+    """Une los DataFrames de cada sede con una primera columna Sede"""
+    partes = [df.assign(Sede=nombre) for nombre, df in resultados.items() if not df.empty]
+    if not partes:
+        columnas = next(iter(resultados.values())).columns if resultados else []
+        return pd.DataFrame(columns=['Sede', *columnas])
+    df = pd.concat(partes, ignore_index=True)
+    return df[['Sede', *df.columns.drop('Sede')]]
+
+@timed_fn('sedes.consolidado')
+def consolidated_consumption(d_ini, d_fin, gestion=None, sites=None):
+    """Consumo del periodo por insumo (Nombre y Gestión) con una columna por sede y el total.
+    Los ID de insumo son propios de cada base: las sedes se cruzan por nombre."""
+    sites = sites or load_sites()
+    df = _merge(for_each_site(get_item_totals, d_ini, d_fin, gestion, sites=sites))
+    tabla = (df.pivot_table(index=['Insumo', 'Gestion'], columns='Sede', values='Cantidad', aggfunc='sum', fill_value=0)
+               .reindex(columns=list(sites), fill_value=0))
+    tabla.columns.name = None
+    tabla['Total'] = tabla.sum(axis=1)
+    return tabla.sort_values('Total', ascending=False).reset_index()
+
+@timed_fn('sedes.consolidado')
+def consolidated_low_stock(gestion=None, sites=None):
+    """Lista de reposición de todas las sedes (insumos en o bajo su StockMinimo), con la sede"""
+    return _merge(for_each_site(get_reorder_list, gestion, sites=sites))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Sedes: migraciones y consolidado de consumo y stock bajo")
+    ap.add_argument("--sedes", default=SITES_FILE, help="archivo JSON de sedes (por defecto sedes.json)")
+    ap.add_argument("--desde", type=date.fromisoformat, default=date.today().replace(day=1), help="AAAA-MM-DD")
+    ap.add_argument("--hasta", type=date.fromisoformat, default=date.today(), help="AAAA-MM-DD")
+    args = ap.parse_args()
+    sedes = load_sites(args.sedes)
+    for nombre, version in init_sites(sedes).items():
+        print(f"{nombre}: esquema v{version} ({sedes[nombre]})")
+    print(consolidated_consumption(args.desde, args.hasta, sites=sedes).head(20).to_string(index=False))
+    print(f"{len(consolidated_low_stock(sites=sedes))} insumos bajo mínimo en {len(sedes)} sedes")